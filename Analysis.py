@@ -0,0 +1,282 @@
+"""
+Analysis.py is a module used to summarize the sessions saved in the data folder,
+however many there are.
+
+Each CSV file is read in chunks of rows, keeping one row per trial (the long
+layout repeats every trial once per scorer), and each chunk is reduced with
+NumPy to partial aggregates: the number of trials, the number of them with a
+duration and the sum and sum of squares of those durations, and the number of
+precision grasp violations, per object,
+ratio, orientation and round. The files are reduced in a pool of processes,
+and the partial aggregates of every file are cached with its modification time
+and size, so that only new or changed files are read the next time. Memory use
+depends on the number of objects and rounds, not on the number of sessions.
+
+Usage: python Analysis.py [FOLDER] [--jobs N] [--output PATH] [--no-cache]
+"""
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import csv
+import json
+import os
+import numpy as np
+import NovelObject as nObj
+
+# CONSTANTS
+DATA_FOLDER = "data"
+CSV_EXTENSION = ".csv"
+CACHE_FILE = ".analysis_cache.json"
+CACHE_VERSION = 2
+CHUNK_ROWS = 4096
+# Columns of the data files (see Experiment.COL) read by the analysis
+TRIAL_COLUMN = "Trial#"
+ROUND_COLUMN = "Round#"
+NAME_COLUMN = "ObjectName"
+ORIENTATION_COLUMN = "ObjectOrientation"
+DURATION_COLUMN = "Duration"
+VIOLATION_COLUMN = "PrecisionGraspViolation"
+COLUMNS = [TRIAL_COLUMN, ROUND_COLUMN, NAME_COLUMN, ORIENTATION_COLUMN, DURATION_COLUMN, VIOLATION_COLUMN]
+# What is recorded when the precision grasp was used
+NO_VIOLATION = "NONE"
+# Orientation of the uniform objects in the reports
+NO_ORIENTATION = "uniform"
+# Groups the trials are aggregated by
+GROUPS = ["object", "ratio", "orientation", "round"]
+# Aggregates kept per group: count, count of the durations recorded, sum and
+# sum of squares of those durations, and number of violations
+NSTATS = 5
+
+# FUNCTIONS
+def ratio_key(name):
+    """Returns the ratio of an object, as a key of the "ratio" group"""
+    try:
+        ratio = nObj.parse_stimulus(name)[1]
+    except ValueError:
+        return "unknown"
+    return ":".join(ratio) if ratio else "uniform"
+
+def read_chunks(path, size=CHUNK_ROWS):
+    """Reads the rows of a data file in chunks, one row per trial.
+    :param path: the path of the CSV file
+    :type path: string
+    :param size: number of rows per chunk
+    :type size: int
+    :rtype: generator of string list list
+    :return: the chunks of rows, with the values of COLUMNS only
+    :raises ValueError: if the file lacks some of COLUMNS
+    """
+    with open(path, newline="") as data_file:
+        reader = csv.reader(data_file)
+        header = next(reader, None)
+        if header is None:
+            return
+        missing = [column for column in COLUMNS if column not in header]
+        if missing:
+            raise ValueError("no {} column".format(", ".join(missing)))
+        indexes = [header.index(column) for column in COLUMNS]
+        trial_idx = header.index(TRIAL_COLUMN)
+        seen = set()
+        rows = []
+        for row in reader:
+            # the scorers' copies of a trial are skipped
+            if len(row) < len(header) or row[trial_idx] in seen:
+                continue
+            seen.add(row[trial_idx])
+            rows.append([row[idx] for idx in indexes])
+            if len(rows) >= size:
+                yield rows
+                rows = []
+        if rows:
+            yield rows
+
+def new_partial():
+    """Returns empty partial aggregates"""
+    return {"files": 0, "trials": 0, "violations": {}, "groups": {group: {} for group in GROUPS}}
+
+def add_group(aggregates, keys, durations, known, violated):
+    """Adds the trials of a chunk to the aggregates of a group.
+    :param aggregates: the aggregates of the group, keyed by value
+    :type aggregates: dict
+    :param keys: the value of the group for each trial
+    :type keys: list
+    :param durations: the duration of each trial (0 if it was not recorded)
+    :type durations: numpy array
+    :param known: whether the duration of each trial was recorded
+    :type known: numpy array
+    :param violated: whether each trial had a violation
+    :type violated: numpy array
+    """
+    (values, inverse) = np.unique(np.asarray(keys), return_inverse=True)
+    stats = np.stack([np.bincount(inverse, minlength=len(values)),
+                      np.bincount(inverse, weights=known, minlength=len(values)),
+                      np.bincount(inverse, weights=durations, minlength=len(values)),
+                      np.bincount(inverse, weights=durations * durations, minlength=len(values)),
+                      np.bincount(inverse, weights=violated, minlength=len(values))], axis=1)
+    for (value, row) in zip(values.tolist(), stats.tolist()):
+        previous = aggregates.setdefault(str(value), [0.0] * NSTATS)
+        for idx in range(NSTATS):
+            previous[idx] += row[idx]
+
+def add_chunk(partial, rows):
+    """Adds a chunk of rows (see read_chunks) to partial aggregates"""
+    (trials, rounds, names, orientations, durations, violations) = zip(*rows)
+    durations = np.array([float(duration) if duration else np.nan for duration in durations])
+    known = ~np.isnan(durations)
+    durations = np.where(known, durations, 0.0)
+    labels = np.char.upper(np.asarray(violations, dtype=str))
+    violated = (labels != NO_VIOLATION).astype(float)
+    ratios = {name: ratio_key(name) for name in set(names)}
+    groups = {"object": names, "ratio": [ratios[name] for name in names],
+              "orientation": [orientation or NO_ORIENTATION for orientation in orientations],
+              "round": rounds}
+    for (group, keys) in groups.items():
+        add_group(partial["groups"][group], keys, durations, known, violated)
+    (values, counts) = np.unique(labels, return_counts=True)
+    for (value, count) in zip(values.tolist(), counts.tolist()):
+        partial["violations"][value] = partial["violations"].get(value, 0) + count
+    partial["trials"] += len(rows)
+
+def summarize_file(path):
+    """Reduces a data file to partial aggregates (run in a worker process).
+    :param path: the path of the CSV file
+    :type path: string
+    :rtype: (dict, string)
+    :return: the partial aggregates, and None; or None, and the problem found
+    """
+    partial = new_partial()
+    try:
+        for rows in read_chunks(path):
+            add_chunk(partial, rows)
+    except (OSError, ValueError, csv.Error) as err:
+        return (None, "{}: {}".format(path, err))
+    partial["files"] = 1
+    return (partial, None)
+
+def merge(partials):
+    """Adds up partial aggregates.
+    :param partials: the partial aggregates
+    :type partials: dict iterable
+    :rtype: dict
+    """
+    total = new_partial()
+    for partial in partials:
+        total["files"] += partial["files"]
+        total["trials"] += partial["trials"]
+        for (value, count) in partial["violations"].items():
+            total["violations"][value] = total["violations"].get(value, 0) + count
+        for group in GROUPS:
+            for (value, stats) in partial["groups"][group].items():
+                previous = total["groups"][group].setdefault(value, [0.0] * NSTATS)
+                for idx in range(NSTATS):
+                    previous[idx] += stats[idx]
+    return total
+
+def finalize(total):
+    """Turns aggregates into the statistics of the report.
+    :param total: the aggregates of every file (see merge)
+    :type total: dict
+    :rtype: dict
+    """
+    report = {"files": total["files"], "trials": total["trials"], "violations": total["violations"]}
+    for group in GROUPS:
+        stats = {}
+        for (value, (count, timed, total_duration, squares, violations)) in total["groups"][group].items():
+            # the trials without a duration do not count towards its mean
+            (mean, sd) = (None, None)
+            if timed:
+                mean = total_duration / timed
+                sd = max(squares / timed - mean * mean, 0.0) ** 0.5
+            stats[value] = {"trials": int(count), "timed": int(timed), "mean_duration": mean,
+                            "sd_duration": sd, "violation_rate": violations / count}
+        if group == "round":
+            # the learning curve, in the order of the rounds
+            stats = dict(sorted(stats.items(), key=lambda item: int(item[0]) if item[0].isdigit() else 0))
+        report[group] = stats
+    return report
+
+def load_cache(path):
+    """Reads the cached partial aggregates (empty if there are none)"""
+    try:
+        with open(path) as cache_file:
+            cache = json.load(cache_file)
+    except (OSError, ValueError):
+        return {}
+    if cache.get("version") != CACHE_VERSION:
+        return {}
+    return cache["files"]
+
+def save_cache(path, files):
+    """Writes the cached partial aggregates, atomically"""
+    partial_path = path + ".partial"
+    with open(partial_path, "w") as cache_file:
+        json.dump({"version": CACHE_VERSION, "files": files}, cache_file)
+    os.replace(partial_path, path)
+
+def analyze(folder=DATA_FOLDER, jobs=None, use_cache=True):
+    """Summarizes every data file of a folder.
+    :param folder: the folder holding the CSV files
+    :type folder: string
+    :param jobs: number of worker processes (None for one per CPU)
+    :type jobs: int
+    :param use_cache: whether to reuse and update the cached partial aggregates
+    :type use_cache: bool
+    :rtype: dict
+    :return: the report; the files that could not be read are listed in its
+    "problems"
+    """
+    cache_path = os.path.join(folder, CACHE_FILE)
+    cached = load_cache(cache_path) if use_cache else {}
+    files = {}
+    todo = []
+    for name in sorted(os.listdir(folder)):
+        if not name.endswith(CSV_EXTENSION):
+            continue
+        path = os.path.join(folder, name)
+        info = os.stat(path)
+        signature = [info.st_mtime, info.st_size]
+        entry = cached.get(name)
+        if entry is not None and entry["signature"] == signature:
+            files[name] = entry
+        else:
+            todo.append((name, path, signature))
+    problems = []
+    if todo:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            results = pool.map(summarize_file, [path for (name, path, signature) in todo], chunksize=8)
+            for ((name, path, signature), (partial, problem)) in zip(todo, results):
+                if problem:
+                    problems.append(problem)
+                else:
+                    files[name] = {"signature": signature, "partial": partial}
+    if use_cache:
+        save_cache(cache_path, files)
+    report = finalize(merge(entry["partial"] for entry in files.values()))
+    report["read"] = len(todo)
+    report["cached"] = len(files) - len(todo) + len(problems)
+    report["problems"] = problems
+    return report
+
+def print_report(report):
+    """Prints the main statistics of a report"""
+    print("{} sessions ({} read, {} cached), {} trials".format(
+        report["files"], report["read"], report["cached"], report["trials"]))
+    for problem in report["problems"]:
+        print("could not read", problem)
+    for group in GROUPS:
+        print("{:<40}{:>8}{:>12}{:>12}{:>12}".format(group, "trials", "mean (s)", "sd (s)", "violations"))
+        for (value, stats) in report[group].items():
+            (mean, sd) = ("-" if stats[key] is None else "{:.2f}".format(stats[key]) for key in ("mean_duration", "sd_duration"))
+            print("{:<40}{:>8}{:>12}{:>12}{:>12.1%}".format(value, stats["trials"], mean, sd, stats["violation_rate"]))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Summarize the sessions of the data folder")
+    parser.add_argument("folder", nargs="?", default=DATA_FOLDER)
+    parser.add_argument("--jobs", type=int)
+    parser.add_argument("--output", help="path of a JSON file to write the report to")
+    parser.add_argument("--no-cache", action="store_true")
+    args = parser.parse_args()
+    report = analyze(args.folder, args.jobs, not args.no_cache)
+    print_report(report)
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(report, output, indent=1)
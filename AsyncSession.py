@@ -0,0 +1,265 @@
+"""
+AsyncSession.py is a module used to run several sessions of the experiment from
+one process, each with its own Experiment (and so its own output file), its own
+source of key presses, and its own frontend showing the screens.
+
+The flow of main.py (round announcement, countdown, trial, confirmation or
+grasp warning) is written as a state machine (see StateMachine.py) whose states
+are coroutines, so that one asyncio event loop can drive many sessions at once:
+a session waiting for a key or a countdown does not hold up the others. The
+frontend here only records the screens shown, which (with the headless backend)
+is enough to test the flow and to load-test the data path.
+
+Usage: python AsyncSession.py [--sessions N] [--rounds R] [--stimuli FILE] [--backend NAME]
+"""
+import argparse
+import asyncio
+import time
+import Backend
+import StateMachine
+
+# CONSTANTS
+# States of a session
+ANNOUNCE = "announce"
+INSTRUCTIONS = "instructions"
+COUNTDOWN = "countdown"
+TRIAL = "trial"
+CONFIRM = "confirm"
+WARNING = "warning"
+WARNED = "warned"
+DONE = "done"
+ABORTED = "aborted"
+STATES = [ANNOUNCE, INSTRUCTIONS, COUNTDOWN, TRIAL, CONFIRM, WARNING, WARNED, DONE, ABORTED]
+QUIT_KEY = "escape"
+GRASP_KEYS = ["1", "2", "3"]
+SECONDS_BETW_TRIAL = 3
+COUNTDOWN_SECONDS = 3
+
+# CLASSES
+class KeyPress:
+    """A key press of a session's input (named like keyboard.KeyPress)"""
+    def __init__(self, name, tDown):
+        self.name = name
+        self.tDown = tDown
+
+class QueueInput:
+    """
+    The key presses of a session, pushed by whatever reads the station's
+    keyboard (or by a script).
+    """
+    def __init__(self):
+        self.queue = asyncio.Queue()
+
+    def press(self, name, tDown=None):
+        """Adds a key press, made now unless a time (core.getTime()) is given"""
+        self.queue.put_nowait(KeyPress(name, Backend.core.getTime() if tDown is None else tDown))
+
+    async def next_key(self, timeout=None):
+        """Waits for the next key press.
+        :param timeout: seconds to wait at most; None to wait for as long as it takes
+        :type timeout: float
+        :rtype: KeyPress
+        :return: the key press; or None if the time ran out
+        """
+        if not self.queue.empty():
+            return self.queue.get_nowait()
+        if timeout is not None and timeout <= 0:
+            return None
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+class ScriptedInput(QueueInput):
+    """
+    Plays back a script, one entry whenever the session waits for a key: the
+    name of the key pressed, or None to let a timed wait (countdown,
+    confirmation) run out. Once the script is over, the keys pushed with
+    press() are read.
+    """
+    def __init__(self, keys):
+        QueueInput.__init__(self)
+        self.keys = list(reversed(keys))
+
+    async def next_key(self, timeout=None):
+        if not self.queue.empty() or not self.keys:
+            return await QueueInput.next_key(self, timeout)
+        name = self.keys.pop()
+        if name is None:
+            return None
+        return KeyPress(name, Backend.core.getTime())
+
+class RecordingFrontend:
+    """
+    Stands in for a window: records the screens a session shows.
+    """
+    def __init__(self):
+        self.screens = []
+
+    def show(self, state, text=""):
+        self.screens.append((state, text))
+
+class AsyncSession:
+    """
+    The AsyncSession class runs one session of the experiment as a state
+    machine.
+    """
+    def __init__(self, experiment, input, frontend, seconds_between_trials=SECONDS_BETW_TRIAL,
+                 countdown_seconds=COUNTDOWN_SECONDS):
+        """Constructs an AsyncSession.
+        :param experiment: the experiment of the session
+        :type experiment: Experiment.Experiment
+        :param input: where the key presses of the session come from
+        :type input: QueueInput
+        :param frontend: what shows the screens of the session
+        :type frontend: RecordingFrontend
+        :param seconds_between_trials: length of the window to revert a trial
+        :type seconds_between_trials: float
+        :param countdown_seconds: length of the countdown before a round
+        :type countdown_seconds: float
+        """
+        self.exp = experiment
+        self.input = input
+        self.frontend = frontend
+        self.seconds_between_trials = seconds_between_trials
+        self.countdown_seconds = countdown_seconds
+        self.button = "right"
+        # the trial whose onset was stamped: a trial shown again after a revert
+        # keeps the time it was first shown
+        self.onset_trial = None
+        # the trials of a round lead to the next one (ANNOUNCE) or to the end
+        self.machine = StateMachine.StateMachine("session", {
+            ANNOUNCE: (self.announce, [COUNTDOWN, INSTRUCTIONS, ABORTED]),
+            INSTRUCTIONS: (self.instructions, [ANNOUNCE, ABORTED]),
+            COUNTDOWN: (self.countdown, [TRIAL, ANNOUNCE, ABORTED]),
+            TRIAL: (self.trial, [CONFIRM, WARNING, ABORTED]),
+            CONFIRM: (self.confirm, [TRIAL, ANNOUNCE, DONE, ABORTED]),
+            WARNING: (self.warning, [WARNED, TRIAL, ABORTED]),
+            WARNED: (self.warned, [TRIAL, ANNOUNCE, DONE, ABORTED]),
+        })
+
+    async def run(self):
+        """Runs the session until it is done or aborted, then closes (or
+        discards) its output.
+        :rtype: string
+        :return: the last state, DONE or ABORTED
+        """
+        self.exp.next_round()
+        state = await self.machine.run_async(ANNOUNCE, [DONE, ABORTED])
+        self.exp.end_experiment(abrupt=state == ABORTED)
+        return state
+
+    async def wait_key(self, keys, timeout=None):
+        """Waits for one of the keys (or the quit key), ignoring the others.
+        :return: the key press; or None if the time ran out
+        """
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+        while True:
+            remaining = None if deadline is None else deadline - loop.time()
+            key = await self.input.next_key(remaining)
+            if key is None or key.name == QUIT_KEY or key.name in keys:
+                return key
+
+    async def announce(self):
+        self.frontend.show(ANNOUNCE, "ROUND {}".format(self.exp.current_round()))
+        key = await self.wait_key(["right", "i"])
+        if key.name == QUIT_KEY:
+            return ABORTED
+        return COUNTDOWN if key.name == "right" else INSTRUCTIONS
+
+    async def instructions(self):
+        self.frontend.show(INSTRUCTIONS)
+        key = await self.wait_key(["space"])
+        return ABORTED if key.name == QUIT_KEY else ANNOUNCE
+
+    async def countdown(self):
+        self.frontend.show(COUNTDOWN, self.countdown_seconds)
+        key = await self.wait_key(["return"], self.countdown_seconds)
+        if key is None:
+            self.exp.next_stimulus()
+            return TRIAL
+        return ABORTED if key.name == QUIT_KEY else ANNOUNCE
+
+    async def trial(self):
+        self.frontend.show(TRIAL, self.exp.current_trial_info())
+        if self.exp.trial_number() != self.onset_trial:
+            self.exp.stamp_onset(Backend.core.getTime())
+            self.onset_trial = self.exp.trial_number()
+        key = await self.wait_key(["right"] + GRASP_KEYS)
+        if key.name == QUIT_KEY:
+            return ABORTED
+        self.exp.stamp_response(key.tDown)
+        self.button = key.name
+        return CONFIRM if key.name == "right" else WARNING
+
+    async def confirm(self):
+        self.frontend.show(CONFIRM, self.seconds_between_trials)
+        key = await self.wait_key(["return"], self.seconds_between_trials)
+        if key is None:
+            return self.advance()
+        return ABORTED if key.name == QUIT_KEY else TRIAL
+
+    async def warning(self):
+        self.frontend.show(WARNING, self.button)
+        key = await self.wait_key(["right", "return"])
+        if key.name == QUIT_KEY:
+            return ABORTED
+        return WARNED if key.name == "right" else TRIAL
+
+    async def warned(self):
+        self.frontend.show(WARNED, self.button)
+        key = await self.wait_key([], self.seconds_between_trials)
+        if key is not None:
+            return ABORTED
+        return self.advance()
+
+    def advance(self):
+        """Records the trial and moves on to the next object, round, or to the
+        end of the session"""
+        self.exp.next_stimulus(self.button)
+        if not self.exp.round_complete():
+            return TRIAL
+        if self.exp.experiment_complete():
+            return DONE
+        self.exp.next_round()
+        return ANNOUNCE
+
+# FUNCTIONS
+async def run_sessions(sessions):
+    """Runs sessions at once on the running event loop.
+    :param sessions: the sessions
+    :type sessions: AsyncSession list
+    :rtype: string list
+    :return: the last state of each session
+    """
+    return await asyncio.gather(*(session.run() for session in sessions))
+
+def session_keys(nrounds, nstims):
+    """Returns the script (see ScriptedInput) of a session going straight
+    through every trial"""
+    return (["right", None] + ["right", None] * nstims) * nrounds
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run simulated sessions on one event loop")
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--rounds", type=int, default=6)
+    parser.add_argument("--stimuli", default="behavioral_stimuli.csv")
+    parser.add_argument("--backend", choices=Backend.BACKENDS, default="headless")
+    args = parser.parse_args()
+    Backend.use(args.backend) # before anything imports the backend's modules
+    import Experiment as ex
+    sessions = []
+    for idx in range(args.sessions):
+        if Backend.is_headless():
+            import Headless
+            Headless.script_participant(pid="S{:03d}".format(idx))
+        exp = ex.Experiment("Async Sessions", args.stimuli, nrounds=args.rounds, DEBUG=True,
+                            constraints=ex.ROUND_CONSTRAINTS)
+        keys = session_keys(args.rounds, exp.get_nstimuli())
+        sessions.append(AsyncSession(exp, ScriptedInput(keys), RecordingFrontend(), 0, 0))
+    start = time.perf_counter()
+    states = asyncio.run(run_sessions(sessions))
+    elapsed = time.perf_counter() - start
+    ntrials = sum(session.exp.nrounds * session.exp.get_nstimuli() for session in sessions)
+    print("{} sessions ({} done), {} trials in {:.3f}s".format(len(sessions), states.count(DONE), ntrials, elapsed))
@@ -0,0 +1,76 @@
+"""
+Backend.py is a module used to choose what the program runs on: psychopy (the
+default), or a headless stand-in with a simulated clock, a scripted keyboard, a
+null window, and an in-memory writer (see Headless.py).
+
+Every module imports core, gui, visual, keyboard, Image, Writer (what the
+data is written with) and wall_time (the system's wall clock, which psychopy's
+clocks are checked against) from here rather than from psychopy, so the backend has
+to be chosen before any of them are imported, either with the
+RANDOMIZER_BACKEND environment variable or by calling use() first.
+
+The psychopy modules are slow to import, so they are only imported the first
+time they are used (or when preload() is called). They must be imported on the
+main thread: psychopy.visual brings in pyglet, whose windowing only works
+there.
+"""
+import importlib
+import os
+
+# CONSTANTS
+BACKENDS = ["psychopy", "headless"]
+BACKEND = os.environ.get("RANDOMIZER_BACKEND", "psychopy")
+
+# CLASS
+class LazyModule:
+    """
+    A LazyModule stands in for a module, importing it the first time one of
+    its attributes is used.
+    """
+    def __init__(self, name):
+        self.name = name
+        self.module = None
+
+    def load(self):
+        """Imports the module (once) and returns it"""
+        if self.module is None:
+            self.module = importlib.import_module(self.name)
+        return self.module
+
+    def __getattr__(self, attr):
+        return getattr(self.load(), attr)
+
+# FUNCTIONS
+def use(name):
+    """Selects the backend. Must be called before the other modules of the
+    program are imported.
+    :param name: one of BACKENDS
+    :type name: string
+    """
+    global BACKEND, core, gui, visual, keyboard, Image, Writer, wall_time
+    if name not in BACKENDS:
+        raise ValueError("Unknown backend: {}".format(name))
+    BACKEND = name
+    if name == "headless":
+        from Headless import core, gui, visual, keyboard, Image, Writer, wall_time
+    else:
+        core = LazyModule("psychopy.core")
+        gui = LazyModule("psychopy.gui")
+        visual = LazyModule("psychopy.visual")
+        keyboard = LazyModule("psychopy.hardware.keyboard")
+        Image = LazyModule("PIL.Image")
+        from TrialWriter import TrialWriter as Writer
+        from time import time as wall_time
+
+def preload():
+    """Imports the modules of the backend that have not been used yet. Must be
+    called from the main thread."""
+    for module in (core, gui, visual, keyboard, Image):
+        if isinstance(module, LazyModule):
+            module.load()
+
+def is_headless():
+    """Returns whether the headless backend is used"""
+    return BACKEND == "headless"
+
+use(BACKEND)
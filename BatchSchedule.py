@@ -0,0 +1,186 @@
+"""
+BatchSchedule.py is a module used to plan the sessions of a whole cohort of
+participants ahead of time, all at once.
+
+Rather than running the randomization of Stimuli and Schedule once per
+session, the choices of every participant are made together with NumPy: which
+object of each complementary pair is unflipped (an integer array of shape
+participants x pairs), and the order of the objects in every round (an integer
+array of shape participants x rounds x objects). The plans are saved to a
+compact array file, along with counterbalancing statistics: how often each
+object appears at each position of a round, and how often each orientation of
+a pair is the unflipped one.
+
+Usage: python BatchSchedule.py N [--rounds R] [--stimuli FILE] [--seed S] [--output PATH]
+"""
+from array import array
+import argparse
+import json
+import numpy as np
+import Stimuli as stim
+import NovelObject as nObj
+import Schedule as sched
+
+# CONSTANTS
+STIMULI_FILE = "behavioral_stimuli.csv"
+OUTPUT_FILE = "schedules.npz"
+STATS_SUFFIX = "_stats.json"
+
+# FUNCTIONS
+def make_catalog(stimulus_list):
+    """Reads and pairs the stimuli of the manifest.
+    :param stimulus_list: path to the CSV file listing the stimuli
+    :type stimulus_list: string
+    :rtype: (NovelObject list, int array, int array)
+    :return: the catalog (uniform objects first, then the left and right object
+    of each pair), the catalog indexes of the uniform objects, and the catalog
+    indexes of the pairs (shape pairs x 2, left then right)
+    :raises ValueError: if some stimuli are duplicated or have no complement
+    """
+    objects = [nObj.NovelObject(path) for path in stim.get_stimulus_from_file(stimulus_list)]
+    catalog = stim.StimulusCatalog(objects)
+    problems = catalog.problems()
+    if problems:
+        raise ValueError("Cannot pair the stimuli of {}:\n{}".format(stimulus_list, "\n".join(problems)))
+    objs = list(catalog.uniform)
+    for slot in catalog.slots.values():
+        objs.extend(slot[orientation] for orientation in stim.ORIENTATIONS)
+    nuniform = len(catalog.uniform)
+    uniform = np.arange(nuniform)
+    pairs = np.arange(nuniform, len(objs)).reshape(-1, 2)
+    return (objs, uniform, pairs)
+
+def generate(nparticipants, nrounds, stimulus_list=STIMULI_FILE, seed=None):
+    """Plans the sessions of many participants at once.
+    :param nparticipants: number of sessions to plan
+    :type nparticipants: int
+    :param nrounds: number of rounds per session
+    :type nrounds: int
+    :param stimulus_list: path to the CSV file listing the stimuli
+    :type stimulus_list: string
+    :param seed: seed of the random generator (None for a random one)
+    :type seed: int
+    :rtype: BatchSchedule
+    """
+    (catalog, uniform, pairs) = make_catalog(stimulus_list)
+    rng = np.random.default_rng(seed)
+    npairs = len(pairs)
+    # which object of each pair goes in the unflipped list (0 = left, 1 = right)
+    choices = rng.integers(0, 2, size=(nparticipants, npairs), dtype=np.uint8)
+    rows = np.arange(npairs)
+    unflipped = pairs[rows, choices]
+    flipped = pairs[rows, 1 - choices]
+    shared = np.broadcast_to(uniform, (nparticipants, len(uniform)))
+    # lists[:, 0] is the flipped list and lists[:, 1] the unflipped one, as in
+    # Stimuli.get_stimuli()
+    lists = np.stack([np.concatenate([shared, flipped], axis=1),
+                      np.concatenate([shared, unflipped], axis=1)], axis=1)
+    nstims = lists.shape[2]
+    round_lists = np.array([sched.round_list(round_num) for round_num in range(1, nrounds + 1)])
+    # one random permutation per participant and round
+    perms = np.argsort(rng.random((nparticipants, nrounds, nstims)), axis=2)
+    order = np.take_along_axis(lists[:, round_lists, :], perms, axis=2)
+    return BatchSchedule(catalog, order.astype(np.uint16), choices, seed)
+
+def load(path):
+    """Reads plans saved with BatchSchedule.save.
+    :param path: path of the array file
+    :type path: string
+    :rtype: BatchSchedule
+    """
+    with np.load(path) as saved:
+        catalog = [nObj.NovelObject(str(name)) for name in saved["catalog"]]
+        seed = int(saved["seed"]) if saved["seed"] >= 0 else None
+        return BatchSchedule(catalog, saved["order"], saved["choices"], seed)
+
+# CLASS
+class BatchSchedule:
+    """
+    A BatchSchedule holds the plans of many sessions as integer arrays of
+    catalog indexes.
+    """
+    def __init__(self, catalog, order, choices, seed=None):
+        """Constructs a BatchSchedule.
+        :param catalog: every distinct stimulus
+        :type catalog: NovelObject list
+        :param order: catalog index of every trial (participants x rounds x objects)
+        :type order: numpy array
+        :param choices: orientation chosen as unflipped for each pair
+        (participants x pairs; 0 = left, 1 = right)
+        :type choices: numpy array
+        :param seed: the seed the plans were generated with
+        :type seed: int
+        """
+        self.catalog = tuple(catalog)
+        self.order = order
+        self.choices = choices
+        self.seed = seed
+        (self.nparticipants, self.nrounds, self.nstims) = order.shape
+
+    def __len__(self):
+        return self.nparticipants
+
+    def schedule(self, participant):
+        """Returns the plan of one participant as a Schedule, which an
+        Experiment can walk.
+        :param participant: index of the participant (starting at 0)
+        :type participant: int
+        :rtype: Schedule.Schedule
+        """
+        order = array('H', self.order[participant].ravel().tolist())
+        return sched.Schedule(self.catalog, order, self.nrounds, self.nstims)
+
+    def stats(self):
+        """Computes the counterbalancing statistics of the plans.
+        :rtype: dict
+        :return: position_counts (objects x positions, number of times each
+        object is presented at each position of a round), and
+        unflipped_right (for each pair, the fraction of participants for whom
+        the right object is the unflipped one)
+        """
+        ncatalog = len(self.catalog)
+        positions = np.broadcast_to(np.arange(self.nstims), self.order.shape)
+        flat = self.order.astype(np.int64) * self.nstims + positions
+        counts = np.bincount(flat.ravel(), minlength=ncatalog * self.nstims)
+        position_counts = counts.reshape(ncatalog, self.nstims)
+        # objects that are presented: their spread over positions should be flat
+        presented = position_counts[position_counts.sum(axis=1) > 0]
+        expected = presented.sum(axis=1, keepdims=True) / self.nstims
+        unflipped_right = self.choices.mean(axis=0) if self.choices.size else np.zeros(0)
+        return {
+            "participants": self.nparticipants,
+            "rounds": self.nrounds,
+            "objects": self.nstims,
+            "catalog": [obj.get_stimuli() for obj in self.catalog],
+            "position_counts": position_counts.tolist(),
+            "max_position_deviation": float(np.abs(presented / expected - 1).max()) if presented.size else 0.0,
+            "unflipped_right": unflipped_right.tolist(),
+            "max_orientation_imbalance": float(np.abs(unflipped_right - 0.5).max()) if unflipped_right.size else 0.0,
+        }
+
+    def save(self, path):
+        """Saves the plans to a compressed array file.
+        :param path: path of the file (.npz)
+        :type path: string
+        """
+        np.savez_compressed(path, order=self.order, choices=self.choices,
+                            catalog=np.array([obj.get_stimuli() for obj in self.catalog]),
+                            seed=np.int64(-1 if self.seed is None else self.seed))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Plan the sessions of a cohort of participants")
+    parser.add_argument("participants", type=int)
+    parser.add_argument("--rounds", type=int, default=6)
+    parser.add_argument("--stimuli", default=STIMULI_FILE)
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--output", default=OUTPUT_FILE)
+    args = parser.parse_args()
+    batch = generate(args.participants, args.rounds, args.stimuli, args.seed)
+    batch.save(args.output)
+    stats = batch.stats()
+    stats_path = args.output.rsplit(".", 1)[0] + STATS_SUFFIX
+    with open(stats_path, "w") as stats_file:
+        json.dump(stats, stats_file)
+    print("{} sessions planned in {}; statistics in {}".format(len(batch), args.output, stats_path))
+    print("largest deviation from an even spread over positions: {:.2%}".format(stats["max_position_deviation"]))
+    print("largest orientation imbalance: {:.2%}".format(stats["max_orientation_imbalance"]))
@@ -0,0 +1,216 @@
+"""
+ConstrainedShuffle.py is a module used to put the objects of a round in a random
+order that follows some constraints, such as not presenting the same colors
+or the same orientation too many times in a row, or not presenting essentially
+equal objects too close to each other (including across round boundaries).
+
+Rather than shuffling until an order happens to follow the constraints, the
+order is built one position at a time, choosing at random among the objects
+that can go there and backtracking when it gets stuck. Every attempt has a
+budget of steps, so the time taken is bounded; if no attempt succeeds, the
+order with the fewest violations is used and the violations are reported.
+"""
+import random
+import time
+
+# CONSTANTS
+# Attributes of a NovelObject that runs can be limited on
+ATTRIBUTES = {
+    "colors": lambda obj: obj.get_colors(),
+    "ratio": lambda obj: obj.get_ratio(),
+    "orientation": lambda obj: obj.get_orientation(),
+}
+MAX_ATTEMPTS = 20
+# Every attempt may try this many objects, or four per object of the round if
+# that is more
+STEPS_PER_ATTEMPT = 2000
+
+# CLASSES
+class Constraints:
+    """
+    The constraints that the order of the objects must follow.
+    """
+    def __init__(self, max_run=None, min_distance=1, no_boundary_repeat=True):
+        """Constructs Constraints.
+        :param max_run: the maximum number of objects in a row sharing the same
+        value of an attribute, keyed by attribute (see ATTRIBUTES)
+        :type max_run: dict
+        :param min_distance: the minimum number of trials between two
+        essentially equal objects (1 means no constraint)
+        :type min_distance: int
+        :param no_boundary_repeat: whether a round may not start with the object
+        (or an essentially equal one) that ended the previous round
+        :type no_boundary_repeat: bool
+        """
+        self.max_run = dict(max_run or {})
+        for attr in self.max_run:
+            if attr not in ATTRIBUTES:
+                raise ValueError("Unknown attribute: {}".format(attr))
+        self.min_distance = min_distance
+        self.no_boundary_repeat = no_boundary_repeat
+
+    def to_dict(self):
+        """Returns the constraints as JSON-serializable data (the arguments of
+        the constructor)"""
+        return {"max_run": self.max_run, "min_distance": self.min_distance,
+                "no_boundary_repeat": self.no_boundary_repeat}
+
+    def context(self):
+        """Returns how many of the previous objects the constraints look at"""
+        return max([self.min_distance - 1, 1] + list(self.max_run.values()))
+
+class ShuffleReport:
+    """
+    What it took to order a round.
+    """
+    def __init__(self, attempts, steps, seconds, violations):
+        self.attempts = attempts
+        self.steps = steps
+        self.seconds = seconds
+        self.violations = violations
+
+    def to_dict(self):
+        return {"attempts": self.attempts, "steps": self.steps,
+                "seconds": self.seconds, "violations": self.violations}
+
+class ConstrainedShuffle:
+    """
+    The ConstrainedShuffle class orders the objects of rounds, one round after
+    another, following the constraints.
+    """
+    def __init__(self, constraints, rng=random, max_attempts=MAX_ATTEMPTS, steps=STEPS_PER_ATTEMPT):
+        """Constructs a ConstrainedShuffle.
+        :param constraints: the constraints to follow
+        :type constraints: Constraints
+        :param rng: the source of randomness (anything with shuffle and random methods)
+        :param max_attempts: number of attempts before giving up on a round
+        :type max_attempts: int
+        :param steps: number of objects tried per attempt before giving up on it
+        :type steps: int
+        """
+        self.constraints = constraints
+        self.rng = rng
+        self.max_attempts = max_attempts
+        self.steps = steps
+        self.reports = []
+
+    def features(self, obj):
+        """Returns what the constraints compare between objects"""
+        values = tuple(ATTRIBUTES[attr](obj) for attr in self.constraints.max_run)
+        return (obj.key(), values)
+
+    def fits(self, feature, sequence, round_start):
+        """Returns whether an object can follow the sequence.
+        :param feature: the features of the object
+        :param sequence: the features of the objects presented before it
+        :type sequence: list
+        :param round_start: the index in sequence where the current round starts
+        :type round_start: int
+        """
+        (key, values) = feature
+        constraints = self.constraints
+        if constraints.no_boundary_repeat and len(sequence) == round_start and sequence:
+            if sequence[-1][0] == key:
+                return False
+        for (previous_key, previous_values) in sequence[max(0, len(sequence) - constraints.min_distance + 1):]:
+            if previous_key == key:
+                return False
+        for (idx, max_run) in enumerate(constraints.max_run.values()):
+            run = 1
+            for (previous_key, previous_values) in reversed(sequence):
+                if previous_values[idx] != values[idx]:
+                    break
+                run += 1
+                if run > max_run:
+                    return False
+        return True
+
+    def violations(self, features, history):
+        """Counts the objects of an order that break the constraints"""
+        sequence = list(history)
+        count = 0
+        for feature in features:
+            if not self.fits(feature, sequence, len(history)):
+                count += 1
+            sequence.append(feature)
+        return count
+
+    def attempt(self, features, history, rng):
+        """Builds an order by randomized depth-first search: at each position,
+        the objects left are tried starting from a random one, and the first one
+        that fits is placed.
+        :return: the order (as indexes of features), and the steps used; the
+        order is None if the budget ran out
+        """
+        sequence = list(history)
+        round_start = len(sequence)
+        pool = list(range(len(features)))
+        rng.shuffle(pool)
+        # (index in pool it was taken from, object) for each position placed
+        order = []
+        # (offset, number of objects tried) for each position placed
+        stack = []
+        steps = 0
+        budget = max(self.steps, 4 * len(features))
+        (offset, tried) = (int(rng.random() * len(pool)), 0)
+        while pool:
+            if tried == len(pool):
+                # dead end: take back the last object and try the next one
+                if not order:
+                    return (None, steps)
+                (pos, idx) = order.pop()
+                sequence.pop()
+                pool.insert(pos, idx)
+                (offset, tried) = stack.pop()
+                tried += 1
+                continue
+            if steps >= budget:
+                return (None, steps)
+            steps += 1
+            pos = (offset + tried) % len(pool)
+            idx = pool[pos]
+            if not self.fits(features[idx], sequence, round_start):
+                tried += 1
+                continue
+            stack.append((offset, tried))
+            order.append((pos, pool.pop(pos)))
+            sequence.append(features[idx])
+            if pool:
+                (offset, tried) = (int(rng.random() * len(pool)), 0)
+        return ([idx for (pos, idx) in order], steps)
+
+    def order(self, objects, previous=(), rng=None):
+        """Orders the objects of a round.
+        :param objects: the objects of the round
+        :type objects: list
+        :param previous: the objects presented before the round, in order
+        :type previous: list
+        :param rng: the source of randomness for this round; None for the
+        shuffle's own
+        :rtype: list
+        :return: the objects in their new order; the report of the round is
+        added to reports
+        """
+        start = time.perf_counter()
+        rng = rng or self.rng
+        features = [self.features(obj) for obj in objects]
+        history = [self.features(obj) for obj in list(previous)[-self.constraints.context():]]
+        total_steps = 0
+        best = None
+        for attempts in range(1, self.max_attempts + 1):
+            (order, steps) = self.attempt(features, history, rng)
+            total_steps += steps
+            if order is not None:
+                best = (order, 0)
+                break
+        if best is None:
+            # fall back on the plain shuffle with the fewest violations
+            for trial in range(self.max_attempts):
+                order = list(range(len(objects)))
+                rng.shuffle(order)
+                count = self.violations([features[idx] for idx in order], history)
+                if best is None or count < best[1]:
+                    best = (order, count)
+        (order, count) = best
+        self.reports.append(ShuffleReport(attempts, total_steps, time.perf_counter() - start, count))
+        return [objects[idx] for idx in order]
@@ -5,25 +5,59 @@ along with dealing with the data collections throughout each of the trials.
 """
 import ExperimentData as datafile
 import Stimuli as stim
-from psychopy import core
-import random
+import Schedule as sched
+import ConstrainedShuffle as shuf
+import RandomStreams as rand
+import Hooks
+from Backend import core, wall_time
 
 # CONSTANTS
 TRIAL_HEADER = "Round #{}/{}\nObject #{}/{}\n(Trial #{}/{})"
 COL = ["Trial#", "Round#", "Object#", "ObjectName", "ObjectRatioColors", \
-"ObjectOrientation", "StartTime","EndTime","Duration","PrecisionGraspViolation"]
+"ObjectOrientation", "StartTime","EndTime","Duration","PrecisionGraspViolation", \
+"OnsetTime", "KeyDownTime", "ResponseDuration", "RecordLatency", "ClockDrift"]
 SCORING=["Time before First Grasp", "First Grasp Lift Off","Object Placed Down (Time)",
 "(First) Held For","First Grasp Location", "First Grasp Precision","Time before Second Grasp",
 "Second Grasp Lift Off", "(Second) Object Placed Down","(Second) Held For",
 "Second Grasp Location","Second Grasp Precision"]
+# Attributes of a TrialRecord, in the same order as COL
+FIELDS = ["trial", "round", "object", "name", "info", "orientation", "start", \
+"end", "duration", "grasp_violation", "onset", "key_down", "response", "latency", "drift"]
+COL_INDEX = {column: idx for (idx, column) in enumerate(COL)}
+# The order of the objects of each round used by the study (see main.py): no two
+# objects of the same colors in a row, at most two of the same orientation in a
+# row, and no essentially equal objects back to back (including across rounds)
+ROUND_CONSTRAINTS = shuf.Constraints(max_run={"colors": 1, "orientation": 2}, min_distance=2)
+
+# CLASSES
+class TrialRecord:
+    """
+    A TrialRecord holds the data of a single trial, once, in a fixed layout
+    (one slot per column of COL). The scoring columns are only added when the
+    output file is exported.
+    """
+    __slots__ = FIELDS
+
+    def __init__(self, *values):
+        """Creates a TrialRecord from the values of COL, in order"""
+        for (field, value) in zip(FIELDS, values):
+            setattr(self, field, value)
+
+    def __iter__(self):
+        """Iterates over the values in the order of COL"""
+        for field in FIELDS:
+            yield getattr(self, field)
+
+    def __getitem__(self, column):
+        """Returns the value of the given column (a name of COL)"""
+        return getattr(self, FIELDS[COL_INDEX[column]])
 
-# CLASS
 class Experiment:
     """
     The Experiment class is the blueprint for Experiment objects, which are 
     used to control the experiment. It acts sort of like an iterator.
     """
-    def __init__(self, name, stimuli_list, nrounds=6, DEBUG=False):
+    def __init__(self, name, stimuli_list, nrounds=6, DEBUG=False, layout=datafile.LONG, constraints=None, seed=None, resume=None):
         """ Creates an Experiment object.
         :param name: name of the experiment
         :type name: string
@@ -33,28 +67,131 @@ class Experiment:
         :type col: string list
         :param nrounds: number of rounds in the experiment
         :type nrounds: int 
+        :param layout: layout of the output file (see ExperimentData.LAYOUTS)
+        :type layout: string
+        :param constraints: what the order of the objects of each round must
+        follow; None for a plain shuffle
+        :type constraints: ConstrainedShuffle.Constraints
+        :param seed: the seed of the session's randomness; None for a new one
+        :type seed: int
+        :param resume: the checkpoint of a session that crashed (see
+        ExperimentData.loadCheckpoint), to go on from its last trial recorded;
+        None for a new session
+        :type resume: dict
+        :raises ValueError: if the session cannot be resumed as it was, or if a
+        new session would take the place of one that crashed
         """
         # Universal Information
-        stims = stim.Stimuli(stimuli_list) # list of list of NovelObject's
-        self.output = datafile.ExperimentData(experiment_name=name, columns=COL+SCORING, DEBUG=DEBUG)
+        self.output = datafile.ExperimentData(experiment_name=name, columns=COL, scoring=SCORING, DEBUG=DEBUG, layout=layout, resume=resume)
+        if resume is not None:
+            seed = resume["seed"]
+        # every random choice is drawn from a stream of the session, keyed by
+        # participant, session and purpose; the seed is saved with the data
+        self.streams = rand.RandomStreams(self.output.participant, self.output.session, seed)
+        self.output.attach(rand.SEED_SUFFIX, self.streams.dumps())
+        try:
+            stims = stim.Stimuli(stimuli_list, self.streams.pairs()) # list of list of NovelObject's
+        except ValueError:
+            # the file of a session being resumed is kept
+            if resume is None:
+                self.output.abort()
+            raise
         self.stimuli = stims.get_stimuli()
         self.nstims = stims.num_stimuli()
         self.nrounds = nrounds
+        # every round of the session is planned (and saved) before it starts
+        self.schedule = sched.generate(self.stimuli, nrounds, constraints=constraints, streams=self.streams)
+        self.output.attach(sched.SCHEDULE_SUFFIX, self.schedule.dumps())
         self.univ_clock = core.Clock()
         
         # Attributes descibing the state of the experiment (round, trial, stimuli)
         self.currentRound = 0
-        self.currentStims = None
         self.currentObjectNum = -1
         self.trialStart = 0
         self.trialEnd = 0
         self.grasp_violation = "None"
+        # High resolution timestamps of the current trial, on the timebase of
+        # core.getTime() (which the keyboard and the flips are stamped with)
+        self.timeOrigin = 0
+        # the wall clock (time.time()) at the same moment, to measure the drift
+        self.wallOrigin = 0
+        self.onsetTime = None
+        self.keyDownTime = None
         
         self.start_timer()
+        if resume is not None:
+            self.restore(resume)
         
     def start_timer(self):
         self.univ_clock.reset()
+        self.timeOrigin = core.getTime()
+        self.wallOrigin = wall_time()
+
+    def stamp_onset(self, flip_time):
+        """Records when the current stimulus was first shown.
+        :param flip_time: the time of the flip that showed it (core.getTime())
+        :type flip_time: float
+        """
+        self.onsetTime = flip_time
+
+    def stamp_response(self, key_time):
+        """Records when the key ending the current trial was pressed.
+        :param key_time: the time stamped by the keyboard (KeyPress.tDown), on
+        the timebase of core.getTime() (see Randomizer)
+        :type key_time: float
+        """
+        self.keyDownTime = key_time
         
+    def checkpoint(self):
+        """Saves where the session is (after a trial was recorded), so that it
+        can be resumed: the round, the number of its objects done and their
+        order (catalog indexes), the time of the clock and the number of rows
+        written."""
+        start = (self.currentRound - 1) * self.nstims
+        self.output.checkpoint({"seed": self.streams.seed, "nrounds": self.nrounds, "nstims": self.nstims,
+                                "round": self.currentRound, "object": self.currentObjectNum + 1,
+                                "order": self.schedule.order[start:start + self.nstims].tolist(),
+                                "clock": self.univ_clock.getTime(), "rows": self.trial_number()})
+
+    def restore(self, checkpoint):
+        """Goes on from the last trial recorded in the file of a session that
+        crashed: the trial that was under way is started again.
+        :param checkpoint: the checkpoint of the session
+        :type checkpoint: dict
+        :raises ValueError: if the session was planned differently
+        """
+        rows = self.output.rows_written()
+        problems = []
+        if (checkpoint["nrounds"], checkpoint["nstims"]) != (self.nrounds, self.nstims):
+            problems.append("the session had {} rounds of {} objects".format(checkpoint["nrounds"], checkpoint["nstims"]))
+        elif rows > self.nrounds * self.nstims:
+            problems.append("the file has {} trials".format(rows))
+        else:
+            start = (checkpoint["round"] - 1) * self.nstims
+            if self.schedule.order[start:start + self.nstims].tolist() != checkpoint["order"]:
+                problems.append("round {} was ordered differently".format(checkpoint["round"]))
+        if problems:
+            raise ValueError("The session cannot be resumed: " + "; ".join(problems))
+        (rounds_done, objects_done) = divmod(rows, self.nstims)
+        if objects_done:
+            self.currentRound = rounds_done + 1
+            self.currentObjectNum = objects_done
+        else:
+            self.currentRound = rounds_done
+            self.currentObjectNum = self.nstims if rounds_done else -1
+        # the clocks go on from the time of the checkpoint (Clock.reset(newT)
+        # makes the clock count from -newT)
+        clock = checkpoint["clock"]
+        self.univ_clock.reset(-clock)
+        self.timeOrigin = core.getTime() - clock
+        self.wallOrigin = wall_time() - clock
+        self.trialStart = clock
+
+    def in_round(self):
+        """Returns whether a round is under way (when a session is resumed
+        within a round)"""
+        return self.current_stimulus() is not None
+
     def experiment_complete(self): 
         """Returns whether the EXPERIMENT is complete"""
         return self.currentRound >= self.nrounds 
@@ -64,13 +201,13 @@ class Experiment:
         return self.currentObjectNum >= self.nstims
             
     def next_round(self):
-        """Advances the experiment to the next round, resets the stimuli, and 
-        shuffles them. Requires the round but not the experiment is complete
+        """Advances the experiment to the next round of the schedule, resetting
+        the object number. Requires the round but not the experiment is complete
         before doing so."""
         self.currentRound += 1
         self.currentObjectNum = -1
-        self.currentStims = self.stimuli[1 - self.currentRound % 2]
-        random.shuffle(self.currentStims) 
+        if Hooks.ACTIVE:
+            Hooks.fire(Hooks.ON_ROUND_START, self, self.currentRound)
         
     def current_round(self):
         """Return the current round number"""
@@ -78,8 +215,8 @@ class Experiment:
         
     def current_stimulus(self):
         """Returns the current stimulus for the trial"""
-        if self.currentStims != None:
-            return self.currentStims[self.currentObjectNum]
+        if self.currentRound > 0 and 0 <= self.currentObjectNum < self.nstims:
+            return self.schedule.stimulus(self.currentRound, self.currentObjectNum + 1)
         
     def current_trial_info(self):
         """
@@ -113,8 +250,14 @@ class Experiment:
             self.grasp_violation = "NONE"
         if self.currentObjectNum >= 0:
             self.update_info()
+            if Hooks.ACTIVE:
+                Hooks.fire(Hooks.ON_TRIAL_END, self, self.trial_number())
         self.currentObjectNum += 1
         self.trialStart = self.univ_clock.getTime()
+        self.onsetTime = None
+        self.keyDownTime = None
+        if Hooks.ACTIVE and not self.round_complete():
+            Hooks.fire(Hooks.ON_TRIAL_START, self, self.trial_number())
     
     def update_info(self):
         """Updates the experimental data output file with a new entry of data 
@@ -128,16 +271,36 @@ class Experiment:
         objinfo = obj.get_object_info()
         objorient = obj.get_orientation()
         duration = self.trialEnd - self.trialStart
-        info = [trial_num, round_num, object_num, objname, objinfo, objorient, \
-        self.trialStart, self.trialEnd, duration, self.grasp_violation]
-        scoring_data = [""] * len(SCORING)
-        self.output.update(info + scoring_data)
+        # the timestamps are given in seconds since the start of the session;
+        # ClockDrift is how far the clock of the timestamps has drifted from the
+        # system's wall clock since the start of the session
+        now = core.getTime()
+        wall = wall_time()
+        onset = keyDown = response = latency = None
+        if self.onsetTime is not None:
+            onset = self.onsetTime - self.timeOrigin
+        if self.keyDownTime is not None:
+            keyDown = self.keyDownTime - self.timeOrigin
+            latency = now - self.keyDownTime
+            if onset is not None:
+                response = keyDown - onset
+        drift = (now - self.timeOrigin) - (wall - self.wallOrigin)
+        record = TrialRecord(trial_num, round_num, object_num, objname, objinfo, objorient, \
+        self.trialStart, self.trialEnd, duration, self.grasp_violation, \
+        onset, keyDown, response, latency, drift)
+        self.output.update(record)
+        self.checkpoint()
         
     def end_experiment(self, abrupt=False):
         """Aborts or uploads the output file depending on whether the experiment
         end early. (Note: if the program crashes, a file will be uploaded)"""
+        if Hooks.ACTIVE:
+            Hooks.fire(Hooks.ON_SESSION_END, self, abrupt)
         if abrupt:
-            print("No file will be created!")
+            if self.output.resumed:
+                print("The file is kept so that the session can be resumed again")
+            else:
+                print("No file will be created!")
             self.output.abort()
             return
         else:
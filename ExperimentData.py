@@ -6,13 +6,67 @@ It prompts the user for information, which is uses the name the file. Throughout
 the program, data may be added to the file, and such file can be closed.
 """
 
-from psychopy import gui, data, core
+from Backend import gui, core, Writer, is_headless
+import SessionIndex
+import StateMachine
+import TrialWriter
+import Hooks
+import glob
+import json
 import os
+import sqlite3
 
 # The following functions are used to ensure valid input, particularly the 
 # date. We want the number of days to match of with the month.
 MONTHS = ["JAN", "FEB", "MAR", "APR", "MAY", "JUN", "JUL", "AUG", "SEP", "OCT", "NOV", "DEC"]
 
+# Layouts of the output file: LONG has one row per scorer per trial, WIDE has one
+# row per trial with a copy of the scoring columns for each scorer.
+LONG = "long"
+WIDE = "wide"
+LAYOUTS = [LONG, WIDE]
+SCORER_COLUMN = "Scorer Name"
+WIDE_COLUMN = "{}: {}"
+# States of the dialogs of initializeFile
+PARTICIPANT_DIALOG = "participant"
+SCORING_DIALOG = "scoring"
+FILLED = "filled"
+CANCELLED = "cancelled"
+# Where a session is, written after every trial so that it can be resumed if
+# the program crashes (see Experiment.checkpoint)
+CHECKPOINT_SUFFIX = "_checkpoint.json"
+CHECKPOINT_VERSION = 1
+
+def loadCheckpoint(path):
+    """Reads the checkpoint of a session.
+    :param path: the path of the checkpoint
+    :type path: string
+    :rtype: dict
+    :raises ValueError: if the file is not a checkpoint this version can resume
+    """
+    with open(path) as checkpoint_file:
+        checkpoint = json.load(checkpoint_file)
+    if checkpoint.get("version") != CHECKPOINT_VERSION:
+        raise ValueError("{} is not a checkpoint of this version".format(path))
+    return checkpoint
+
+def latestCheckpoint(DEBUG=False):
+    """Returns the path of the most recent checkpoint of the data folder, or
+    None if there is none"""
+    folder = "data" if not DEBUG else "tests"
+    paths = glob.glob(os.path.join(os.getcwd(), folder, "*" + CHECKPOINT_SUFFIX))
+    return max(paths, key=os.path.getmtime) if paths else None
+
+def openIndex(folder):
+    """Opens the index of a data folder as it is stored, without reading the
+    folder; it is brought up to date when the session is done (see
+    ExperimentData.done).
+    :param folder: the data folder
+    :type folder: string
+    :rtype: SessionIndex.SessionIndex
+    """
+    return SessionIndex.SessionIndex(folder)
+
 def isLeapYear(yr):
     """Determines if the current year is a leap year.
     :param yr: the year
@@ -43,7 +97,36 @@ def getValidNumDays(month, year):
         return days
     return -1
 
-def initializeFile(expname, dID = "", dS = 0, dY = 2022, dM = "", dD = 0, dScorer=-1, review=False):
+def confirmNewSession(index, participant, session, filename):
+    """Warns the user if the participant already has a session with the same
+    ID in the index, offering to record the new one in a file of its own.
+    :param index: the index of the data folder
+    :type index: SessionIndex.SessionIndex
+    :param participant: participant id
+    :type participant: string
+    :param session: session id
+    :type session: string
+    :param filename: the name of the new session's file (see initializeFile)
+    :type filename: string
+    :rtype: bool
+    :return: whether to go on with these IDs
+    """
+    existing = index.collisions(participant, session)
+    if not existing:
+        return True
+    # the same name the file gets in ExperimentData, so that no earlier file is
+    # written over
+    free = os.path.basename(TrialWriter.free_filepath(os.path.join(index.folder, filename)))
+    warning = gui.Dlg(title="Session already recorded")
+    warning.addText("Participant {} already has a {} session:".format(participant, session))
+    for entry in existing:
+        warning.addText("{date}: {path} ({rows} rows)".format(**entry))
+    warning.addText("Click OK to record this one as {}, or Cancel to change the participant info.".format(
+        free + TrialWriter.CSV_EXTENSION))
+    warning.show()
+    return warning.OK
+
+def initializeFile(expname, dID = "", dS = 0, dY = 2022, dM = "", dD = 0, dScorer=-1, review=False, index=None, trace=None):
     """Returns the name of the output file depending on the responses that the
     user gives when they begin the experiment. 
     :param expname: name of the experiment
@@ -58,112 +141,238 @@ def initializeFile(expname, dID = "", dS = 0, dY = 2022, dM = "", dD = 0, dScore
     :type dM: string 
     :param dD: day    
     :type dD: int
-    :rtype: string 
-    :return: the name of the file for the current experimental session
+    :param index: the index of the data folder, used to warn about sessions
+    already recorded; None not to check
+    :type index: SessionIndex.SessionIndex
+    :param trace: a list the transitions between the dialogs are added to
+    (see StateMachine); None not to keep them
+    :type trace: list
+    :rtype: (string, int, string list, string, string)
+    :return: the name of the file for the current experimental session, the
+    number of scorers, their names, the participant ID and the session ID
     """
-    name = "".join(expname.split(" "))
-    # continue until the responses become valid
-    filename = ""
-    while review or (not review and not (dID and dY and dM and dD and dScorer \
-        and 1 <= dD <= getValidNumDays(dM, dD) and dScorer > 0)):
-        # updates the dialog
+    info = {"dID": dID, "dS": dS, "dY": dY, "dM": dM, "dD": dD, "dScorer": dScorer, "review": review, "names": []}
+
+    def filename():
+        name = "".join(expname.split(" "))
+        return "{}-PID{}-{}_{}{}{}".format(name, info["dID"], info["dS"], info["dY"], info["dM"], info["dD"])
+
+    def valid():
+        return bool(info["dID"] and info["dY"] and info["dM"] and info["dD"] and info["dScorer"] \
+            and 1 <= info["dD"] <= getValidNumDays(info["dM"], info["dD"]) and info["dScorer"] > 0)
+
+    def participant_dialog():
         exp_info = gui.Dlg(title=expname)
         exp_info.addText("---PARTICIPANT INFO---")
-        exp_info.addField("Participant ID: ", dID)
-        exp_info.addField("Session ID: ", initial=dS, choices=["BehavioralTraining","MRI-Part 1","MRI-Part 2"])
+        exp_info.addField("Participant ID: ", info["dID"])
+        exp_info.addField("Session ID: ", initial=info["dS"], choices=["BehavioralTraining","MRI-Part 1","MRI-Part 2"])
         exp_info.addText("---DATE INFO---")
-        exp_info.addField("Year:", dY)
-        exp_info.addField("Month:", choices=MONTHS, initial=dM)
-        exp_info.addField("Day: ", dD)
+        exp_info.addField("Year:", info["dY"])
+        exp_info.addField("Month:", choices=MONTHS, initial=info["dM"])
+        exp_info.addField("Day: ", info["dD"])
         exp_info.addText("---SCORING INFO---")
         exp_info.addField("Number of people scoring the data:", initial=3)
         results = exp_info.show()
-        if exp_info.OK:
-            # user presses ok
-            try:
-                dID = results[0]
-                dS = results[1]
-                dY = int(results[2])
-                dM = results[3]
-                dD = int(results[4])
-                dScorer = int(results[5])
-                review = False
-            except ValueError:
-                pass
-        else:
+        if not exp_info.OK:
             # user cancels
             print("Cancelled!")
-            return None
+            return CANCELLED
+        try:
+            info["dID"] = results[0]
+            info["dS"] = results[1]
+            info["dY"] = int(results[2])
+            info["dM"] = results[3]
+            info["dD"] = int(results[4])
+            info["dScorer"] = int(results[5])
+            info["review"] = False
+        except ValueError:
+            pass
+        if not info["review"] and index is not None and not confirmNewSession(index, info["dID"], info["dS"], filename()):
+            info["review"] = True
+        # continue until the responses become valid
+        if info["review"] or not valid():
+            return PARTICIPANT_DIALOG
+        return SCORING_DIALOG
+
+    def scoring_dialog():
+        scoring_info = gui.Dlg(title="Scoring Menu")
+        for i in range(info["dScorer"]):
+            default = ""
+            if i == 0:
+                default = "Marty"
+            elif i == 1:
+                default = "Tijana"
+            elif i == 2:
+                default = "Steven"
+            else: 
+                default = "Scorer #" + str(i + 1)
+            scoring_info.addField("Scorer #" + str(i + 1), default)
+        info["names"] = scoring_info.show()
+        if scoring_info.OK:
+            return FILLED
+        # back to the participant info
+        info["review"] = True
+        return PARTICIPANT_DIALOG
+
+    dialogs = StateMachine.StateMachine("participant dialogs", {
+        PARTICIPANT_DIALOG: (participant_dialog, [PARTICIPANT_DIALOG, SCORING_DIALOG, CANCELLED]),
+        SCORING_DIALOG: (scoring_dialog, [FILLED, PARTICIPANT_DIALOG])})
+    start = PARTICIPANT_DIALOG if review or not valid() else SCORING_DIALOG
+    state = dialogs.run(start, [FILLED, CANCELLED])
+    if trace is not None:
+        trace.extend(dialogs.trace)
+    if state == CANCELLED:
+        return None
     # returns the name of the file        
-    names = []
-    scoring_info = gui.Dlg(title="Scoring Menu")
-    for i in range(dScorer):
-        default = ""
-        if i == 0:
-            default = "Marty"
-        elif i == 1:
-            default = "Tijana"
-        elif i == 2:
-            default = "Steven"
-        else: 
-            default = "Scorer #" + str(i + 1)
-        scoring_info.addField("Scorer #" + str(i + 1), default)
-    filename = "{}-PID{}-{}_{}{}{}".format(name, dID, dS, dY, dM, dD)
-    names = scoring_info.show()
-    if scoring_info.OK:
-        return (filename, dScorer, names)
-    else:
-        return initializeFile(expname, dID, dS, dY, dM, dD, dScorer, review=True)
+    return (filename(), info["dScorer"], info["names"], info["dID"], info["dS"])
     
 class ExperimentData: 
     """
     This class defines an ExperimentData object. It makes a file that the client
     can update and close. 
     """
-    def __init__(self, experiment_name="", columns=[], DEBUG=False):
+    def __init__(self, experiment_name="", columns=[], scoring=[], DEBUG=False, layout=LONG, resume=None):
         """
         Construct an instance of an ExperimentData object.
         :param experiment_name: name of the experiment to name the file
         :type experiment_name: string
         :param columns: the name of the column of data expected to be added into the file.
         :type columns: string list 
+        :param scoring: the name of the columns left blank for each scorer to fill in.
+        :type scoring: string list 
+        :param layout: the layout of the exported file (LONG or WIDE)
+        :type layout: string
+        :param resume: the checkpoint of a session to go on with (see
+        loadCheckpoint), whose file is appended to without asking for the
+        participant info; None for a new session
+        :type resume: dict
+        :raises ValueError: if a new session would take the place of one that
+        crashed (whose checkpoint or journal is still there)
         """
-        init = initializeFile(experiment_name)
-        if init:
-            (filename, dScorer, names) = init
-            if not filename:
-                core.quit()
-        else:
-            core.quit()
+        if layout not in LAYOUTS:
+            raise ValueError("Unknown layout: {}".format(layout))
         folder = "data" if not DEBUG else "tests"
+        # the index of the data folder is read as it is stored, and brought up
+        # to date when the session is done
+        self.index = None if is_headless() else openIndex(os.getcwd() + os.sep + folder)
+        # transitions between the dialogs, for tracing
+        self.dialog_trace = []
+        if resume is not None:
+            (filename, dScorer, names, participant, session) = (resume["filename"], resume["scorers"],
+                resume["names"], resume["participant"], resume["session"])
+        else:
+            init = initializeFile(experiment_name, index=self.index, trace=self.dialog_trace)
+            if init:
+                (filename, dScorer, names, participant, session) = init
+                if not filename:
+                    core.quit()
+            else:
+                core.quit()
         filepath = os.getcwd() + os.sep + folder + os.sep + filename
+        if resume is None:
+            # the files of a session that crashed are left for it to be resumed
+            checkpoint_path = filepath + CHECKPOINT_SUFFIX
+            if os.path.exists(checkpoint_path) or os.path.exists(filepath + TrialWriter.JOURNAL_EXTENSION):
+                if self.index is not None:
+                    self.index.close()
+                if os.path.exists(checkpoint_path):
+                    raise ValueError("{} was not finished: resume it with --resume {}, or move its files out of the {} folder "
+                                     "to record a new session".format(filename, checkpoint_path, folder))
+                raise ValueError("{} was not finished: move its files out of the {} folder to record a new session".format(filename, folder))
+            # another session with the same info keeps its file
+            free = TrialWriter.free_filepath(filepath)
+            if free != filepath:
+                print("{} is already there, the data is written to {}".format(filename, os.path.basename(free)))
+                (filepath, filename) = (free, os.path.basename(free))
+        self.filepath = filepath
         self.columns = columns
+        self.scoring = scoring
+        self.layout = layout
         self.experiment_name = experiment_name
-        self.d = data.ExperimentHandler(name=self.experiment_name, dataFileName=filepath)
+        self.participant = participant
+        self.session = session
+        self.filename = filename
+        self.resumed = resume is not None
+        self.d = Writer(filepath, columns, resume=self.resumed)
+        if self.resumed:
+            # the checkpoint resumed from goes once the file is done, even if
+            # the session ends before writing a new one
+            self.d.track_checkpoint(CHECKPOINT_SUFFIX)
         self.numScorers = dScorer
         self.namesScorers = names
+        self.blankScoring = [""] * len(scoring)
 
     def update(self, vals=[]):
         """
-        Updates the output file with a row (array) of data. Entries should be None
-        if such data is unavailable. 
-        :param vals: array of new data
-        :type vals: list
+        Updates the output file with a row of data, written once no matter how
+        many scorers there are. Entries should be None if such data is unavailable. 
+        :param vals: the new data, in the order of the columns
+        :type vals: list or Experiment.TrialRecord
+        """
+        self.d.write(vals)
+        if Hooks.ACTIVE:
+            Hooks.fire(Hooks.ON_WRITE, self, vals)
+
+    def attach(self, suffix, text):
+        """Writes a file next to the output file (e.g. the schedule of the session).
+        :param suffix: added to the name of the output file
+        :type suffix: string
+        :param text: the content of the file
+        :type text: string
+        """
+        return self.d.attach(suffix, text)
+
+    def checkpoint(self, state):
+        """Writes the checkpoint of the session once the rows written so far
+        are in the file; it is removed when the file is closed or discarded.
+        :param state: where the session is (see Experiment.checkpoint)
+        :type state: dict
         """
-        it = 0
-        while it < self.numScorers:
-            nvals = len(vals)
-            ncols = len(self.columns)
-            self.d.addData("Scorer Name", self.namesScorers[it])
-            for i in range(0, nvals):
-                self.d.addData(self.columns[i], vals[i])
-                
-            self.d.nextEntry()
-            it += 1
+        checkpoint = {"version": CHECKPOINT_VERSION, "filename": self.filename, "scorers": self.numScorers,
+                      "names": self.namesScorers, "participant": self.participant, "session": self.session}
+        checkpoint.update(state)
+        self.d.checkpoint(CHECKPOINT_SUFFIX, checkpoint)
+
+    def rows_written(self):
+        """Returns the number of rows in the file (including those of the
+        session resumed)"""
+        return self.d.nrows
+
+    def header(self):
+        """Returns the header of the exported file"""
+        if self.layout == WIDE:
+            header = list(self.columns)
+            for name in self.namesScorers:
+                header.extend(WIDE_COLUMN.format(name, field) for field in self.scoring)
+            return header
+        return [SCORER_COLUMN] + self.columns + self.scoring
+
+    def expand(self, row):
+        """Expands a row, as it was written, into the rows of the exported file.
+        :param row: the values of the columns
+        :type row: list
+        :rtype: list list
+        """
+        if self.layout == WIDE:
+            return [list(row) + self.blankScoring * self.numScorers]
+        return [[name] + list(row) + self.blankScoring for name in self.namesScorers]
         
     def done(self):
-        """Closes the file"""
-        self.d.close()
+        """Closes the file, adding the scoring columns of each scorer, and adds
+        it to the index of the data folder, along with the files added, changed
+        or removed since the index was last brought up to date"""
+        path = self.d.close(header=self.header(), expand=self.expand)
+        if self.index is not None:
+            try:
+                self.index.add(path)
+                self.index.update()
+            except (OSError, sqlite3.Error) as err:
+                print("The file could not be added to the index:", err)
+            self.index.close()
         
     def abort(self):
+        """Discards the file (unless the session was resumed, see
+        TrialWriter.abort)"""
         self.d.abort()
+        if self.index is not None:
+            self.index.close()
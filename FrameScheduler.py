@@ -0,0 +1,188 @@
+"""
+FrameScheduler.py is a module used to only redraw the window when what it shows
+changes, rather than redrawing the same screen on every refresh of the monitor.
+
+A screen is drawn and flipped once, then the scheduler sleeps, reading the
+keyboard every few milliseconds, until a key is pressed or a deadline (e.g. the
+next second of a countdown) is reached. The screen keeps showing the last frame
+flipped in the meantime. Countdowns are kept in frames of the monitor, so that
+they tick on a refresh. The scheduler measures how much of the session was
+spent idle, the CPU time used, and the delay between a key press and the first
+frame drawn after it (input latency).
+"""
+import json
+import time
+from Backend import core
+
+# CONSTANTS
+# Seconds slept between two reads of the keyboard while idle; this bounds the
+# input latency
+POLL_INTERVAL = 0.004
+PERCENTILES = [50, 90, 99]
+REPORT_SUFFIX = "_idle.json"
+
+# CLASSES
+class Countdown:
+    """
+    A Countdown counts a number of seconds in frames of the monitor, starting
+    from the frame it is created on.
+    """
+    def __init__(self, scheduler, seconds):
+        """Constructs a Countdown.
+        :param scheduler: the scheduler whose frames are counted
+        :type scheduler: FrameScheduler
+        :param seconds: the length of the countdown
+        :type seconds: float
+        """
+        self.scheduler = scheduler
+        self.rate = scheduler.rate
+        self.frames = int(round(seconds * self.rate))
+        self.start = scheduler.frame()
+
+    def elapsed(self):
+        """Returns the number of frames since the start"""
+        return self.scheduler.frame() - self.start
+
+    def seconds(self):
+        """Returns the number of whole seconds since the start"""
+        return self.elapsed() // self.rate
+
+    def done(self):
+        return self.elapsed() >= self.frames
+
+    def next_tick(self):
+        """Returns the frame on which the next second starts (or the countdown
+        ends)"""
+        return self.start + min((self.seconds() + 1) * self.rate, self.frames)
+
+class FrameScheduler:
+    """
+    The FrameScheduler class decides when the window is redrawn, and sleeps
+    the rest of the time.
+    """
+    def __init__(self, flip, input, frame_period, on_idle=None, poll_interval=POLL_INTERVAL):
+        """Constructs a FrameScheduler.
+        :param flip: flips the window, given the name of the screen shown, and
+        returns the time of the flip (core.getTime())
+        :type flip: function
+        :param input: what the keyboard is read through
+        :type input: InputDispatcher.InputDispatcher
+        :param frame_period: the refresh period of the monitor, in seconds
+        :type frame_period: float
+        :param on_idle: called when the scheduler goes idle (e.g. so that the
+        frame timings do not count the idle time as dropped frames)
+        :type on_idle: function
+        :param poll_interval: seconds slept between two reads of the keyboard
+        :type poll_interval: float
+        """
+        self.flip = flip
+        self.input = input
+        self.frame_period = frame_period
+        self.rate = max(1, int(round(1 / frame_period)))
+        self.on_idle = on_idle
+        self.poll_interval = poll_interval
+        self.dirty = True
+        self.screen = None
+        self.deadline = None
+        self.pending_key = None
+        self.origin = core.getTime()
+        self.cpu_origin = time.process_time()
+        self.drawn = 0
+        self.idle_time = 0.0
+        self.latencies = []
+
+    def frame(self):
+        """Returns the number of monitor frames since the scheduler started"""
+        return int((core.getTime() - self.origin) * self.rate)
+
+    def invalidate(self):
+        """Marks the screen as changed, so that it is redrawn"""
+        self.dirty = True
+
+    def wake_at(self, frame):
+        """Makes sure the scheduler redraws the screen on the given frame"""
+        if self.deadline is None or frame < self.deadline:
+            self.deadline = frame
+
+    def note_keys(self, count):
+        """Remembers when the first of the key presses just read was made"""
+        count = min(count, len(self.input.queue))
+        if count and self.pending_key is None:
+            self.pending_key = self.input.queue[-count].tDown
+
+    def idle(self):
+        """Sleeps until a key is pressed or the deadline is reached (then the
+        screen is marked as changed)."""
+        self.pending_key = None
+        if self.on_idle is not None:
+            self.on_idle()
+        start = core.getTime()
+        while True:
+            count = self.input.poll()
+            if count:
+                self.note_keys(count)
+                break
+            if self.deadline is not None and self.frame() >= self.deadline:
+                self.deadline = None
+                self.dirty = True
+                break
+            core.wait(self.poll_interval, 0)
+        self.idle_time += core.getTime() - start
+
+    def present(self, draw, screen):
+        """Draws and flips the screen if it changed; otherwise waits until it
+        might. The keyboard has been read when this returns.
+        :param draw: draws the screen
+        :type draw: function
+        :param screen: the name of the screen (see FrameTimer.SCREENS); showing
+        another screen than the last one counts as a change
+        :type screen: string
+        :return: the time of the flip (core.getTime()); None if there was none
+        """
+        if screen != self.screen:
+            self.dirty = True
+        if not self.dirty:
+            self.idle()
+            if not self.dirty:
+                return None
+        draw()
+        # the time the flip returns is when the screen actually changed
+        stamp = self.flip(screen)
+        if stamp is None:
+            stamp = core.getTime()
+        self.dirty = False
+        self.screen = screen
+        self.drawn += 1
+        if self.pending_key is not None:
+            self.latencies.append(stamp - self.pending_key)
+            self.pending_key = None
+        self.note_keys(self.input.poll())
+        return stamp
+
+    def summary(self):
+        """Summarizes how the session was drawn.
+        :rtype: dict
+        """
+        wall = core.getTime() - self.origin
+        ordered = sorted(self.latencies)
+        last = len(ordered) - 1
+        return {
+            "seconds": wall,
+            "frames_drawn": self.drawn,
+            "monitor_frames": int(wall * self.rate),
+            "idle_fraction": self.idle_time / wall if wall else 0.0,
+            "cpu_seconds": time.process_time() - self.cpu_origin,
+            "input_latency": {str(pct): ordered[int(round(pct / 100 * last))] for pct in PERCENTILES} if ordered else {},
+        }
+
+    def write(self, filepath):
+        """Writes the summary next to the data file.
+        :param filepath: path of the data file (without extension)
+        :type filepath: string
+        :rtype: string
+        :return: the path of the summary
+        """
+        path = filepath + REPORT_SUFFIX
+        with open(path, "w") as report:
+            json.dump(self.summary(), report, indent=1)
+        return path
@@ -0,0 +1,143 @@
+"""
+FrameTimer.py is a module used to measure how smooth the display was during a
+session.
+
+Every flip of the window is timed and stored, along with the screen that was
+showing and the trial number, in arrays allocated before the session begins.
+At the end of the session, a summary (percentiles, dropped frames per screen,
+and worst stalls) can be written next to the data file.
+"""
+from array import array
+import json
+from Backend import core
+
+# CONSTANTS
+# The screens that the Randomizer shows; their index is what gets stored.
+SCREENS = ["intro", "round", "trial", "confirm", "concluding"]
+# Number of flips the arrays are allocated for (about two hours at 60Hz).
+DEFAULT_CAPACITY = 60 * 60 * 60 * 2
+# A frame counts as dropped if the interval is longer than this many periods.
+DROP_THRESHOLD = 1.5
+PERCENTILES = [50, 90, 99, 99.9]
+NUM_STALLS = 10
+REPORT_SUFFIX = "_frames.json"
+
+# FUNCTIONS
+def percentile(ordered, pct):
+    """Returns the given percentile of a sorted list (nearest rank).
+    :param ordered: sorted values
+    :type ordered: list
+    :param pct: the percentile, between 0 and 100
+    :type pct: float
+    """
+    if not ordered:
+        return 0.0
+    rank = int(round(pct / 100 * (len(ordered) - 1)))
+    return ordered[rank]
+
+# CLASS
+class FrameTimer:
+    """
+    The FrameTimer class records the interval between every flip of a window.
+    """
+    def __init__(self, frame_period=1/60, capacity=DEFAULT_CAPACITY):
+        """Constructs a FrameTimer.
+        :param frame_period: the refresh period of the monitor, in seconds
+        :type frame_period: float
+        :param capacity: number of flips to allocate memory for
+        :type capacity: int
+        """
+        self.frame_period = frame_period
+        self.capacity = capacity
+        self.intervals = array('d', bytes(8 * capacity))
+        self.screens = array('B', bytes(capacity))
+        self.trials = array('l', bytes(array('l').itemsize * capacity))
+        self.count = 0
+        self.last_flip = None
+        self.trial = 0
+
+    def grow(self):
+        """Doubles the arrays if a session goes on longer than expected"""
+        self.intervals.extend(array('d', bytes(8 * self.capacity)))
+        self.screens.extend(array('B', bytes(self.capacity)))
+        self.trials.extend(array('l', bytes(array('l').itemsize * self.capacity)))
+        self.capacity *= 2
+
+    def flip(self, window, screen):
+        """Flips the window and records the interval since the last flip.
+        :param window: the window to flip
+        :type window: visual.Window
+        :param screen: the screen being shown (one of SCREENS)
+        :type screen: string
+        :return: the time of the flip (core.getTime())
+        """
+        stamp = window.flip()
+        if stamp is None:
+            stamp = core.getTime()
+        self.record(stamp, screen)
+        return stamp
+
+    def record(self, stamp, screen):
+        """Records a flip that happened at the given time.
+        :param stamp: the time of the flip, in seconds
+        :type stamp: float
+        :param screen: the screen being shown (one of SCREENS)
+        :type screen: string
+        """
+        if self.last_flip is not None:
+            if self.count == self.capacity:
+                self.grow()
+            self.intervals[self.count] = stamp - self.last_flip
+            self.screens[self.count] = SCREENS.index(screen)
+            self.trials[self.count] = self.trial
+            self.count += 1
+        self.last_flip = stamp
+
+    def pause(self):
+        """Stops timing until the next flip, so that a pause in the flips (e.g.
+        while the screen is idle) does not count as dropped frames"""
+        self.last_flip = None
+
+    def dropped(self, interval):
+        """Returns the number of frames dropped during an interval"""
+        frames = interval / self.frame_period
+        if frames <= DROP_THRESHOLD:
+            return 0
+        return int(round(frames)) - 1
+
+    def summary(self):
+        """Summarizes the recorded flips.
+        :rtype: dict
+        """
+        intervals = self.intervals[:self.count]
+        ordered = sorted(intervals)
+        per_screen = {}
+        for screen in SCREENS:
+            per_screen[screen] = {"flips": 0, "dropped": 0}
+        for idx in range(self.count):
+            counts = per_screen[SCREENS[self.screens[idx]]]
+            counts["flips"] += 1
+            counts["dropped"] += self.dropped(intervals[idx])
+        worst = sorted(range(self.count), key=intervals.__getitem__, reverse=True)[:NUM_STALLS]
+        stalls = [{"interval": intervals[idx], "screen": SCREENS[self.screens[idx]],
+                   "trial": self.trials[idx], "flip": idx} for idx in worst]
+        return {
+            "frame_period": self.frame_period,
+            "flips": self.count,
+            "dropped": sum(counts["dropped"] for counts in per_screen.values()),
+            "percentiles": {str(pct): percentile(ordered, pct) for pct in PERCENTILES},
+            "screens": per_screen,
+            "stalls": stalls,
+        }
+
+    def write(self, filepath):
+        """Writes the summary next to the data file.
+        :param filepath: path of the data file (without extension)
+        :type filepath: string
+        :rtype: string
+        :return: the path of the summary
+        """
+        path = filepath + REPORT_SUFFIX
+        with open(path, "w") as report:
+            json.dump(self.summary(), report, indent=1)
+        return path
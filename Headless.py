@@ -0,0 +1,259 @@
+"""
+Headless.py is a module that stands in for the parts of psychopy used by the
+program, so that the experiment can run without a display, dialogs or a
+person at the keyboard (see Backend.py).
+
+Time is simulated: it only moves forward when a window flips or when advance()
+is called. The keyboard plays back key presses scripted at given times, the
+dialogs answer with scripted responses, and the writer keeps its rows in
+memory.
+"""
+from collections import deque
+from types import SimpleNamespace
+
+# CONSTANTS
+FRAME_PERIOD = 1/60
+
+# SIMULATED TIME
+class SimulatedTime:
+    """The time shared by every headless clock, window, and keyboard"""
+    def __init__(self):
+        self.now = 0.0
+
+    def advance(self, seconds):
+        """Moves the time forward"""
+        self.now += seconds
+        return self.now
+
+    def reset(self):
+        self.now = 0.0
+
+TIME = SimulatedTime()
+
+def advance(seconds):
+    """Moves the simulated time forward by the given number of seconds"""
+    return TIME.advance(seconds)
+
+class Clock:
+    """Stands in for psychopy.core.Clock"""
+    def __init__(self):
+        self.start = TIME.now
+
+    def getTime(self):
+        return TIME.now - self.start
+
+    def reset(self, newT=0.0):
+        self.start = TIME.now + newT
+
+def getTime():
+    return TIME.now
+
+# the clock of core.getTime(), as in psychopy
+monotonicClock = Clock()
+
+def wall_time():
+    """Stands in for time.time(): the wall clock follows the simulated time"""
+    return TIME.now
+
+def wait(secs, hogCPUperiod=0):
+    TIME.advance(secs)
+
+def quit():
+    raise SystemExit
+
+core = SimpleNamespace(Clock=Clock, monotonicClock=monotonicClock, getTime=getTime, wait=wait, quit=quit)
+
+# DIALOGS
+RESPONSES = deque()
+# the dialogs shown, with their texts
+SHOWN = []
+
+def script_responses(*responses):
+    """Queues the responses of the next dialogs, one list of field values per
+    dialog (or None for a cancelled dialog). Dialogs without a scripted
+    response are accepted with their initial values."""
+    RESPONSES.extend(responses)
+
+def script_participant(pid="H001", session="BehavioralTraining", date=(2022, "JAN", 1), scorers=3):
+    """Queues the responses to the participant dialog of initializeFile"""
+    (year, month, day) = date
+    script_responses([pid, session, year, month, day, scorers])
+
+class Dlg:
+    """Stands in for psychopy.gui.Dlg"""
+    def __init__(self, title="", **kwargs):
+        self.title = title
+        self.fields = []
+        self.texts = []
+        self.OK = False
+
+    def addText(self, text, **kwargs):
+        self.texts.append(text)
+
+    def addField(self, label, initial="", choices=None, **kwargs):
+        if choices and initial in ("", None):
+            initial = choices[0]
+        self.fields.append(initial)
+
+    def show(self):
+        SHOWN.append(self)
+        values = RESPONSES.popleft() if RESPONSES else list(self.fields)
+        self.OK = values is not None
+        return values
+
+gui = SimpleNamespace(Dlg=Dlg)
+
+# DATA
+class Writer:
+    """Stands in for TrialWriter.TrialWriter, keeping the rows in memory"""
+    def __init__(self, filepath, columns, **kwargs):
+        self.filepath = filepath
+        self.columns = columns
+        self.rows = []
+        self.nrows = 0
+        self.attachments = {}
+        self.checkpoints = {}
+        self.status = "open"
+
+    def write(self, row):
+        self.rows.append(row)
+        self.nrows += 1
+
+    def checkpoint(self, suffix, data):
+        self.checkpoints[suffix] = data
+
+    def track_checkpoint(self, suffix):
+        pass
+
+    def attach(self, suffix, text):
+        self.attachments[suffix] = text
+        return self.filepath + suffix
+
+    def close(self, header=None, expand=None):
+        self.status = "closed"
+        if expand is not None:
+            self.rows = [expanded for row in self.rows for expanded in expand(list(row))]
+        return self.filepath
+
+    def abort(self):
+        self.status = "aborted"
+
+# VISUAL
+class Window:
+    """Stands in for psychopy.visual.Window; every flip takes one frame"""
+    def __init__(self, fullscr=False, color=None, size=(800, 600), **kwargs):
+        self.size = size
+        self.monitorFramePeriod = FRAME_PERIOD
+        self.nflips = 0
+        self.closed = False
+
+    def flip(self, clearBuffer=True):
+        self.nflips += 1
+        return TIME.advance(self.monitorFramePeriod)
+
+    def clearBuffer(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+class Stim:
+    """Stands in for any psychopy stimulus; drawing it does nothing"""
+    def __init__(self, win=None, text="", image=None, **kwargs):
+        self.win = win
+        self.text = text
+        self.image = image
+        self.color = kwargs.get("color")
+
+    def setText(self, text):
+        self.text = text
+
+    def setColor(self, color):
+        self.color = color
+
+    def setImage(self, image):
+        self.image = image
+
+    def draw(self):
+        pass
+
+visual = SimpleNamespace(Window=Window, TextStim=Stim, ImageStim=Stim, BufferImageStim=Stim)
+
+# KEYBOARD
+KEYS = deque()
+
+def script_keys(*events):
+    """Queues key presses as (time, key) pairs, the time being that of the
+    simulated clock at which the key is pressed."""
+    KEYS.extend(sorted(events))
+
+class KeyPress:
+    """Stands in for psychopy.hardware.keyboard.KeyPress"""
+    def __init__(self, name, tDown):
+        self.name = name
+        self.tDown = tDown
+        self.rt = tDown
+
+    def __eq__(self, other):
+        return self.name == other
+
+    def __hash__(self):
+        return hash(self.name)
+
+class Keyboard:
+    """Stands in for psychopy.hardware.keyboard.Keyboard, playing back the
+    scripted key presses that are due. Like psychopy's, the key presses are
+    stamped on the clock of the keyboard: its own, started when it is created,
+    unless one is given."""
+    def __init__(self, clock=None, **kwargs):
+        self.clock = clock if clock is not None else Clock()
+
+    def stamp(self, t):
+        """Returns the time of the keyboard's clock at the simulated time t"""
+        return t - TIME.now + self.clock.getTime()
+
+    def getKeys(self, keyList=None, waitRelease=True, clear=True):
+        pressed = []
+        kept = deque()
+        while KEYS and KEYS[0][0] <= TIME.now:
+            (t, name) = KEYS.popleft()
+            if keyList is None or name in keyList:
+                pressed.append(KeyPress(name, self.stamp(t)))
+                if not clear:
+                    kept.append((t, name))
+            else:
+                kept.append((t, name))
+        KEYS.extendleft(reversed(kept))
+        return pressed
+
+    def clearEvents(self):
+        while KEYS and KEYS[0][0] <= TIME.now:
+            KEYS.popleft()
+
+keyboard = SimpleNamespace(Keyboard=Keyboard, KeyPress=KeyPress)
+
+# IMAGES
+class NullImage:
+    """Stands in for a decoded PIL image without reading the file"""
+    size = (1, 1)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def convert(self, mode):
+        return self
+
+    def resize(self, size, resample=None):
+        return self
+
+Image = SimpleNamespace(open=lambda path: NullImage(), frombuffer=lambda mode, size, data, *args: NullImage(), LANCZOS=1)
+
+def reset():
+    """Puts the headless backend back in its initial state"""
+    TIME.reset()
+    RESPONSES.clear()
+    SHOWN.clear()
+    KEYS.clear()
@@ -0,0 +1,121 @@
+"""
+Hooks.py is a module used to run code of one's own (e.g. a profiler) at given
+points of a session, without editing the program.
+
+A hook is a function registered for an event; the Experiment, the Randomizer
+and ExperimentData fire the events as the session goes, and every hook of the
+event is called with the event's arguments:
+    on_round_start(experiment, round_num)   a round starts (Experiment.next_round)
+    on_trial_start(experiment, trial_num)   an object is shown (Experiment.next_stimulus)
+    on_trial_end(experiment, trial_num)     its trial was recorded (Experiment.next_stimulus)
+    on_write(output, row)                   a row is written (ExperimentData.update)
+    on_frame(randomizer, screen)            a frame of a trial or message is presented
+                                            (Randomizer.draw_round, Randomizer.display_message)
+    on_flip(randomizer, screen)             the window was flipped (Randomizer.flip)
+    on_session_end(experiment, abrupt)      the output is about to be closed or discarded
+                                            (Experiment.end_experiment)
+The events are only fired while a hook is registered (see ACTIVE), so that
+sessions without hooks do not pay for them. A hook raising an exception is
+unregistered rather than ending the session.
+
+Plugins (objects with a method named after each event they handle) are
+installed with install(), or listed in the RANDOMIZER_PLUGINS environment
+variable, separated by commas: either a plugin of Plugins.py by name (e.g.
+"profile,gc"), or "module:Class" for one's own.
+"""
+import importlib
+import os
+
+# CONSTANTS
+ON_ROUND_START = "on_round_start"
+ON_TRIAL_START = "on_trial_start"
+ON_TRIAL_END = "on_trial_end"
+ON_WRITE = "on_write"
+ON_FRAME = "on_frame"
+ON_FLIP = "on_flip"
+ON_SESSION_END = "on_session_end"
+EVENTS = [ON_ROUND_START, ON_TRIAL_START, ON_TRIAL_END, ON_WRITE, ON_FRAME, ON_FLIP, ON_SESSION_END]
+PLUGINS_VARIABLE = "RANDOMIZER_PLUGINS"
+
+# The hooks of each event
+HOOKS = {event: [] for event in EVENTS}
+# Whether any hook is registered; checked before firing an event
+ACTIVE = False
+
+# FUNCTIONS
+def update_active():
+    global ACTIVE
+    ACTIVE = any(HOOKS.values())
+
+def register(event, hook):
+    """Registers a hook.
+    :param event: one of EVENTS
+    :type event: string
+    :param hook: called with the arguments of the event
+    :type hook: function
+    """
+    if event not in HOOKS:
+        raise ValueError("Unknown event: {}".format(event))
+    HOOKS[event].append(hook)
+    update_active()
+
+def unregister(event, hook):
+    """Unregisters a hook (if it was registered)"""
+    if hook in HOOKS.get(event, []):
+        HOOKS[event].remove(hook)
+    update_active()
+
+def install(plugin):
+    """Registers the methods of a plugin named after an event.
+    :return: the plugin
+    """
+    for event in EVENTS:
+        if hasattr(plugin, event):
+            register(event, getattr(plugin, event))
+    return plugin
+
+def uninstall(plugin):
+    """Unregisters the methods of a plugin"""
+    for event in EVENTS:
+        if hasattr(plugin, event):
+            unregister(event, getattr(plugin, event))
+
+def fire(event, *args):
+    """Calls the hooks of an event (callers check ACTIVE first)"""
+    for hook in list(HOOKS[event]):
+        try:
+            hook(*args)
+        except Exception as err:
+            print("The {} hook {!r} failed and was removed: {}".format(event, hook, err))
+            unregister(event, hook)
+
+def load_plugins(spec=None):
+    """Installs the plugins listed.
+    :param spec: names of plugins of Plugins.py or "module:Class", separated by
+    commas; None to read the RANDOMIZER_PLUGINS environment variable
+    :type spec: string
+    :rtype: list
+    :return: the plugins installed
+    :raises ValueError: listing every plugin that cannot be found, in which
+    case none is installed
+    """
+    if spec is None:
+        spec = os.environ.get(PLUGINS_VARIABLE, "")
+    factories = []
+    problems = []
+    for name in [name.strip() for name in spec.split(",") if name.strip()]:
+        if ":" in name:
+            (module, attr) = name.split(":", 1)
+            try:
+                factories.append(getattr(importlib.import_module(module), attr))
+            except (ImportError, AttributeError) as err:
+                problems.append("Unknown plugin {}: {}".format(name, err))
+        else:
+            import Plugins
+            if name not in Plugins.PLUGINS:
+                problems.append("Unknown plugin: {} (one of {})".format(name, ", ".join(Plugins.PLUGINS)))
+            else:
+                factories.append(Plugins.PLUGINS[name])
+    if problems:
+        raise ValueError("\n".join(problems))
+    return [install(factory()) for factory in factories]
@@ -0,0 +1,143 @@
+"""
+InputDispatcher.py is a module used to read the keyboard once per frame and
+hand the key presses to whoever is interested in them.
+
+The keyboard is drained into a queue a single time per frame (poll). The rest
+of the program then asks the queue for the keys it cares about (take), or lets
+the dispatcher route the queued keys to registered handlers (dispatch). A key
+press is only removed from the queue once it has been taken or handled, so a
+key that arrives while another is being looked at is never lost.
+"""
+from collections import deque
+
+# CONSTANTS
+# The maximum number of key presses held in the queue. The keyboard is always
+# drained; once the queue is full, the oldest key presses without a handler
+# are dropped first, and those of the protected keys (e.g. the quit key) never.
+MAX_QUEUED = 64
+
+# CLASS
+class InputDispatcher:
+    """
+    The InputDispatcher class holds the queue of key presses read from a
+    keyboard, along with the handlers registered for some keys.
+    """
+    def __init__(self, kb, keys=None, maxlen=MAX_QUEUED, protected=()):
+        """Constructs an InputDispatcher.
+        :param kb: the keyboard to read from
+        :type kb: keyboard.Keyboard
+        :param keys: the keys to watch for; None to watch for every key
+        :type keys: string list
+        :param maxlen: the maximum number of key presses kept in the queue
+        :type maxlen: int
+        :param protected: keys whose presses are never dropped from the queue
+        :type protected: string list
+        """
+        self.kb = kb
+        self.keys = list(keys) if keys else None
+        self.maxlen = maxlen
+        self.protected = set(protected)
+        self.queue = deque()
+        self.handlers = {}
+
+    def register(self, keys, handler):
+        """Registers a handler called when one of the keys is dispatched.
+        :param keys: a key or list of keys
+        :type keys: string or string list
+        :param handler: function taking the key press as its only argument
+        :type handler: function
+        """
+        if isinstance(keys, str):
+            keys = [keys]
+        for key in keys:
+            self.handlers[key] = handler
+            if self.keys is not None and key not in self.keys:
+                self.keys.append(key)
+
+    def unregister(self, keys):
+        """Removes the handlers of the given key(s)"""
+        if isinstance(keys, str):
+            keys = [keys]
+        for key in keys:
+            self.handlers.pop(key, None)
+
+    def poll(self):
+        """Drains the keyboard into the queue. This should be called once per
+        frame.
+        :rtype: int
+        :return: the number of key presses added to the queue
+        """
+        events = self.kb.getKeys(keyList=self.keys, clear=True)
+        self.queue.extend(events)
+        if len(self.queue) > self.maxlen:
+            self.trim()
+        return len(events)
+
+    def trim(self):
+        """Drops the oldest key presses until the queue is back to its maximum
+        length: those without a handler first, then the others, never those of
+        the protected keys."""
+        for unhandled in (True, False):
+            excess = len(self.queue) - self.maxlen
+            if excess <= 0:
+                return
+            dropped = []
+            for event in self.queue:
+                if len(dropped) == excess:
+                    break
+                if event.name not in self.protected and (not unhandled or event.name not in self.handlers):
+                    dropped.append(event)
+            if dropped:
+                dropped = set(map(id, dropped))
+                kept = [event for event in self.queue if id(event) not in dropped]
+                self.queue.clear()
+                self.queue.extend(kept)
+
+    def peek(self, *keys):
+        """Returns whether any of the keys is waiting in the queue, without
+        removing it."""
+        for event in self.queue:
+            if event.name in keys:
+                return True
+        return False
+
+    def take(self, *keys):
+        """Removes and returns the oldest queued press of any of the keys.
+        :rtype: KeyPress
+        :return: the key press; or None if none of the keys were pressed
+        """
+        for event in self.queue:
+            if event.name in keys:
+                self.queue.remove(event)
+                return event
+        return None
+
+    def dispatch(self):
+        """Polls the keyboard, then hands the queued key presses with a
+        registered handler to that handler (oldest first). A handler that
+        returns something other than None ends the dispatch, leaving the later
+        key presses queued for the next frame.
+        :return: the value returned by the handler that ended the dispatch; or
+        None if no handler did
+        """
+        self.poll()
+        for event in list(self.queue):
+            handler = self.handlers.get(event.name)
+            if handler is not None:
+                self.queue.remove(event)
+                result = handler(event)
+                if result is not None:
+                    return result
+        return None
+
+    def flush(self, keep=()):
+        """Discards the key presses made before a new screen is shown, except
+        those of the keys in keep.
+        :param keep: keys whose presses should stay in the queue
+        :type keep: string list
+        """
+        self.queue.extend(self.kb.getKeys(keyList=self.keys, clear=True))
+        kept = [event for event in self.queue if event.name in keep]
+        self.queue.clear()
+        self.queue.extend(kept)
+        self.kb.clearEvents()
@@ -49,8 +49,62 @@ def get_display_color(color):
     :rtype: string 
     :return: the displayable version of the color 
     """
-    if color in DISPLAY_COLORS.keys():
-        return DISPLAY_COLORS[color]
+    return DISPLAY_COLORS.get(color)
+
+def parse_stimulus(stimuli):
+    """
+    Breaks the pathname to the stimuli into multiple parts: 1) colors; 2) ratios;
+    and 3) orientation.
+    
+    All stimuli filename has the path name "img/X_Y_A.B_Z.JPG" or 
+    "img/X_Y.JPG," where X is the "colors," A and B are the "ratios," and 
+    Z are the "orientation." 
+    
+    NOTE: Y the length is always discard and thus unused.
+    
+    :param stimuli: the path to the image the novel object
+    :type stimuli: string
+    :rtype: (string or string tuple, string tuple, string)
+    :return: the colors, ratios, and orientation
+    """
+    unclipped_image = stimuli[4:-4] # remove "img/" and ".JPG" from pathname
+    img_info = unclipped_image.split('_')
+    img_info.remove('12in') # everything is 12in so remove it 
+    if len(img_info) > 1: 
+        # will be size 1 if a uniform object
+        # writes the ratios in a readable format
+        (r1, r2) = tuple(img_info[1].split("."))
+        (r1, r2) = (int(r1), int(r2))
+        ratio = ("{}/{}".format(r1, r2), "{}/{}".format(r2-r1,r2))
+        orientation = img_info[-1]
+    else:
+        ratio = ()
+        orientation = ""
+    return (split_color(img_info[0]), ratio, orientation)
+
+def make_labels(colors, ratio, orientation):
+    """
+    Makes the labels of the different aspects regarding ratio and color of a
+    Novel Object.
+    :rtype: (string, string) tuple 
+    :return: (label, color) pairs, left to right
+    """
+    labels = []
+    if type(colors) == str:
+        labels.append((UNIFORM_LABEL.format(colors), colors))
+    else:
+        (c1, c2) = colors
+        (r1, r2) = ratio
+        llabel = LHS_LABEL.format(r1, c1)
+        rlabel = RHS_LABEL.format(r2, c2)
+        labels.append((llabel, c1))
+        labels.append((rlabel, c2))
+    if orientation == "right": # the file name treats essentionally equal objects the same
+        labels.reverse()
+    return tuple(labels)
+
+# Every NovelObject constructed so far, by path, so that each path is parsed once
+INSTANCES = {}
     
 # CLASS
 class NovelObject:
@@ -59,39 +113,48 @@ class NovelObject:
     as well as its labels for when the image is displayed.
     
     NOTE: there is no way to manipulate the attributes of NovelObjects b/c 
-    it is informational only.
+    it is informational only. Everything about the object is worked out once,
+    when it is first constructed, and constructing a NovelObject with the same
+    path again returns that same instance.
     """
-    def __init__(self, stimuli):
+    __slots__ = ["stimuli", "colors", "ratio", "orientation", "labels", 
+                 "display_labels", "object_info"]
+
+    def __new__(cls, stimuli):
         """
-        Constructs a novel object.
+        Constructs a novel object, or returns the one already constructed from
+        the same path.
         
         It does this by breaking the pathname to the stimuli into multiple parts:
-        1) image pathname; 2) colors; 3) ratios; and 4) orientation.
+        1) image pathname; 2) colors; 3) ratios; and 4) orientation (see 
+        parse_stimulus). The labels and the object information are made then too.
         
-        All stimuli filename has the path name "img/X_Y_A.B_Z.JPG" or 
-        "img/X_Y.JPG," where X is the "colors," A and B are the "ratios," and 
-        Z are the "orientation." 
-        
-        NOTE: Y the length is always discard and thus unused.
-        
-        :param colorname: the path to the image the novel object
-        :type colorname: string
-        """
-        unclipped_image = stimuli[4:-4] # remove "img/" and ".JPG" from pathname
-        img_info = unclipped_image.split('_')
-        img_info.remove('12in') # everything is 12in so remove it 
-        if len(img_info) > 1: 
-            # will be size 1 if a uniform object
-            # writes the ratios in a readable format
-            (r1, r2) = tuple(img_info[1].split("."))
-            (r1, r2) = (int(r1), int(r2))
-            self.ratio = ("{}/{}".format(r1, r2), "{}/{}".format(r2-r1,r2))
-            self.orientation = img_info[-1]
-        else:
-            self.ratio = ()
-            self.orientation = ""
-        self.colors = split_color(img_info[0])
-        self.stimuli = stimuli
+        :param stimuli: the path to the image the novel object
+        :type stimuli: string
+        """
+        obj = INSTANCES.get(stimuli)
+        if obj is not None:
+            return obj
+        obj = super().__new__(cls)
+        (colors, ratio, orientation) = parse_stimulus(stimuli)
+        labels = make_labels(colors, ratio, orientation)
+        display_labels = tuple((label, get_display_color(color)) for (label, color) in labels)
+        object_info = " ".join(label for (label, color) in labels)
+        for (attr, value) in [("stimuli", stimuli), ("colors", colors), ("ratio", ratio),
+            ("orientation", orientation), ("labels", labels), 
+            ("display_labels", display_labels), ("object_info", object_info)]:
+            object.__setattr__(obj, attr, value)
+        INSTANCES[stimuli] = obj
+        return obj
+
+    def __setattr__(self, name, value):
+        raise AttributeError("NovelObjects cannot be modified")
+
+    def __delattr__(self, name):
+        raise AttributeError("NovelObjects cannot be modified")
+
+    def __repr__(self):
+        return "NovelObject({!r})".format(self.stimuli)
     
     def essentially_equal(self, nobj2):
         """ Decides if the instance of NovelObject is the same, where same is
@@ -101,9 +164,14 @@ class NovelObject:
         :rtype: bool
         :return: whether the two instances are the same
         """
-        same_color = self.colors == nobj2.get_colors()
-        same_ratio = self.ratio == nobj2.get_ratio()
-        return same_color and same_ratio
+        return self.key() == nobj2.key()
+
+    def key(self):
+        """ Returns what essentially equal objects have in common (their colors
+        and ratio), which can be used to index NovelObjects.
+        :rtype: tuple
+        """
+        return (self.colors, self.ratio)
 
     def get_stimuli(self):
         """
@@ -149,21 +217,16 @@ class NovelObject:
         Returns labels of the different aspects regarding ratio and color of
         the Novel Object.
         :returns labels: (see description)
-        :rtype: (string, string) list 
-        """
-        labels = []
-        if self.is_uniform_object():
-            labels.append((UNIFORM_LABEL.format(self.colors), self.colors))
-        else:
-            (c1, c2) = self.colors
-            (r1, r2) = self.ratio
-            llabel = LHS_LABEL.format(r1, c1)
-            rlabel = RHS_LABEL.format(r2, c2)
-            labels.append((llabel, c1))
-            labels.append((rlabel, c2))
-        if self.orientation == "right": # the file name treats essentionally equal objects the same
-            labels.reverse()
-        return labels
+        :rtype: (string, string) tuple 
+        """
+        return self.labels
+
+    def get_display_labels(self):
+        """
+        Returns the labels along with the color they are displayed in.
+        :rtype: (string, string) tuple 
+        """
+        return self.display_labels
     
     def get_object_info(self): 
         """
@@ -173,10 +236,4 @@ class NovelObject:
         :returns combined: information of the ratio of different aspects of the 
         object as one string 
         """
-        labels = self.get_labels()
-        (fl, c) = labels[0]
-        if self.is_uniform_object(): # uniform object
-            return fl
-        # definitely non-uniform
-        (sl, c) = labels[1]
-        return fl + " " + sl
+        return self.object_info
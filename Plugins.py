@@ -0,0 +1,133 @@
+"""
+Plugins.py is a module of plugins (see Hooks.py) used to find out where the
+time and memory of a session go, on the machines the sessions are run on.
+
+Each plugin writes its report next to the data file when the session is done:
+    profile       cProfile of one trial every few (_profile.txt)
+    tracemalloc   what was allocated between the starts of the rounds (_memory.txt)
+    gc            the pauses of the garbage collector, per generation and per
+                  trial (_gc.json)
+"""
+import cProfile
+import gc
+import io
+import json
+import pstats
+import time
+import tracemalloc
+
+# CONSTANTS
+PROFILE_SUFFIX = "_profile.txt"
+MEMORY_SUFFIX = "_memory.txt"
+GC_SUFFIX = "_gc.json"
+# One trial out of this many is profiled
+PROFILE_EVERY = 10
+# Number of functions (or lines) listed in the reports
+TOP = 30
+
+# CLASSES
+class TrialProfiler:
+    """
+    Profiles one trial out of every few, from the moment its object is shown
+    until it is recorded.
+    """
+    def __init__(self, every=PROFILE_EVERY, top=TOP):
+        self.every = every
+        self.top = top
+        self.profile = cProfile.Profile()
+        self.profiled = []
+
+    def on_trial_start(self, experiment, trial_num):
+        if (trial_num - 1) % self.every == 0:
+            self.profile.enable()
+            self.profiled.append(trial_num)
+
+    def on_trial_end(self, experiment, trial_num):
+        if self.profiled and self.profiled[-1] == trial_num:
+            self.profile.disable()
+
+    def on_session_end(self, experiment, abrupt):
+        self.profile.disable()
+        if abrupt or not self.profiled:
+            return
+        report = io.StringIO()
+        report.write("Trials profiled: {}\n".format(", ".join(map(str, self.profiled))))
+        pstats.Stats(self.profile, stream=report).sort_stats("cumulative").print_stats(self.top)
+        experiment.output.attach(PROFILE_SUFFIX, report.getvalue())
+
+class MemorySnapshots:
+    """
+    Takes a snapshot of the memory allocated at the start of every round, and
+    lists what grew the most since the previous one.
+    """
+    def __init__(self, top=TOP):
+        self.top = top
+        self.started = False
+        self.previous = None
+        self.lines = []
+
+    def on_round_start(self, experiment, round_num):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.started = True
+        snapshot = tracemalloc.take_snapshot()
+        (current, peak) = tracemalloc.get_traced_memory()
+        self.lines.append("Round {}: {:.1f} kB allocated, peak {:.1f} kB".format(round_num, current / 1e3, peak / 1e3))
+        if self.previous is not None:
+            self.lines.extend("    {}".format(stat) for stat in snapshot.compare_to(self.previous, "lineno")[:self.top])
+        self.previous = snapshot
+
+    def on_session_end(self, experiment, abrupt):
+        self.previous = None
+        if self.started:
+            tracemalloc.stop()
+            self.started = False
+        if not abrupt and self.lines:
+            experiment.output.attach(MEMORY_SUFFIX, "\n".join(self.lines) + "\n")
+
+class GCPauses:
+    """
+    Counts the pauses of the garbage collector and how long they lasted, per
+    generation and per trial.
+    """
+    def __init__(self):
+        self.started = None
+        self.trial = 0
+        self.generations = {} # generation -> [count, seconds, longest]
+        self.trials = {} # trial -> [count, seconds]
+        gc.callbacks.append(self.callback)
+
+    def callback(self, phase, info):
+        if phase == "start":
+            self.started = time.perf_counter()
+        elif self.started is not None:
+            pause = time.perf_counter() - self.started
+            self.started = None
+            stats = self.generations.setdefault(info["generation"], [0, 0.0, 0.0])
+            stats[0] += 1
+            stats[1] += pause
+            stats[2] = max(stats[2], pause)
+            stats = self.trials.setdefault(self.trial, [0, 0.0])
+            stats[0] += 1
+            stats[1] += pause
+
+    def on_trial_start(self, experiment, trial_num):
+        self.trial = trial_num
+
+    def summary(self):
+        """Summarizes the pauses.
+        :rtype: dict
+        """
+        return {"generations": {str(generation): {"count": count, "seconds": seconds, "longest": longest}
+                                for (generation, (count, seconds, longest)) in sorted(self.generations.items())},
+                "trials": {str(trial): {"count": count, "seconds": seconds}
+                           for (trial, (count, seconds)) in sorted(self.trials.items())}}
+
+    def on_session_end(self, experiment, abrupt):
+        if self.callback in gc.callbacks:
+            gc.callbacks.remove(self.callback)
+        if not abrupt:
+            experiment.output.attach(GC_SUFFIX, json.dumps(self.summary(), indent=1))
+
+# Plugins by name (see Hooks.load_plugins)
+PLUGINS = {"profile": TrialProfiler, "tracemalloc": MemorySnapshots, "gc": GCPauses}
@@ -0,0 +1,99 @@
+"""
+Preflight.py is a module used to check every image of the stimuli before the
+session starts, rather than finding a missing or corrupt image when its trial
+is reached.
+
+The images are decoded in a pool of threads (decoding does not hold the
+interpreter lock), and checked: each must decode to a non-empty image, and all
+of them must have the same proportions, since they are drawn into the same
+ImageStim. Every problem found is reported at once. Once the window exists, the
+images are resized in the same way to the number of pixels they take up on it,
+so that the textures are no larger than what is shown.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import os
+import TextureCache
+
+# CONSTANTS
+MAX_JOBS = min(8, os.cpu_count() or 1)
+# Largest relative difference between the proportions (width / height) of an
+# image and those of most images
+ASPECT_TOLERANCE = 0.02
+
+# FUNCTIONS
+def inspect(path):
+    """Decodes an image, catching what can go wrong.
+    :param path: the path to the image
+    :type path: string
+    :rtype: (PIL.Image.Image, string)
+    :return: the image, and None; or None, and the problem found
+    """
+    try:
+        image = TextureCache.decode(path)
+    except Exception as err: # PIL raises many kinds of errors for a bad file
+        return (None, "{}: cannot be decoded ({}: {})".format(path, type(err).__name__, err))
+    (width, height) = image.size
+    if width <= 0 or height <= 0:
+        return (None, "{}: the image is empty ({}x{})".format(path, width, height))
+    return (image, None)
+
+def aspect_problems(images):
+    """Finds the images whose proportions differ from those of most images.
+    :param images: the decoded images, keyed by path
+    :type images: dict
+    :rtype: string list
+    """
+    aspects = {path: image.size[0] / image.size[1] for (path, image) in images.items()}
+    if not aspects:
+        return []
+    counts = {}
+    for aspect in aspects.values():
+        counts[round(aspect, 2)] = counts.get(round(aspect, 2), 0) + 1
+    usual = max(counts, key=counts.get)
+    problems = []
+    for (path, aspect) in aspects.items():
+        if abs(aspect / usual - 1) > ASPECT_TOLERANCE:
+            (width, height) = images[path].size
+            problems.append("{}: the image is {}x{}, unlike the others (width / height of {:.2f} instead of {:.2f})".format(
+                path, width, height, aspect, usual))
+    return problems
+
+def check(paths, jobs=MAX_JOBS):
+    """Decodes and checks every image.
+    :param paths: the paths to the images
+    :type paths: string list
+    :param jobs: number of images decoded at once
+    :type jobs: int
+    :rtype: dict
+    :return: the decoded images, keyed by path
+    :raises ValueError: listing every problem found, if there are any
+    """
+    with ThreadPoolExecutor(max_workers=jobs, thread_name_prefix="Preflight") as pool:
+        results = list(pool.map(inspect, paths))
+    images = {}
+    problems = []
+    for (path, (image, problem)) in zip(paths, results):
+        if problem:
+            problems.append(problem)
+        else:
+            images[path] = image
+    problems.extend(aspect_problems(images))
+    if problems:
+        raise ValueError("The preflight found {} problem(s) in the {} stimulus images:\n{}".format(
+            len(problems), len(paths), "\n".join(problems)))
+    return images
+
+def resample_all(images, pixels, jobs=MAX_JOBS):
+    """Resizes every image to the number of pixels it takes up on the window.
+    :param images: the decoded images, keyed by path
+    :type images: dict
+    :param pixels: the size in pixels (see TextureCache.pixel_size)
+    :type pixels: (int, int)
+    :param jobs: number of images resized at once
+    :type jobs: int
+    :rtype: dict
+    """
+    paths = list(images)
+    with ThreadPoolExecutor(max_workers=jobs, thread_name_prefix="Preflight") as pool:
+        resized = pool.map(lambda path: TextureCache.resample(images[path], pixels), paths)
+        return dict(zip(paths, resized))
@@ -0,0 +1,86 @@
+"""
+RandomStreams.py is a module used to make the randomness of a session
+reproducible, one piece at a time.
+
+Every random choice of a session is drawn from a stream keyed by what it is for:
+which object of each pair is unflipped, and the order of each round. A stream
+is derived directly from the seed of the session, the participant, the session
+and its key (by hashing them), rather than by drawing from the streams before
+it, so any one of them (e.g. the order of round 5) can be recreated in constant
+time without replaying the rest of the session. The seed material is saved next
+to the data file.
+"""
+import hashlib
+import json
+import random
+import secrets
+
+# CONSTANTS
+SEED_BITS = 64
+SEED_SUFFIX = "_seed.json"
+# Keys of the streams
+PAIRS = "pairs"
+ROUND = "round"
+
+# FUNCTIONS
+def make_seed():
+    """Returns a new random seed"""
+    return secrets.randbits(SEED_BITS)
+
+def derive(*material):
+    """Derives the seed of a stream from its material (any JSON-serializable
+    values); different material gives independent seeds.
+    :rtype: int
+    """
+    digest = hashlib.blake2b(json.dumps(material).encode(), digest_size=16).digest()
+    return int.from_bytes(digest, "big")
+
+def load(path):
+    """Reads seed material saved next to a data file.
+    :param path: path of the seed file
+    :type path: string
+    :rtype: RandomStreams
+    """
+    with open(path) as seed_file:
+        saved = json.load(seed_file)
+    return RandomStreams(saved["participant"], saved["session"], saved["seed"])
+
+# CLASS
+class RandomStreams:
+    """
+    The RandomStreams class hands out the random streams of a session.
+    """
+    def __init__(self, participant="", session="", seed=None):
+        """Constructs RandomStreams.
+        :param participant: the participant ID
+        :type participant: string
+        :param session: the session ID
+        :type session: string
+        :param seed: the seed of the session; None for a new random one
+        :type seed: int
+        """
+        self.participant = str(participant)
+        self.session = str(session)
+        self.seed = make_seed() if seed is None else seed
+
+    def stream(self, *key):
+        """Returns the stream of the given key.
+        :rtype: random.Random
+        """
+        return random.Random(derive(self.seed, self.participant, self.session, *key))
+
+    def pairs(self):
+        """Returns the stream choosing which object of each pair is unflipped"""
+        return self.stream(PAIRS)
+
+    def round(self, round_num):
+        """Returns the stream ordering a round (starting at 1)"""
+        return self.stream(ROUND, round_num)
+
+    def to_dict(self):
+        """Returns the seed material as JSON-serializable data"""
+        return {"participant": self.participant, "session": self.session, "seed": self.seed}
+
+    def dumps(self):
+        """Returns the seed material as a JSON string"""
+        return json.dumps(self.to_dict())
@@ -2,10 +2,14 @@
 The Randomizer Modules does a bulk of the tasks with regards to the Graphical
 Interface and user interactions with the program. 
 """
-from psychopy.visual import window
-from psychopy import visual, core
-from psychopy.hardware import keyboard 
-import NovelObject
+from Backend import core, visual, keyboard
+import TextureCache
+import TextLayer
+import InputDispatcher
+import FrameTimer
+import FrameScheduler
+import StateMachine
+import Hooks
 
 # Constants, Textual Information, and Templates
 SECONDS_BETW_TRIAL = 3
@@ -34,54 +38,132 @@ DISPLAY_ROUND_MESSAGE = "ROUND {}\n\n[Click the <RIGHT ARROW> to continue or <i>
 CONFIRM_NEXT_ROUND = "The next round is starting in {} seconds...\n [Click <return> to revert]"
 GRASP_WARNING = "You have indicated that the user didn't use the precision grasp on {}!\n\n\n\n\n\n\n\n\n\n\n\n\nTake a moment to correct the participant's grasp.\n[Click 'return' to revert OR 'right' to continue]"
 CONFIRM_WARNING = "We'll mark in the CSV that the participant did not use the precision grasp on {}!"
+EARLY_END_MESSAGE = "THE EXPERIMENT HAS FINISHED EARLY!"
+GRASPS = {"1": "THE FIRST GRASP", "2": "THE SECOND GRASP", "3": "BOTH GRASPS"}
+
+# Keys used by the Randomizer; presses of QUIT_KEYS survive a change of screen
+KEYS = ["escape", "space", "right", "return", "i", "1", "2", "3"]
+QUIT_KEYS = ["escape"]
+# States of the announcement of a round
+ANNOUNCE = "announce"
+INSTRUCTIONS = "instructions"
+COUNTDOWN = "countdown"
+STARTED = "started"
+QUIT = "quit"
 
 class Randomizer:
     """
     The Randomizer class does creates an instance of a Randomizer object, used
     for the graphical interface of the Randomizer.
     """
-    def __init__(self, name, snds=SECONDS_BETW_TRIAL, DEBUG=False):
+    def __init__(self, name, DEBUG=False, texture_capacity=TextureCache.DEFAULT_CAPACITY, frame_report=False):
         """Constructs a Randomizer object as described.
+        :param texture_capacity: the maximum number of bytes of decoded stimulus
+        images kept in the texture cache
+        :param frame_report: whether every flip of the window should be timed
         """
-        SECONDS_BETW_TRIAL = snds
-        self.experimenter_window = window.Window(fullscr = not DEBUG, color = "#2f3fa8")
-        self.main_kb = keyboard.Keyboard()
-        self.main_timer = core.Clock()
-        self.intro_screen = visual.TextStim(self.experimenter_window, text=WELCOME_MESSAGE, height=0.05, wrapWidth = 1.75, alignText="left")
-        self.concluding_screen = visual.TextStim(self.experimenter_window, text=CONCLUDING_MESSAGE)
-        self.round_info = visual.TextStim(self.experimenter_window, wrapWidth = 1.5, color="white", bold=True, height=0.1, pos=(0,0.75))
-        self.next_round = visual.TextStim(self.experimenter_window, wrapWidth = 1.5, height=0.1)
-        self.next_round_confirm = visual.TextStim(self.experimenter_window, wrapWidth = 1.5, height=0.1)
-        self.confirm_warning = visual.TextStim(self.experimenter_window, wrapWidth = 1.5, height=0.1)
+        self.experimenter_window = visual.Window(fullscr = not DEBUG, color = "#2f3fa8")
+        # the key presses are stamped on the timebase of core.getTime(), like
+        # the flips (a keyboard has its own clock otherwise)
+        self.main_kb = keyboard.Keyboard(clock=core.monotonicClock)
+        self.input = InputDispatcher.InputDispatcher(self.main_kb, keys=KEYS, protected=QUIT_KEYS)
+        # Text is rendered once per distinct string; full screen messages are
+        # buffered while the ones drawn over the stimulus are not
+        self.intro_layer = TextLayer.TextLayer(self.experimenter_window, buffered=True, height=0.05, wrapWidth = 1.75, alignText="left")
+        self.concluding_layer = TextLayer.TextLayer(self.experimenter_window, buffered=True)
+        self.message_layer = TextLayer.TextLayer(self.experimenter_window, buffered=True, wrapWidth = 1.5, height=0.1)
+        self.revert_layer = TextLayer.TextLayer(self.experimenter_window, wrapWidth = 1.5, height=0.1)
+        self.warning_layer = TextLayer.TextLayer(self.experimenter_window, wrapWidth = 1.5, height=0.1, color="yellow")
+        self.round_info = TextLayer.TextLayer(self.experimenter_window, wrapWidth = 1.5, color="white", bold=True, height=0.1, pos=(0,0.75))
+        self.intro_screen = self.intro_layer.get(WELCOME_MESSAGE)
+        self.concluding_screen = self.concluding_layer.get(CONCLUDING_MESSAGE)
+        self.concluding_layer.get(EARLY_END_MESSAGE)
+        self.message_layer.precompute(CONFIRM_NEXT_ROUND, range(1, SECONDS_BETW_TRIAL + 2))
+        self.message_layer.precompute(CONFIRM_WARNING, GRASPS.values())
+        self.revert_layer.precompute(REVERT_MESSAGE, range(1, SECONDS_BETW_TRIAL + 1))
+        self.warning_layer.precompute(GRASP_WARNING, GRASPS.values())
         self.lhs_label = visual.TextStim(self.experimenter_window, pos = (-0.25,-0.6))
         self.rhs_label = visual.TextStim(self.experimenter_window, pos = (0.25,-0.6))
         self.uniform_label = visual.TextStim(self.experimenter_window, pos = (0, -0.6))
+        self.textures = TextureCache.TextureCache(self.experimenter_window, capacity=texture_capacity)
         self.image_stim = visual.ImageStim(self.experimenter_window, size=[1, 1])
+        self.current_image = None
+        self.current_labels = []
+        # when the stimulus of the current trial was first shown (core.getTime())
+        self.onset = None
+        self.onset_trial = None
+        self.frames = None
+        if frame_report:
+            self.frames = FrameTimer.FrameTimer(self.experimenter_window.monitorFramePeriod)
+        # the window is only redrawn when what it shows changes
+        self.scheduler = FrameScheduler.FrameScheduler(self.flip, self.input, self.experimenter_window.monitorFramePeriod,
+                                                       on_idle=self.frames.pause if self.frames is not None else None)
+        # the announcement of a round, which the experimenter can revert to
+        # from its countdown as often as they like
+        self.announcement = StateMachine.StateMachine("round announcement", {
+            ANNOUNCE: (self.show_round, [COUNTDOWN, INSTRUCTIONS, QUIT]),
+            INSTRUCTIONS: (self.show_instructions, [ANNOUNCE, QUIT]),
+            COUNTDOWN: (self.count_down_round, [ANNOUNCE, STARTED, QUIT])})
+        self.roundnum = 0
+        self.round_countdown = 3
     
-    def display_message(self, text_stim, time=SECONDS_BETW_TRIAL, end=False):
+    def display_message(self, text_stim, time=SECONDS_BETW_TRIAL, end=False, screen="confirm"):
         """ Displays a given message for as long as need.
         :param text_stim: the message to be displayed
         :time: the amount of time in second to show the message
         :end: whether or not anytime during the message, the randomizer should 
         check if the program has ended or not (and avoid an infinite loop
+        :screen: the screen the message belongs to (see FrameTimer.SCREENS)
         """
-        self.main_timer.reset()
-        while self.main_timer.getTime() < time: 
+        countdown = FrameScheduler.Countdown(self.scheduler, time)
+        self.scheduler.invalidate()
+        while not countdown.done(): 
             if not end and self.check_quit():
                 return -1
-            text_stim.draw() 
-            self.experimenter_window.flip()
+            self.scheduler.wake_at(countdown.next_tick())
+            self.scheduler.present(text_stim.draw, screen)
+            if Hooks.ACTIVE:
+                Hooks.fire(Hooks.ON_FRAME, self, screen)
   
+    def flip(self, screen):
+        """Flips the window, timing the flip if a frame report was asked for.
+        :param screen: the screen being shown (see FrameTimer.SCREENS)
+        :type screen: string
+        :return: the time of the flip (core.getTime()), as the window gives it
+        """
+        if self.frames is None:
+            flip_time = self.experimenter_window.flip()
+        else:
+            flip_time = self.frames.flip(self.experimenter_window, screen)
+        if Hooks.ACTIVE:
+            Hooks.fire(Hooks.ON_FLIP, self, screen)
+        return flip_time
+
+    def write_frame_report(self, filepath):
+        """Writes the summary of the frame timings next to the data file.
+        :param filepath: path of the data file (without extension)
+        :type filepath: string
+        """
+        if self.frames is not None:
+            print("Frame report:", self.frames.write(filepath))
+            print("Idle report:", self.scheduler.write(filepath))
+            print("Announcements:", self.announcement.summary())
+
     def check_quit(self):
         """
         Checks if the experiment has ended. If so, it executes the termination
         process, informing the user that the experiment has ended early. 
         """
-        if "escape" in self.main_kb.getKeys(clear=False):
-            self.concluding_screen.setText("THE EXPERIMENT HAS FINISHED EARLY!")
-            self.end()
+        if self.check_keyboard(*QUIT_KEYS):
+            self.quit()
             return True
         return False
+
+    def quit(self):
+        """Informs the user that the experiment has ended early and closes the
+        window."""
+        self.concluding_screen = self.concluding_layer.get(EARLY_END_MESSAGE)
+        self.end()
             
     def end(self, time = 3):
         """
@@ -90,7 +172,7 @@ class Randomizer:
         :param time: the amount of time to spend on the concluding screen.
         :type time: int 
         """
-        self.display_message(self.concluding_screen, time=time, end=True)
+        self.display_message(self.concluding_screen, time=time, end=True, screen="concluding")
         self.experimenter_window.close() 
             
     def start_up(self):
@@ -98,12 +180,14 @@ class Randomizer:
         again giving the user the opportunity to quit when need, and space to
         continue using it.
         """
-        self.main_kb.clearEvents()
-        while "space" not in self.main_kb.getKeys(clear=False):
+        self.input.flush(keep=QUIT_KEYS)
+        self.scheduler.invalidate()
+        while True:
+            if self.check_keyboard("space"):
+                break
             if self.check_quit():
                 return -1
-            self.intro_screen.draw()
-            self.experimenter_window.flip()
+            self.scheduler.present(self.intro_screen.draw, "intro")
 
     def announce_nxt_round(self, roundnum, time=3):
         """
@@ -112,42 +196,56 @@ class Randomizer:
         :returns None: if everything goes okay
         :returns -1: if the user decides to quit
         """
-        dispMess = DISPLAY_ROUND_MESSAGE.format(roundnum)
-        self.next_round.setText(dispMess)
-        self.main_kb.clearEvents()
-        while "right" not in self.main_kb.getKeys(clear=False):
+        self.roundnum = roundnum
+        self.round_countdown = time
+        if self.announcement.run(ANNOUNCE, [STARTED, QUIT]) == QUIT:
+            return -1
+
+    def show_round(self):
+        """Shows the number of the round until the user continues (state of the
+        announcement)"""
+        next_round = self.message_layer.get(DISPLAY_ROUND_MESSAGE.format(self.roundnum))
+        self.input.flush(keep=QUIT_KEYS)
+        self.scheduler.invalidate()
+        while True:
+            if self.check_keyboard("right"):
+                return COUNTDOWN
             if self.check_keyboard("i"):
-                self.start_up()
-                self.main_kb.clearEvents()
+                return INSTRUCTIONS
             if self.check_quit():
-                return -1
-            self.next_round.draw()
-            self.experimenter_window.flip()
-        self.main_timer.reset()
-        curr = self.main_timer.getTime()
-        self.main_kb.clearEvents()
-        while curr < time:
+                return QUIT
+            self.scheduler.present(next_round.draw, "round")
+
+    def show_instructions(self):
+        """Shows the instructions (state of the announcement)"""
+        if self.start_up() == -1:
+            return QUIT
+        return ANNOUNCE
+
+    def count_down_round(self):
+        """Counts down to the start of the round, unless the user reverts to
+        its announcement (state of the announcement)"""
+        self.input.flush(keep=QUIT_KEYS)
+        # the countdown is redrawn once per second
+        countdown = FrameScheduler.Countdown(self.scheduler, self.round_countdown)
+        self.scheduler.invalidate()
+        while not countdown.done():
             if self.check_quit():
-                return -1
-            if "return" in self.main_kb.getKeys():
-                self.announce_nxt_round(roundnum)
-                break
-            timeLeft = int(time - curr + 1)
-            confirmNext = CONFIRM_NEXT_ROUND.format(timeLeft)
-            self.next_round_confirm.setText(confirmNext)
-            self.next_round_confirm.draw()
-            self.experimenter_window.flip()
-            curr = self.main_timer.getTime()
-        self.main_kb.clearEvents()
-      
-    def check_keyboard(self, key):
-        """Determines if the given key is pressed.
-        :param key: the key to look out for
-        """
-        pressed = key in self.main_kb.getKeys(clear=False)
-        if pressed:
-            self.main_kb.clearEvents()
-        return pressed
+                return QUIT
+            if self.check_keyboard("return"):
+                return ANNOUNCE
+            timeLeft = self.round_countdown - countdown.seconds()
+            self.scheduler.wake_at(countdown.next_tick())
+            self.scheduler.present(lambda: self.message_layer.draw(CONFIRM_NEXT_ROUND.format(timeLeft)), "round")
+        self.input.flush(keep=QUIT_KEYS)
+        return STARTED
+
+    def check_keyboard(self, *keys):
+        """Determines if any of the given keys was pressed since the keyboard
+        was last polled, consuming that key press only.
+        :param keys: the key(s) to look out for
+        """
+        return self.input.take(*keys) is not None
         
     def make_labels(self, stim):
         """
@@ -158,19 +256,19 @@ class Randomizer:
         :rtype labels: visual.TextStim list
         :return labels: Text Stimuli holding the labels of the stimulus.
         """
-        labels = stim.get_labels()
+        labels = stim.get_display_labels()
         labelStim = []
         if stim.is_uniform_object():
             (name, color) = labels[0]
             self.uniform_label.setText(name)
-            self.uniform_label.setColor(NovelObject.get_display_color(color))
+            self.uniform_label.setColor(color)
             labelStim.append(self.uniform_label)
         else:
             ((llabel, c1), (rlabel, c2)) = (labels[0], labels[1])
             self.lhs_label.setText(llabel)
             self.rhs_label.setText(rlabel)
-            self.lhs_label.setColor(NovelObject.get_display_color(c1))
-            self.rhs_label.setColor(NovelObject.get_display_color(c2))
+            self.lhs_label.setColor(c1)
+            self.rhs_label.setColor(c2)
             labelStim.append(self.lhs_label)
             labelStim.append(self.rhs_label)
         return labelStim
@@ -184,51 +282,82 @@ class Randomizer:
         :returns: -1 if experiment is over, True if the experiment should move on, 
         and False if the experiment should continue using the same stimulus
         """
-        self.main_timer.reset()
-        grasp = ""
-        while (warning == 'right' and self.main_timer.getTime() < SECONDS_BETW_TRIAL) or\
-            (warning != 'right' and not self.check_keyboard("right")):
+        countdown = FrameScheduler.Countdown(self.scheduler, SECONDS_BETW_TRIAL)
+        self.scheduler.invalidate()
+        grasp = GRASPS.get(warning, "")
+        while True:
+            if warning == 'right' and countdown.done():
+                break
+            if warning != 'right' and self.check_keyboard("right"):
+                break
             if self.check_quit():
                 return -1
-            message = ""
-            if warning == "1":
-                grasp = "THE FIRST GRASP"
-            elif warning == "2":
-                grasp = "THE SECOND GRASP"
-            elif warning == "3":
-                grasp = "BOTH GRASPS"
-            if "return" in self.main_kb.getKeys(clear=False):
-                self.main_kb.clearEvents()
+            if self.check_keyboard("return"):
+                self.input.flush(keep=QUIT_KEYS)
                 return False
             if warning == 'right':
-                message = REVERT_MESSAGE.format(SECONDS_BETW_TRIAL - int(self.main_timer.getTime()))
+                message = self.revert_layer.get(REVERT_MESSAGE.format(SECONDS_BETW_TRIAL - countdown.seconds()))
+                self.scheduler.wake_at(countdown.next_tick())
             else:
-                message = GRASP_WARNING.format(grasp)
-                self.next_round.setColor("yellow")
-            self.next_round.setText(message)
-            self.image_stim.draw()
-            self.next_round.draw() 
-            self.experimenter_window.flip()
-            self.next_round.setColor("white")
-        self.main_kb.clearEvents()
+                message = self.warning_layer.get(GRASP_WARNING.format(grasp))
+            self.scheduler.present(lambda: (self.image_stim.draw(), message.draw()), "confirm")
+        self.input.flush(keep=QUIT_KEYS)
         if warning != "right":
-            self.confirm_warning.setText(CONFIRM_WARNING.format(grasp))
-            self.display_message(self.confirm_warning)
-        self.main_kb.clearEvents()
+            if self.display_message(self.message_layer.get(CONFIRM_WARNING.format(grasp))) == -1:
+                return -1
+        self.input.flush(keep=QUIT_KEYS)
         return True
        
-    def draw_round(self, info, stim):
+    def preload_stimuli(self, stimuli, decoded=None):
+        """Decodes the images of all of the stimuli before the experiment starts.
+        :param stimuli: the stimuli as given by Stimuli.get_stimuli()
+        :type stimuli: NovelObject list list
+        :param decoded: images already decoded, keyed by path; None if none are
+        :type decoded: dict
+        """
+        self.textures.preload(stimuli, decoded)
+
+    def set_image(self, stim):
+        """Switches the image and labels shown to those of the stimulus, only
+        looking up the texture cache and updating the labels when the stimulus
+        actually changes.
+        :param stim: the stimulus
+        :type stim: NovelObject
+        """
+        path = stim.get_stimuli()
+        if path != self.current_image:
+            self.image_stim = self.textures.get(path)
+            self.current_labels = self.make_labels(stim)
+            self.current_image = path
+
+    def draw_round(self, info, stim, trial=0):
         """Updates the screen with the current stimulus and information.
         :param info: the trial information (round number, object number, and trial number)
         :type info: string
         :param stim: the stimulus 
         :type stim: NovelObject
+        :param trial: the trial number, recorded along with the frame timings and
+        used to tell when a new stimulus is shown (see onset)
+        :type trial: int
         """
-        self.round_info.text = info
-        self.image_stim.setImage(stim.get_stimuli())
-        self.round_info.draw()
+        if self.frames is not None:
+            self.frames.trial = trial
+        self.set_image(stim)
+        if trial != self.onset_trial:
+            self.scheduler.invalidate()
+        flip_time = self.scheduler.present(lambda: self.draw_trial(info), "trial")
+        if flip_time is not None and trial != self.onset_trial:
+            # flip waits for the screen refresh, so this is when the stimulus
+            # appeared
+            self.onset = flip_time
+            self.onset_trial = trial
+        if Hooks.ACTIVE:
+            Hooks.fire(Hooks.ON_FRAME, self, "trial")
+
+    def draw_trial(self, info):
+        """Draws the current stimulus, its labels and the trial information"""
+        self.round_info.draw(info)
         self.image_stim.draw()
-        for lab in self.make_labels(stim):
+        for lab in self.current_labels:
             lab.draw()
-        self.experimenter_window.flip()
         
@@ -0,0 +1,228 @@
+"""
+Schedule.py is a module used to plan a whole session before it starts: which
+object is presented at every trial of every round.
+
+The stimuli given by Stimuli (the flipped and unflipped lists) are put into a
+catalog, and the plan is a flat array of catalog indexes, one per trial, so the
+stimulus of any trial is found in constant time. Odd rounds use the flipped
+list and even rounds the unflipped one, each shuffled (following Constraints, if
+given; see ConstrainedShuffle.py), with its own random stream if given (see
+RandomStreams.py). The schedule is saved next to the data file, along with the
+seed and the constraints it was generated with, so that the session can be
+audited or any of its rounds reproduced afterwards from the saved file alone.
+"""
+from array import array
+import json
+import random
+import NovelObject as nObj
+import ConstrainedShuffle as shuf
+import RandomStreams as rand
+
+# CONSTANTS
+SCHEDULE_SUFFIX = "_schedule.json"
+
+# FUNCTIONS
+def round_list(round_num):
+    """Returns which list of Stimuli.get_stimuli() is used for a round
+    (round numbers start at 1)"""
+    return 1 - round_num % 2
+
+def make_catalog(stimuli):
+    """Lists every distinct stimulus once.
+    :param stimuli: the stimuli as given by Stimuli.get_stimuli()
+    :type stimuli: NovelObject list list
+    :rtype: (NovelObject list, int list list)
+    :return: the catalog, and the catalog indexes of each list of stimuli
+    """
+    catalog = []
+    index = {}
+    indexes = []
+    for stims in stimuli:
+        idxs = []
+        for stim in stims:
+            path = stim.get_stimuli()
+            if path not in index:
+                index[path] = len(catalog)
+                catalog.append(stim)
+            idxs.append(index[path])
+        indexes.append(idxs)
+    return (catalog, indexes)
+
+def order_round(catalog, round_order, rng, shuffler=None, previous=()):
+    """Orders the objects of a round.
+    :param catalog: every distinct stimulus of the session
+    :type catalog: NovelObject list
+    :param round_order: the catalog indexes of the objects of the round
+    :type round_order: int list
+    :param rng: the source of randomness of the round
+    :param shuffler: what orders the objects; None for a plain shuffle
+    :type shuffler: ConstrainedShuffle.ConstrainedShuffle
+    :param previous: the objects presented before the round, in order
+    :type previous: NovelObject list
+    :rtype: int list
+    :return: the catalog indexes of the objects of the round, in their new order
+    """
+    # starts from the indexes in increasing order, so that the result only
+    # depends on which objects are in the round and on rng
+    round_order = sorted(round_order)
+    if shuffler:
+        objs = shuffler.order([catalog[idx] for idx in round_order], previous, rng)
+        index = {catalog[idx].get_stimuli(): idx for idx in round_order}
+        return [index[obj.get_stimuli()] for obj in objs]
+    rng.shuffle(round_order)
+    return round_order
+
+def generate(stimuli, nrounds, rng=random, constraints=None, streams=None):
+    """Plans every round of a session.
+    :param stimuli: the stimuli as given by Stimuli.get_stimuli()
+    :type stimuli: NovelObject list list
+    :param nrounds: number of rounds in the session
+    :type nrounds: int
+    :param rng: the source of randomness (anything with shuffle and random
+    methods); only used without streams
+    :param constraints: what the order of the objects must follow; None for a
+    plain shuffle
+    :type constraints: ConstrainedShuffle.Constraints
+    :param streams: the random streams of the session; if given, each round is
+    ordered with its own stream, so that it can be regenerated on its own
+    (see Schedule.regenerate)
+    :type streams: RandomStreams.RandomStreams
+    :rtype: Schedule
+    """
+    (catalog, indexes) = make_catalog(stimuli)
+    nstims = len(indexes[0])
+    order = array('H')
+    shuffler = shuf.ConstrainedShuffle(constraints, rng) if constraints else None
+    previous = []
+    for round_num in range(1, nrounds + 1):
+        round_rng = streams.round(round_num) if streams else rng
+        round_order = order_round(catalog, indexes[round_list(round_num)], round_rng, shuffler, previous)
+        previous = [catalog[idx] for idx in round_order]
+        order.extend(round_order)
+    reports = shuffler.reports if shuffler else []
+    return Schedule(catalog, order, nrounds, nstims, reports, constraints, streams.to_dict() if streams else None)
+
+def load(path):
+    """Reads a schedule saved with Schedule.save.
+    :param path: path of the schedule file
+    :type path: string
+    :rtype: Schedule
+    """
+    with open(path) as schedule_file:
+        saved = json.load(schedule_file)
+    catalog = [nObj.NovelObject(stim) for stim in saved["catalog"]]
+    constraints = shuf.Constraints(**saved["constraints"]) if saved.get("constraints") else None
+    return Schedule(catalog, array('H', saved["order"]), saved["nrounds"], saved["nstims"],
+                    constraints=constraints, seed=saved.get("seed"))
+
+# CLASS
+class Schedule:
+    """
+    A Schedule is the immutable plan of a session: the stimulus of every trial,
+    round after round.
+    """
+    def __init__(self, catalog, order, nrounds, nstims, reports=(), constraints=None, seed=None):
+        """Constructs a Schedule.
+        :param catalog: every distinct stimulus of the session
+        :type catalog: NovelObject list
+        :param order: catalog index of the stimulus of each trial
+        :type order: array
+        :param nrounds: number of rounds
+        :type nrounds: int
+        :param nstims: number of objects per round
+        :type nstims: int
+        :param reports: what it took to order each round
+        :type reports: ConstrainedShuffle.ShuffleReport list
+        :param constraints: the constraints the rounds were ordered with
+        :type constraints: ConstrainedShuffle.Constraints
+        :param seed: the seed material of the random streams the rounds were
+        ordered with (see RandomStreams.to_dict); None if there were none
+        :type seed: dict
+        """
+        if len(order) != nrounds * nstims:
+            raise ValueError("The plan has {} trials instead of {}".format(len(order), nrounds * nstims))
+        self.catalog = tuple(catalog)
+        self.order = memoryview(order).toreadonly()
+        self.nrounds = nrounds
+        self.nstims = nstims
+        self.reports = tuple(reports)
+        self.constraints = constraints
+        self.seed = seed
+
+    def __len__(self):
+        return len(self.order)
+
+    def index(self, round_num, object_num):
+        """Returns the catalog index of an object of a round (both starting at 1)"""
+        return self.order[(round_num - 1) * self.nstims + object_num - 1]
+
+    def stimulus(self, round_num, object_num):
+        """Returns the stimulus of an object of a round (both starting at 1)"""
+        return self.catalog[self.index(round_num, object_num)]
+
+    def trial(self, trial_num):
+        """Returns the stimulus of a trial (starting at 1)"""
+        return self.catalog[self.order[trial_num - 1]]
+
+    def round(self, round_num):
+        """Returns the stimuli of a round, in order"""
+        start = (round_num - 1) * self.nstims
+        return [self.catalog[idx] for idx in self.order[start:start + self.nstims]]
+
+    def regenerate(self, round_num, streams, constraints=None):
+        """Orders a round again from the random streams it was generated with,
+        without regenerating the rounds before it (the end of the previous
+        round is taken from this schedule). An audit can check that the result
+        matches round(round_num).
+        :param round_num: the round (starting at 1)
+        :type round_num: int
+        :param streams: the random streams of the session
+        :type streams: RandomStreams.RandomStreams
+        :param constraints: the constraints the schedule was generated with
+        :type constraints: ConstrainedShuffle.Constraints
+        :rtype: NovelObject list
+        """
+        start = (round_num - 1) * self.nstims
+        round_order = self.order[start:start + self.nstims].tolist()
+        previous = self.round(round_num - 1) if round_num > 1 else []
+        shuffler = shuf.ConstrainedShuffle(constraints) if constraints else None
+        round_order = order_round(self.catalog, round_order, streams.round(round_num), shuffler, previous)
+        return [self.catalog[idx] for idx in round_order]
+
+    def reproduce(self, round_num):
+        """Orders a round again from the seed and the constraints saved with
+        the schedule (see regenerate).
+        :param round_num: the round (starting at 1)
+        :type round_num: int
+        :rtype: NovelObject list
+        :raises ValueError: if the schedule was not generated with random streams
+        """
+        if self.seed is None:
+            raise ValueError("The schedule was not generated with random streams")
+        return self.regenerate(round_num, rand.RandomStreams(**self.seed), self.constraints)
+
+    def to_dict(self):
+        """Returns the schedule as JSON-serializable data"""
+        return {"nrounds": self.nrounds,
+                "nstims": self.nstims,
+                "catalog": [stim.get_stimuli() for stim in self.catalog],
+                "order": self.order.tolist(),
+                "seed": self.seed,
+                "constraints": self.constraints.to_dict() if self.constraints else None,
+                "shuffle": [report.to_dict() for report in self.reports]}
+
+    def dumps(self):
+        """Returns the schedule as a JSON string"""
+        return json.dumps(self.to_dict())
+
+    def save(self, filepath):
+        """Saves the schedule next to the data file.
+        :param filepath: path of the data file (without extension)
+        :type filepath: string
+        :rtype: string
+        :return: the path of the schedule file
+        """
+        path = filepath + SCHEDULE_SUFFIX
+        with open(path, "w") as schedule_file:
+            schedule_file.write(self.dumps())
+        return path
@@ -0,0 +1,358 @@
+"""
+ScorerAgreement.py is a module used to gather the scoring of the sessions, once
+the scorers have filled in their columns, and to measure how well the scorers
+agree.
+
+Every data file holds the scoring columns (see Experiment.SCORING) of each
+scorer: one row per scorer per trial (long layout), or one copy of the columns
+per scorer (wide layout). Scorers may each fill in their own copy of a file; the
+copies of a session are the files whose names start with the name of the
+session's file (e.g. "...-PID12-MRI-Part 1_2022JAN3 Marty.csv"). The files are
+read in a pool of processes, and the scores are aligned by session, Trial# and
+Scorer Name, a blank in one copy being filled in by another. The other columns
+are aligned by name: the merged file has every column found in any file, blank
+where a file does not have it.
+
+The agreement is computed with NumPy over every trial at once: the intraclass
+correlation (ICC(1), one-way, any number of scorers per trial) and
+Krippendorff's alpha (interval) for the timing columns, and Fleiss' kappa
+(any number of scorers per trial) and the share of agreeing pairs for the grasp
+location and precision columns. The merged scores are written to a single CSV
+file, one row per scorer per trial.
+
+Usage: python ScorerAgreement.py [PATH ...] [--jobs N] [--merged PATH] [--output PATH]
+"""
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import csv
+import json
+import os
+import re
+import numpy as np
+from Experiment import SCORING
+
+# CONSTANTS
+DATA_FOLDER = "data"
+CSV_EXTENSION = ".csv"
+MERGED_FILE = "merged_scoring.csv"
+# Columns of the data files (see Experiment.COL, Experiment.SCORING and
+# ExperimentData)
+TRIAL_COLUMN = "Trial#"
+SCORER_COLUMN = "Scorer Name"
+WIDE_SEPARATOR = ": "
+SESSION_COLUMN = "Session"
+TIMING = ["Time before First Grasp", "First Grasp Lift Off", "Object Placed Down (Time)", "(First) Held For",
+          "Time before Second Grasp", "Second Grasp Lift Off", "(Second) Object Placed Down", "(Second) Held For"]
+CATEGORIES = ["First Grasp Location", "First Grasp Precision", "Second Grasp Location", "Second Grasp Precision"]
+# The name of a session's file ends with its date (see ExperimentData.initializeFile),
+# and a number if another session had the same name (see TrialWriter.free_filepath)
+SESSION_NAME = re.compile(r"^(.*_\d+[A-Za-z]{3}\d+(?:_\d+)?)")
+
+# FUNCTIONS
+def session_key(path):
+    """Returns the name of the session a file (or a scorer's copy of it) belongs to"""
+    name = os.path.basename(path)
+    if name.endswith(CSV_EXTENSION):
+        name = name[:-len(CSV_EXTENSION)]
+    match = SESSION_NAME.match(name)
+    return match.group(1) if match else name
+
+def parse_time(text):
+    """Reads a time scored in seconds, or in minutes and seconds (m:ss.s).
+    :rtype: float
+    :return: the number of seconds; NaN if the text is not a time
+    """
+    try:
+        if ":" in text:
+            (minutes, seconds) = text.split(":", 1)
+            return int(minutes) * 60 + float(seconds)
+        return float(text)
+    except ValueError:
+        return np.nan
+
+def scoring_columns(header):
+    """Finds the scoring columns of a header.
+    :param header: the header of a data file
+    :type header: string list
+    :rtype: (dict, int list)
+    :return: for each scorer named in the header (wide layout) or None (long
+    layout), the index of each column of SCORING; and the indexes of the
+    other columns
+    :raises ValueError: if a scoring column is missing
+    """
+    if SCORER_COLUMN in header:
+        missing = [field for field in SCORING if field not in header]
+        if missing:
+            raise ValueError("no {} column".format(", ".join(missing)))
+        scorers = {None: [header.index(field) for field in SCORING]}
+        scored = set(scorers[None]) | {header.index(SCORER_COLUMN)}
+    else:
+        scorers = {}
+        for (idx, column) in enumerate(header):
+            (name, separator, field) = column.rpartition(WIDE_SEPARATOR)
+            if separator and field in SCORING:
+                scorers.setdefault(name, [None] * len(SCORING))[SCORING.index(field)] = idx
+        incomplete = [name for (name, indexes) in scorers.items() if None in indexes]
+        if not scorers or incomplete:
+            raise ValueError("no scoring columns" if not scorers else "incomplete scoring columns for " + ", ".join(incomplete))
+        scored = {idx for indexes in scorers.values() for idx in indexes}
+    return (scorers, [idx for idx in range(len(header)) if idx not in scored])
+
+def read_scores(path):
+    """Reads the scores of a data file (run in a worker process).
+    :param path: the path of the CSV file
+    :type path: string
+    :rtype: (string, string list, dict, string)
+    :return: the session of the file, the names of the other columns, and for
+    each Trial# the values of the other columns (keyed by name) and the scores
+    of each scorer; or None in place of the last three and the problem found
+    """
+    key = session_key(path)
+    try:
+        with open(path, newline="") as data_file:
+            reader = csv.reader(data_file)
+            header = next(reader, None)
+            if header is None or TRIAL_COLUMN not in header:
+                return (key, None, None, "{}: no {} column".format(path, TRIAL_COLUMN))
+            (scorers, others) = scoring_columns(header)
+            trial_idx = header.index(TRIAL_COLUMN)
+            scorer_idx = header.index(SCORER_COLUMN) if None in scorers else None
+            trials = {}
+            for row in reader:
+                if len(row) < len(header):
+                    continue
+                (base, scores) = trials.setdefault(row[trial_idx], ({header[idx]: row[idx] for idx in others}, {}))
+                for (name, indexes) in scorers.items():
+                    scores[row[scorer_idx] if name is None else name] = [row[idx].strip() for idx in indexes]
+    except (OSError, ValueError, csv.Error) as err:
+        return (key, None, None, "{}: {}".format(path, err))
+    return (key, [header[idx] for idx in others], trials, None)
+
+def merge_scores(sessions, key, trials):
+    """Adds the scores of a file to those of its session, filling in blanks
+    (in the other columns too).
+    :param sessions: for each session, the values of the other columns (keyed
+    by name) and the scores of each scorer, per Trial#
+    :type sessions: dict
+    :param key: the session of the file
+    :type key: string
+    :param trials: the trials of the file (see read_scores)
+    :type trials: dict
+    :rtype: int
+    :return: the number of scores that differ between copies (the first one
+    read is kept)
+    """
+    conflicts = 0
+    session = sessions.setdefault(key, {})
+    for (trial, (base, scores)) in trials.items():
+        (known_base, known) = session.setdefault(trial, (base, {}))
+        if known_base is not base:
+            for (column, value) in base.items():
+                if not known_base.get(column):
+                    known_base[column] = value
+        for (scorer, values) in scores.items():
+            previous = known.setdefault(scorer, values)
+            if previous is values:
+                continue
+            for (idx, value) in enumerate(values):
+                if not previous[idx]:
+                    previous[idx] = value
+                elif value and value != previous[idx]:
+                    conflicts += 1
+    return conflicts
+
+def ratings(sessions, field):
+    """Gathers the non-blank scores of a column.
+    :rtype: (numpy array, list)
+    :return: the trial (numbered across sessions) each score is for, and the
+    scores
+    """
+    column = SCORING.index(field)
+    units = []
+    values = []
+    unit = 0
+    for key in sorted(sessions):
+        for (trial, (base, scores)) in sessions[key].items():
+            for values_of_scorer in scores.values():
+                if values_of_scorer[column]:
+                    units.append(unit)
+                    values.append(values_of_scorer[column])
+            unit += 1
+    return (np.array(units, dtype=np.int64), values)
+
+def pairable(units, *arrays):
+    """Keeps the scores of the trials scored by two scorers or more, with the
+    trials renumbered from 0"""
+    counts = np.bincount(units) if len(units) else np.zeros(0, dtype=np.int64)
+    keep = counts[units] >= 2
+    (trials, units) = np.unique(units[keep], return_inverse=True)
+    return (units,) + tuple(array[keep] for array in arrays)
+
+def interval_agreement(units, values):
+    """Measures the agreement on a timing column.
+    :param units: the trial of each score
+    :type units: numpy array
+    :param values: the scores (seconds)
+    :type values: numpy array
+    :rtype: dict
+    :return: the number of trials and scores, ICC(1) and Krippendorff's alpha
+    (None when undefined)
+    """
+    (units, values) = pairable(units, values)
+    ntrials = int(units.max()) + 1 if len(units) else 0
+    stats = {"trials": ntrials, "scores": len(values), "icc": None, "alpha": None}
+    if ntrials < 2:
+        return stats
+    counts = np.bincount(units).astype(float)
+    sums = np.bincount(units, weights=values)
+    squares = np.bincount(units, weights=values * values)
+    total = len(values)
+    # one-way analysis of variance, with unequal numbers of scores per trial
+    within = (squares - sums * sums / counts).sum()
+    between = (sums * sums / counts).sum() - values.sum() ** 2 / total
+    ms_between = between / (ntrials - 1)
+    ms_within = within / (total - ntrials)
+    k0 = (total - (counts * counts).sum() / total) / (ntrials - 1)
+    denominator = ms_between + (k0 - 1) * ms_within
+    if denominator > 0:
+        stats["icc"] = float((ms_between - ms_within) / denominator)
+    # Krippendorff's alpha: disagreement within trials over that of all pairs
+    observed = (2 * (counts * squares - sums * sums) / (counts - 1)).sum() / total
+    expected = 2 * (total * (values * values).sum() - values.sum() ** 2) / (total * (total - 1))
+    if expected > 0:
+        stats["alpha"] = float(1 - observed / expected)
+    return stats
+
+def nominal_agreement(units, labels):
+    """Measures the agreement on a location or precision column.
+    :param units: the trial of each score
+    :type units: numpy array
+    :param labels: the scores
+    :type labels: string list
+    :rtype: dict
+    :return: the number of trials and scores, the categories, Fleiss' kappa
+    (None when undefined) and the share of pairs of scores that agree
+    """
+    labels = np.char.upper(np.char.strip(np.asarray(labels, dtype=str))) if labels else np.zeros(0, dtype=str)
+    (units, labels) = pairable(units, labels)
+    ntrials = int(units.max()) + 1 if len(units) else 0
+    stats = {"trials": ntrials, "scores": len(labels), "categories": [], "kappa": None, "agreement": None}
+    if ntrials == 0:
+        return stats
+    (categories, codes) = np.unique(labels, return_inverse=True)
+    stats["categories"] = categories.tolist()
+    table = np.bincount(units * len(categories) + codes, minlength=ntrials * len(categories)).reshape(ntrials, len(categories))
+    counts = table.sum(axis=1).astype(float)
+    # agreeing pairs over all pairs, per trial
+    agreement = ((table * (table - 1)).sum(axis=1) / (counts * (counts - 1))).mean()
+    chance = ((table.sum(axis=0) / counts.sum()) ** 2).sum()
+    stats["agreement"] = float(agreement)
+    if chance < 1:
+        stats["kappa"] = float((agreement - chance) / (1 - chance))
+    return stats
+
+def agreement(sessions):
+    """Measures the agreement on every scoring column.
+    :rtype: dict
+    """
+    report = {}
+    for field in TIMING:
+        (units, values) = ratings(sessions, field)
+        times = np.array([parse_time(value) for value in values], dtype=float)
+        known = ~np.isnan(times)
+        report[field] = interval_agreement(units[known], times[known])
+        report[field]["unreadable"] = int((~known).sum())
+    for field in CATEGORIES:
+        report[field] = nominal_agreement(*ratings(sessions, field))
+    return report
+
+def write_merged(sessions, columns, path):
+    """Writes the merged scores, one row per scorer per trial, atomically.
+    :param columns: the names of the other columns, of every file
+    :type columns: string list
+    :rtype: int
+    :return: the number of rows written
+    """
+    nrows = 0
+    partial_path = path + ".partial"
+    with open(partial_path, "w", newline="") as merged:
+        writer = csv.writer(merged)
+        writer.writerow([SESSION_COLUMN, SCORER_COLUMN] + columns + SCORING)
+        for key in sorted(sessions):
+            for (trial, (base, scores)) in sessions[key].items():
+                for (scorer, values) in scores.items():
+                    writer.writerow([key, scorer] + [base.get(column, "") for column in columns] + values)
+                    nrows += 1
+    os.replace(partial_path, path)
+    return nrows
+
+def list_files(paths):
+    """Returns the CSV files of the given files and folders"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(os.path.join(path, name) for name in sorted(os.listdir(path)) if name.endswith(CSV_EXTENSION))
+        else:
+            files.append(path)
+    return files
+
+def gather(paths, jobs=None, merged=MERGED_FILE):
+    """Reads the scores of the given files and folders, writes them merged and
+    measures the agreement of the scorers.
+    :param paths: the data files, or folders of data files
+    :type paths: string list
+    :param jobs: number of worker processes (None for one per CPU)
+    :type jobs: int
+    :param merged: the path of the merged CSV file; None not to write it
+    :type merged: string
+    :rtype: dict
+    :return: the report; the files that could not be read are listed in its
+    "problems"
+    """
+    files = list_files(paths)
+    sessions = {}
+    columns = {} # the other columns of every file, in the order first read
+    problems = []
+    conflicts = 0
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        for (key, header, trials, problem) in pool.map(read_scores, files, chunksize=8):
+            if problem:
+                problems.append(problem)
+                continue
+            columns.update(dict.fromkeys(header))
+            conflicts += merge_scores(sessions, key, trials)
+    report = {"files": len(files) - len(problems), "sessions": len(sessions), "conflicts": conflicts,
+              "problems": problems, "agreement": agreement(sessions)}
+    if merged is not None and columns:
+        report["merged"] = {"path": merged, "rows": write_merged(sessions, list(columns), merged)}
+    return report
+
+def print_report(report):
+    """Prints the agreement of the scorers"""
+    print("{} files, {} sessions, {} conflicting scores".format(report["files"], report["sessions"], report["conflicts"]))
+    for problem in report["problems"]:
+        print("could not read", problem)
+    if "merged" in report:
+        print("merged scores: {path} ({rows} rows)".format(**report["merged"]))
+    number = lambda value: "{:>10.3f}".format(value) if value is not None else "{:>10}".format("-")
+    print("{:<32}{:>8}{:>8}{:>10}{:>10}".format("timing", "trials", "scores", "ICC", "alpha"))
+    for field in TIMING:
+        stats = report["agreement"][field]
+        print("{:<32}{:>8}{:>8}{}{}".format(field, stats["trials"], stats["scores"], number(stats["icc"]), number(stats["alpha"])))
+    print("{:<32}{:>8}{:>8}{:>10}{:>10}".format("category", "trials", "scores", "kappa", "agree"))
+    for field in CATEGORIES:
+        stats = report["agreement"][field]
+        print("{:<32}{:>8}{:>8}{}{}".format(field, stats["trials"], stats["scores"], number(stats["kappa"]), number(stats["agreement"])))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Merge the scores of the sessions and measure the agreement of the scorers")
+    parser.add_argument("paths", nargs="*", default=[DATA_FOLDER])
+    parser.add_argument("--jobs", type=int)
+    parser.add_argument("--merged", default=MERGED_FILE, help="path of the merged CSV file")
+    parser.add_argument("--output", help="path of a JSON file to write the report to")
+    args = parser.parse_args()
+    report = gather(args.paths, args.jobs, args.merged)
+    print_report(report)
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(report, output, indent=1)
@@ -0,0 +1,181 @@
+"""
+SessionIndex.py is a module used to keep track of the data files of every
+session, without listing and parsing the names of the files of the data folder.
+
+The index is an SQLite database in the data folder, with one entry per data
+file: the experiment, participant, session and date read from the name of the
+file (see ExperimentData.initializeFile), the number of rows, a checksum, and
+the modification time and size of the file. An entry is added whenever a
+session is done, and the index can be brought up to date with the folder,
+reading only the files that are new or changed.
+
+Usage: python SessionIndex.py [FOLDER] [--participant ID] [--session ID] [--since YYYY-MM-DD] [--until YYYY-MM-DD]
+"""
+import argparse
+import csv
+import datetime
+import hashlib
+import os
+import re
+import sqlite3
+
+# CONSTANTS
+INDEX_FILE = "sessions.sqlite"
+CSV_EXTENSION = ".csv"
+# {name}-PID{id}-{session}_{year}{month}{day}, as named by initializeFile, with
+# _1, _2... added if another session had the same name (see TrialWriter.free_filepath)
+FILENAME = re.compile(r"^(?P<experiment>.*?)-PID(?P<participant>.*?)-(?P<session>.*)_(?P<year>\d+)(?P<month>[A-Za-z]{3})(?P<day>\d+)(?:_\d+)?$")
+FIELDS = ["path", "experiment", "participant", "session", "date", "rows", "checksum", "mtime", "size"]
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    path TEXT PRIMARY KEY,
+    experiment TEXT,
+    participant TEXT,
+    session TEXT,
+    date TEXT,
+    rows INTEGER,
+    checksum TEXT,
+    mtime REAL,
+    size INTEGER
+);
+CREATE INDEX IF NOT EXISTS sessions_participant ON sessions (participant, session);
+CREATE INDEX IF NOT EXISTS sessions_date ON sessions (date);
+"""
+BLOCK_SIZE = 1 << 16
+
+# FUNCTIONS
+def parse_filename(filename):
+    """Reads what the name of a data file tells about its session.
+    :param filename: the name of the file (with or without its folder and extension)
+    :type filename: string
+    :rtype: dict
+    :return: experiment, participant, session and date (ISO format); None if
+    the file is not named like a data file
+    """
+    name = os.path.basename(filename)
+    if name.endswith(CSV_EXTENSION):
+        name = name[:-len(CSV_EXTENSION)]
+    match = FILENAME.match(name)
+    if not match:
+        return None
+    try:
+        date = datetime.datetime.strptime("{}-{}-{}".format(match["year"], match["month"].title(), match["day"]), "%Y-%b-%d")
+    except ValueError:
+        return None
+    return {"experiment": match["experiment"], "participant": match["participant"],
+            "session": match["session"], "date": date.date().isoformat()}
+
+def checksum(path):
+    """Returns the SHA-256 of a file (hexadecimal)"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as data_file:
+        for block in iter(lambda: data_file.read(BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def count_rows(path):
+    """Returns the number of rows of a CSV file, without its header"""
+    with open(path, newline="") as data_file:
+        return max(sum(1 for row in csv.reader(data_file)) - 1, 0)
+
+# CLASS
+class SessionIndex:
+    """
+    The SessionIndex class reads and updates the index of the data files of a
+    folder.
+    """
+    def __init__(self, folder):
+        """Opens the index of a folder, creating it if there is none.
+        :param folder: the data folder
+        :type folder: string
+        """
+        self.folder = folder
+        self.path = os.path.join(folder, INDEX_FILE)
+        os.makedirs(folder, exist_ok=True)
+        self.db = sqlite3.connect(self.path)
+        self.db.row_factory = sqlite3.Row
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def add(self, path):
+        """Adds (or updates) the entry of a data file.
+        :param path: the path of the CSV file
+        :type path: string
+        :rtype: dict
+        :return: the entry; None if the file is not named like a data file
+        """
+        info = parse_filename(path)
+        if info is None:
+            return None
+        stat = os.stat(path)
+        info.update({"path": os.path.basename(path), "rows": count_rows(path), "checksum": checksum(path),
+                     "mtime": stat.st_mtime, "size": stat.st_size})
+        with self.db:
+            self.db.execute("INSERT OR REPLACE INTO sessions ({}) VALUES ({})".format(
+                ", ".join(FIELDS), ", ".join("?" * len(FIELDS))), [info[field] for field in FIELDS])
+        return info
+
+    def update(self):
+        """Brings the index up to date with the folder, reading only the files
+        that are new or whose modification time or size changed.
+        :rtype: (int, int)
+        :return: the number of entries added or updated, and removed
+        """
+        known = {row["path"]: (row["mtime"], row["size"]) for row in self.db.execute("SELECT path, mtime, size FROM sessions")}
+        present = set()
+        added = 0
+        for name in os.listdir(self.folder):
+            if not name.endswith(CSV_EXTENSION):
+                continue
+            present.add(name)
+            stat = os.stat(os.path.join(self.folder, name))
+            if known.get(name) != (stat.st_mtime, stat.st_size):
+                if self.add(os.path.join(self.folder, name)) is not None:
+                    added += 1
+        removed = [(name,) for name in known if name not in present]
+        with self.db:
+            self.db.executemany("DELETE FROM sessions WHERE path = ?", removed)
+        return (added, len(removed))
+
+    def find(self, participant=None, session=None, since=None, until=None):
+        """Returns the entries matching every criterion given, by date.
+        :param participant: the participant ID
+        :type participant: string
+        :param session: the session ID
+        :type session: string
+        :param since: the first date (ISO format, included)
+        :type since: string
+        :param until: the last date (ISO format, included)
+        :type until: string
+        :rtype: dict list
+        """
+        criteria = [("participant = ?", participant), ("session = ?", session),
+                    ("date >= ?", since), ("date <= ?", until)]
+        criteria = [(clause, value) for (clause, value) in criteria if value is not None]
+        query = "SELECT * FROM sessions"
+        if criteria:
+            query += " WHERE " + " AND ".join(clause for (clause, value) in criteria)
+        query += " ORDER BY date, path"
+        return [dict(row) for row in self.db.execute(query, [value for (clause, value) in criteria])]
+
+    def collisions(self, participant, session):
+        """Returns the sessions already recorded with the same participant and
+        session IDs"""
+        return self.find(participant=str(participant), session=str(session))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Find the sessions of the data folder")
+    parser.add_argument("folder", nargs="?", default="data")
+    parser.add_argument("--participant")
+    parser.add_argument("--session")
+    parser.add_argument("--since")
+    parser.add_argument("--until")
+    args = parser.parse_args()
+    index = SessionIndex(args.folder)
+    (added, removed) = index.update()
+    print("index of {}: {} entries updated, {} removed".format(args.folder, added, removed))
+    for entry in index.find(args.participant, args.session, args.since, args.until):
+        print("{date}  PID {participant:<10} {session:<20} {rows:>5} rows  {checksum:.12}  {path}".format(**entry))
+    index.close()
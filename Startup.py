@@ -0,0 +1,109 @@
+"""
+Startup.py is a module used to get the program ready to run as quickly as
+possible, and to report where the time went.
+
+The work that does not need the window or the experimenter (reading the
+stimuli and decoding their images) is started in background threads before
+psychopy is imported and the participant dialog is shown, so that it is done in
+the meantime. psychopy itself is imported on the main thread (see Backend.py).
+The main thread times each of its phases, and how long it had to wait for the
+background jobs once it needed their results.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import json
+import time
+
+# CONSTANTS
+REPORT_SUFFIX = "_startup.json"
+MAX_JOBS = 4
+
+# CLASS
+class Phase:
+    """
+    Times a phase of the startup on the main thread (used in a with statement).
+    """
+    def __init__(self, startup, name):
+        self.startup = startup
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        self.startup.phases.append((self.name, self.start - self.startup.start, time.perf_counter() - self.start))
+        return False
+
+class Startup:
+    """
+    The Startup class runs the background jobs of the startup and times every
+    phase of it.
+    """
+    def __init__(self, max_jobs=MAX_JOBS):
+        """Constructs a Startup, starting its clock.
+        :param max_jobs: number of background jobs that can run at once
+        :type max_jobs: int
+        """
+        self.start = time.perf_counter()
+        self.executor = ThreadPoolExecutor(max_workers=max_jobs, thread_name_prefix="Startup")
+        self.jobs = {} # name -> future
+        self.durations = {} # name -> seconds the job ran for
+        self.phases = [] # (name, seconds since start, seconds)
+        self.total = 0.0
+
+    def run(self, name, function, *args):
+        """Starts a job in the background.
+        :param name: the name of the job
+        :type name: string
+        :param function: the job
+        :type function: function
+        """
+        def job():
+            start = time.perf_counter()
+            try:
+                return function(*args)
+            finally:
+                self.durations[name] = time.perf_counter() - start
+        self.jobs[name] = self.executor.submit(job)
+
+    def phase(self, name):
+        """Returns a context manager timing a phase of the main thread"""
+        return Phase(self, name)
+
+    def result(self, name):
+        """Waits for a job to finish (timed as a phase) and returns its result;
+        an exception raised by the job is raised here.
+        :param name: the name of the job
+        :type name: string
+        """
+        with self.phase("wait for " + name):
+            return self.jobs[name].result()
+
+    def finish(self):
+        """Waits for every job, and stops the background threads.
+        :rtype: float
+        :return: the number of seconds since the startup began
+        """
+        self.executor.shutdown(wait=True)
+        self.total = time.perf_counter() - self.start
+        return self.total
+
+    def to_dict(self):
+        """Returns the timings as JSON-serializable data"""
+        return {"total": self.total,
+                "phases": [{"name": name, "start": start, "seconds": seconds}
+                           for (name, start, seconds) in self.phases],
+                "jobs": dict(self.durations)}
+
+    def dumps(self):
+        """Returns the timings as a JSON string"""
+        return json.dumps(self.to_dict())
+
+    def report(self):
+        """Returns the timings as lines of text"""
+        lines = ["startup: {:.3f}s".format(self.total)]
+        for (name, start, seconds) in self.phases:
+            lines.append("  {:<24}{:>8.3f}s (at {:.3f}s)".format(name, seconds, start))
+        for (name, seconds) in self.durations.items():
+            lines.append("  {:<24}{:>8.3f}s (background)".format(name, seconds))
+        return "\n".join(lines)
@@ -0,0 +1,96 @@
+"""
+StateMachine.py is a module used to run the screens and dialogs that the
+experimenter can go back and forth between (e.g. reverting the countdown of a
+round back to its announcement) as a loop over states, rather than by calls
+nested in each other.
+
+A machine is given a transition table: for each state, the function run in it,
+which returns the next state, and the states it may go to. The machine stops on
+a state without an entry (a final state). However often the experimenter goes
+back, the stack does not grow; the time spent in each state is added up, and
+the last transitions are kept for tracing. The handlers may also be coroutines
+(see run_async), for a machine driven by an asyncio event loop.
+"""
+from collections import deque
+from Backend import core
+
+# CONSTANTS
+# Number of transitions kept for tracing
+TRACE_LENGTH = 256
+
+# CLASS
+class StateMachine:
+    """
+    The StateMachine class runs a transition table until a final state is
+    reached.
+    """
+    def __init__(self, name, table, trace_length=TRACE_LENGTH):
+        """Constructs a StateMachine.
+        :param name: the name of the machine (in the traces)
+        :type name: string
+        :param table: for each state, the function run in it (taking no
+        argument, returning the next state) and the states it may go to
+        :type table: dict of string -> (function, string list)
+        :param trace_length: number of transitions kept for tracing
+        :type trace_length: int
+        """
+        self.name = name
+        self.table = table
+        self.timings = {state: [0, 0.0] for state in table} # state -> [entries, seconds]
+        self.trace = deque(maxlen=trace_length) # (state, next state, seconds in state)
+        self.state = None
+
+    def run(self, start, final):
+        """Runs the machine from a state until it reaches a final state.
+        :param start: the first state
+        :type start: string
+        :param final: the states the machine stops on
+        :type final: string list
+        :rtype: string
+        :return: the final state reached
+        :raises ValueError: if a state goes to a state it may not go to
+        """
+        self.state = start
+        while self.state not in final:
+            (handler, targets) = self.table[self.state]
+            entered = core.getTime()
+            self.move(handler(), entered)
+        return self.state
+
+    async def run_async(self, start, final):
+        """Runs the machine like run, its handlers being coroutine functions
+        that are awaited in turn.
+        :rtype: string
+        :return: the final state reached
+        :raises ValueError: if a state goes to a state it may not go to
+        """
+        self.state = start
+        while self.state not in final:
+            (handler, targets) = self.table[self.state]
+            entered = core.getTime()
+            self.move(await handler(), entered)
+        return self.state
+
+    def move(self, target, entered):
+        """Records the time spent in the current state, then goes to the next.
+        :param target: the next state
+        :type target: string
+        :param entered: when the current state was entered (core.getTime())
+        :type entered: float
+        :raises ValueError: if the current state may not go to the next
+        """
+        seconds = core.getTime() - entered
+        timing = self.timings[self.state]
+        timing[0] += 1
+        timing[1] += seconds
+        self.trace.append((self.state, target, seconds))
+        if target not in self.table[self.state][1]:
+            raise ValueError("{}: {} cannot go to {}".format(self.name, self.state, target))
+        self.state = target
+
+    def summary(self):
+        """Summarizes the time spent in each state.
+        :rtype: dict
+        """
+        return {state: {"entries": entries, "seconds": seconds}
+                for (state, (entries, seconds)) in self.timings.items()}
@@ -7,6 +7,9 @@ a list of viable stimuli, sorts them into uniform objects, flipped nonuniform ob
 and unflipped nonuniform objects. Then, it ensures that sets of stimuli used will 
 contain all the uniform object and either the flipped or unflipped object (removing 
 its complementary, essentially equal object). 
+
+The pairing is done through a StimulusCatalog, which indexes the objects by their
+colors and ratio, so that it takes linear time no matter how many stimuli there are.
 """
 
 import random 
@@ -28,7 +31,73 @@ def get_stimulus_from_file(file):
                 stims.append(text[0]) # fill list with first row
     return stims
 
-def pick_stimuli(uniform, left_oriented, right_oriented):
+ORIENTATIONS = ["left", "right"]
+
+class StimulusCatalog:
+    """
+    A StimulusCatalog indexes NovelObjects by their colors and ratio, with a slot
+    for each orientation, keeping track of the objects that are duplicated or
+    that have no complement.
+    """
+    def __init__(self, objects):
+        """ Constructs a StimulusCatalog.
+        :param objects: the objects to index
+        :type objects: NovelObject list
+        """
+        self.uniform = []
+        self.slots = {} # (colors, ratio) -> {orientation: NovelObject}
+        self.duplicates = []
+        uniform_keys = set()
+        for obj in objects:
+            key = obj.key()
+            orientation = obj.get_orientation()
+            if orientation in ORIENTATIONS:
+                slot = self.slots.setdefault(key, {})
+                if orientation in slot:
+                    self.duplicates.append(obj)
+                else:
+                    slot[orientation] = obj
+            elif key in uniform_keys:
+                self.duplicates.append(obj)
+            else:
+                uniform_keys.add(key)
+                self.uniform.append(obj)
+
+    def unpaired(self):
+        """ Returns the objects whose complement (the same object in the other
+        orientation) is missing.
+        :rtype: NovelObject list
+        """
+        return [obj for slot in self.slots.values() if len(slot) == 1 for obj in slot.values()]
+
+    def problems(self):
+        """ Describes what prevents the objects from being paired.
+        :rtype: string list
+        :returns: one line per duplicated or unpaired object; empty if there are none
+        """
+        lines = ["duplicate: " + obj.get_stimuli() for obj in self.duplicates]
+        lines += ["unpaired: " + obj.get_stimuli() for obj in self.unpaired()]
+        return lines
+
+    def pick(self, rng=random):
+        """ Picks, for each pair of complementary objects, which one is unflipped
+        and which one is flipped.
+        :param rng: the source of randomness (anything with a randint method)
+        :rtype: NovelObject list list
+        :returns: A list of two lists consisting of the novel objects, where each object 
+        in either list has a complement in the other and not in the same list 
+        """
+        flipped = list(self.uniform)
+        unflipped = list(self.uniform)
+        for slot in self.slots.values():
+            if len(slot) != 2:
+                continue
+            orient_choice = rng.randint(0, len(ORIENTATIONS) - 1)
+            unflipped.append(slot[ORIENTATIONS[orient_choice]])
+            flipped.append(slot[ORIENTATIONS[1 - orient_choice]])
+        return [flipped, unflipped]
+
+def pick_stimuli(uniform, left_oriented, right_oriented, rng=random):
     """ Selects a random object from the left_oriented or right_oriented lists of 
     NovelObjects, being sure to add their complementary to the other.
     :param uniform: list of uniform NovelObjects
@@ -37,74 +106,49 @@ def pick_stimuli(uniform, left_oriented, right_oriented):
     :type left_oriented: NovelObjects list
     :param right_oriented: list of uniform NovelObjects that are flipped 
     :type right_oriented: NovelObjects list
+    :param rng: the source of randomness (anything with a randint method)
     :rtype: NovelObject list list 
     :returns: A list of two lists consisting of the novel objects, where each object 
     in either list has a complement in the other and not in the same list 
     """
-    orientations = [left_oriented, right_oriented]
-    flipped = []
-    unflipped = []
-    # adds the uniform objects to both lists (they'll always present in both orientations)
-    for obj in uniform:
-        flipped.append(obj)
-        unflipped.append(obj)
-    # Choose a random object from some random orientation, and add its complement to 
-    # the other orientation list, placing the first in the unflipped list and the second
-    # in the flipped list
-    while not len(left_oriented) == 0 or not len(right_oriented) == 0:
-        orient_choice = random.randint(0, len(orientations) - 1)
-        item_choice = random.randint(0, len(orientations[orient_choice]) - 1)
-        chosen_item = orientations[orient_choice].pop(item_choice)
-        other = orientations[1-orient_choice]
-        for (idx, test) in enumerate(other):
-            if test.essentially_equal(chosen_item):
-                flipped.append(test)
-                other.remove(test)
-                break
-        unflipped.append(chosen_item)
-    return [flipped, unflipped]
+    # the uniform objects are added to both lists (they'll always present in both
+    # orientations); for every pair, a random one goes in the unflipped list and its
+    # complement in the flipped list
+    return StimulusCatalog(uniform + left_oriented + right_oriented).pick(rng)
 
-def setup_experiment(stimulus_list):
+def setup_experiment(stimulus_list, rng=random):
     """ Construct and Sorts NovelObjects into whether they are flipped ("right") 
     or unflipped ("left")
     :param stimulus_list: list of stimuli filenames
     :type stimulus_list: string list
+    :param rng: the source of randomness (anything with a randint method)
     :rtype: NovelObject list list 
     :returns: A list of two lists consisting of the novel objects, where each object 
     in either list has a complement in the other and not in the same list 
+    :raises ValueError: if some stimuli are duplicated or have no complement
     """
-    uniform = []
-    left = []
-    right = []
     all_stimuli = get_stimulus_from_file(stimulus_list)
-    for stim in all_stimuli:
-        # construct object
-        novObj = nObj.NovelObject(stim)
-        # sorts the object
-        orientation = novObj.get_orientation()
-        if orientation == "left":
-            left.append(novObj)
-        elif orientation == "right":
-            right.append(novObj)
-        else:
-            uniform.append(novObj)
+    # construct and sort the objects
+    catalog = StimulusCatalog([nObj.NovelObject(stim) for stim in all_stimuli])
+    problems = catalog.problems()
+    if problems:
+        raise ValueError("Cannot pair the stimuli of {}:\n{}".format(stimulus_list, "\n".join(problems)))
     # returns the randomly chosen stimuli
-    if len(left) != len(right):
-        return None
-    return pick_stimuli(uniform, left, right)
+    return catalog.pick(rng)
         
 class Stimuli:
     """
     This class defines the regimen of stimuli used for the experiment. It does so
     by random picking objects of random orientations.
     """
-    def __init__(self, filename):
+    def __init__(self, filename, rng=random):
         """ Constructs a Stimuli (see descriptions above for how such objects
         are defined.)
         :param stimulus_list: filenames
         :type stimulus_list: string 
+        :param rng: the source of randomness (anything with a randint method)
         """
-        self.stimuli = setup_experiment(filename)
+        self.stimuli = setup_experiment(filename, rng)
         
     def get_stimuli(self):
         """ Return the stimuli
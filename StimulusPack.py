@@ -0,0 +1,186 @@
+"""
+StimulusPack.py is a module used to compile the images of the stimuli into a
+single pack file, so that they do not have to be decoded when the program
+starts.
+
+A pack starts with MAGIC, the length of its index and the size in pixels the
+images were resized to, followed by the index (JSON: the path, size, offset and
+source modification time of every image), then the raw RGBA pixels of each
+image, already resized to the number of pixels it takes up on the window, each
+starting on a page boundary. The program checks that size against its window
+(see main.py), as a pack built for another window would be resampled anyway.
+The pack is memory-mapped when opened, and its images are read straight from
+the mapping without copying, so opening it costs almost nothing and the pages
+are shared by every program using it. A pack that cannot be used (built by an
+older version, or truncated) is reported, and the images are decoded as if
+there were no pack.
+
+Usage: python StimulusPack.py [MANIFEST] [--output PATH] [--size WIDTH HEIGHT]
+"""
+import argparse
+import json
+import mmap
+import os
+import struct
+from Backend import Image
+import Stimuli as stim
+import Preflight
+
+# CONSTANTS
+STIMULI_FILE = "behavioral_stimuli.csv"
+PACK_FILE = "stimuli.pack"
+MAGIC = b"RNDPACK2"
+# MAGIC, length of the index, width and height the images were resized to
+HEADER = struct.Struct("<8sQII")
+MODE = "RGBA"
+BYTES_PER_PIXEL = 4
+# Every block of pixels starts on a page boundary
+ALIGNMENT = mmap.PAGESIZE
+# Pixels taken up by a stimulus on the default window (800x600)
+DEFAULT_SIZE = (400, 300)
+
+# FUNCTIONS
+def align(offset):
+    """Returns the first page boundary at or after the offset"""
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+def source_mtime(path):
+    """Returns the modification time of an image, or None if it does not exist"""
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+
+def build(paths, output=PACK_FILE, size=DEFAULT_SIZE):
+    """Compiles images into a pack.
+    :param paths: the paths to the images
+    :type paths: string list
+    :param output: the path of the pack
+    :type output: string
+    :param size: the size in pixels the images are resized to
+    :type size: (int, int)
+    :rtype: int
+    :return: the size of the pack in bytes
+    :raises ValueError: listing every problem with the images (see Preflight)
+    """
+    paths = list(dict.fromkeys(paths))
+    size = tuple(size)
+    images = Preflight.resample_all(Preflight.check(paths), size)
+    entries = []
+    for path in paths:
+        (width, height) = images[path].size
+        entries.append({"path": path, "width": width, "height": height, "mtime": source_mtime(path)})
+    # the offsets are counted from the first page after the index
+    offset = 0
+    for entry in entries:
+        entry["offset"] = offset
+        offset = align(offset + entry["width"] * entry["height"] * BYTES_PER_PIXEL)
+    index = json.dumps(entries).encode()
+    start = align(HEADER.size + len(index))
+    partial_path = output + ".partial"
+    with open(partial_path, "wb") as pack:
+        pack.write(HEADER.pack(MAGIC, len(index), *size))
+        pack.write(index)
+        for entry in entries:
+            pack.seek(start + entry["offset"])
+            pack.write(images[entry["path"]].convert(MODE).tobytes())
+        pack.truncate(start + offset)
+    os.replace(partial_path, output)
+    return start + offset
+
+def open_pack(path=PACK_FILE):
+    """Opens a pack if there is one that can be used; a pack that cannot is
+    reported, and the images are to be decoded instead.
+    :param path: the path of the pack
+    :type path: string
+    :rtype: StimulusPack
+    :return: the pack, or None if the file does not exist or cannot be used
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        return StimulusPack(path)
+    except (OSError, ValueError) as err:
+        print("The stimulus pack cannot be used, the images are decoded instead:", err)
+        return None
+
+# CLASS
+class StimulusPack:
+    """
+    The StimulusPack class reads the images of a pack, mapped into memory.
+    """
+    def __init__(self, path):
+        """Opens a pack.
+        :param path: the path of the pack
+        :type path: string
+        :raises ValueError: if the file is not a pack, was built by an older
+        version of this module, or is truncated
+        """
+        self.path = path
+        with open(path, "rb") as pack:
+            self.map = mmap.mmap(pack.fileno(), 0, access=mmap.ACCESS_READ)
+        magic = bytes(self.map[:len(MAGIC)])
+        if magic != MAGIC:
+            self.map.close()
+            if magic[:-1] == MAGIC[:-1]:
+                raise ValueError("{} was built by an older version of StimulusPack.py; rebuild it".format(path))
+            raise ValueError("{} is not a stimulus pack".format(path))
+        try:
+            (magic, index_length, width, height) = HEADER.unpack_from(self.map)
+            start = HEADER.size
+            entries = json.loads(bytes(self.map[start:start + index_length]))
+            self.entries = {entry["path"]: entry for entry in entries}
+            end = max([entry["offset"] + entry["width"] * entry["height"] * BYTES_PER_PIXEL for entry in entries], default=0)
+        except (struct.error, ValueError, KeyError, TypeError):
+            self.map.close()
+            raise ValueError("{} is damaged or truncated; rebuild it".format(path))
+        # the size in pixels the images were resized to
+        self.size = (width, height)
+        self.start = align(start + index_length)
+        if self.start + end > len(self.map):
+            self.map.close()
+            raise ValueError("{} is truncated; rebuild it".format(path))
+        self.buffer = memoryview(self.map)
+
+    def __contains__(self, path):
+        return path in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def missing(self, paths):
+        """Returns the paths that are not in the pack, or whose image changed
+        since the pack was built"""
+        missing = []
+        for path in paths:
+            entry = self.entries.get(path)
+            mtime = source_mtime(path)
+            if entry is None or (mtime is not None and mtime != entry["mtime"]):
+                missing.append(path)
+        return missing
+
+    def image(self, path):
+        """Returns an image of the pack, without copying its pixels.
+        :param path: the path of the image when the pack was built
+        :type path: string
+        :rtype: PIL.Image.Image
+        """
+        entry = self.entries[path]
+        (width, height) = (entry["width"], entry["height"])
+        offset = self.start + entry["offset"]
+        pixels = self.buffer[offset:offset + width * height * BYTES_PER_PIXEL]
+        return Image.frombuffer(MODE, (width, height), pixels, "raw", MODE, 0, 1)
+
+    def images(self, paths):
+        """Returns the images of the given paths, keyed by path"""
+        return {path: self.image(path) for path in paths}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compile the images of the stimuli into a pack")
+    parser.add_argument("manifest", nargs="?", default=STIMULI_FILE)
+    parser.add_argument("--output", default=PACK_FILE)
+    parser.add_argument("--size", type=int, nargs=2, default=DEFAULT_SIZE, metavar=("WIDTH", "HEIGHT"))
+    args = parser.parse_args()
+    paths = stim.get_stimulus_from_file(args.manifest)
+    nbytes = build(paths, args.output, args.size)
+    print("{} images packed in {} ({:.1f} MB)".format(len(set(paths)), args.output, nbytes / 1e6))
@@ -0,0 +1,71 @@
+"""
+TextLayer.py is a module used to render text for the Randomizer only once.
+
+Calling setText on a TextStim lays out the glyphs again, so changing the text on
+every frame is costly. A TextLayer keeps one rendered copy of every distinct
+string it is asked to draw, so that showing a string again (e.g. a countdown
+tick) only swaps which cached copy gets drawn.
+"""
+from Backend import visual
+
+# CLASS
+class TextLayer:
+    """
+    The TextLayer class holds rendered copies of strings that share the same
+    style. If the layer is buffered, each string is captured once into an image
+    of the whole window, which is cheaper to draw than the text itself; this
+    should only be used for screens where the text is the only thing drawn.
+    """
+    def __init__(self, window, buffered=False, **style):
+        """Constructs a TextLayer.
+        :param window: the window the text is drawn to
+        :type window: visual.Window
+        :param buffered: whether each string is captured into a buffer image
+        :type buffered: bool
+        :param style: keyword arguments passed to every TextStim of the layer
+        """
+        self.window = window
+        self.buffered = buffered
+        self.style = style
+        self.rendered = {}
+
+    def __contains__(self, text):
+        return text in self.rendered
+
+    def get(self, text):
+        """Returns the rendered copy of the text, rendering it if need be.
+        :param text: the string to render
+        :type text: string
+        :rtype: visual.TextStim or visual.BufferImageStim
+        """
+        stim = self.rendered.get(text)
+        if stim is None:
+            stim = self.render(text)
+            self.rendered[text] = stim
+        return stim
+
+    def render(self, text):
+        """Lays out the text (and captures it if the layer is buffered).
+        :param text: the string to render
+        :type text: string
+        """
+        text_stim = visual.TextStim(self.window, text=text, **self.style)
+        if not self.buffered:
+            return text_stim
+        buffer_stim = visual.BufferImageStim(self.window, stim=[text_stim])
+        self.window.clearBuffer() # nothing captured should end up on screen
+        return buffer_stim
+
+    def precompute(self, template, values):
+        """Renders every variant of a template ahead of time.
+        :param template: a string to be formatted (e.g. CONFIRM_NEXT_ROUND)
+        :type template: string
+        :param values: the values the template is formatted with
+        :type values: list
+        """
+        for value in values:
+            self.get(template.format(value))
+
+    def draw(self, text):
+        """Draws the rendered copy of the text"""
+        self.get(text).draw()
@@ -0,0 +1,170 @@
+"""
+TextureCache.py is a module used to keep the images of the stimuli decoded and
+ready to be drawn, so that the Randomizer does not decode (and upload) the same
+image on every frame.
+
+Each stimulus path gets its own ImageStim whose texture is created once, from
+the image resized to the number of pixels it takes up on the window. The
+cache is bounded by an approximate memory cap, evicting the least recently
+used image when the cap is exceeded.
+"""
+from collections import OrderedDict
+from Backend import visual, Image
+
+# CONSTANTS
+# Default memory cap (in bytes) of the decoded images held in the cache.
+DEFAULT_CAPACITY = 256 * 1024 * 1024
+# Number of bytes used per pixel once the image is uploaded as RGBA.
+BYTES_PER_PIXEL = 4
+
+# FUNCTIONS
+def estimate_size(image):
+    """Estimates the number of bytes used by a decoded image.
+    :param image: the decoded image
+    :type image: PIL.Image.Image
+    :rtype: int
+    :return: the approximate number of bytes held by the texture
+    """
+    (width, height) = image.size
+    return width * height * BYTES_PER_PIXEL
+
+def pixel_size(window, size):
+    """Returns the number of pixels an image takes up on the window.
+    :param window: the window (in normalized units)
+    :type window: visual.Window
+    :param size: the size of the image in normalized units
+    :type size: list
+    :rtype: (int, int)
+    """
+    (width, height) = window.size
+    return (max(1, int(round(size[0] * width / 2))), max(1, int(round(size[1] * height / 2))))
+
+def resample(image, pixels):
+    """Resizes an image to the number of pixels it takes up on the window,
+    unless it already has that size.
+    :param image: the decoded image
+    :type image: PIL.Image.Image
+    :param pixels: the size in pixels
+    :type pixels: (int, int)
+    :rtype: PIL.Image.Image
+    """
+    if tuple(image.size) == tuple(pixels):
+        return image
+    return image.resize(pixels, Image.LANCZOS)
+
+def decode(path):
+    """Decodes the image at the given path. This does not need the window, so
+    it can be done in another thread.
+    :param path: the path to the image
+    :type path: string
+    :rtype: PIL.Image.Image
+    """
+    with Image.open(path) as img:
+        return img.convert("RGB")
+
+def decode_all(paths):
+    """Decodes the images at the given paths.
+    :param paths: the paths to the images
+    :type paths: string list
+    :rtype: dict
+    :return: the decoded images keyed by path
+    """
+    return {path: decode(path) for path in paths}
+
+# CLASS
+class TextureCache:
+    """
+    The TextureCache class holds ImageStim objects keyed by the path to their
+    image, evicting the least recently used when the memory cap is exceeded.
+    """
+    def __init__(self, window, capacity=DEFAULT_CAPACITY, size=[1, 1]):
+        """Constructs a TextureCache.
+        :param window: the window the images are drawn to
+        :type window: visual.Window
+        :param capacity: the maximum number of bytes of decoded images to keep
+        :type capacity: int
+        :param size: the size of the ImageStim objects that are created
+        :type size: list
+        """
+        self.window = window
+        self.capacity = capacity
+        self.size = size
+        self.pixels = pixel_size(window, size)
+        self.entries = OrderedDict() # path -> (ImageStim, bytes)
+        self.used = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __contains__(self, path):
+        return path in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, path):
+        """Returns the ImageStim of the given path, decoding the image only if
+        it is not already cached.
+        :param path: the path to the image
+        :type path: string
+        :rtype: visual.ImageStim
+        """
+        if path in self.entries:
+            self.hits += 1
+            self.entries.move_to_end(path)
+            return self.entries[path][0]
+        self.misses += 1
+        return self.load(path)
+
+    def load(self, path, image=None):
+        """Decodes the image at the given path and adds it to the cache.
+        :param path: the path to the image
+        :type path: string
+        :param image: the image already decoded, if it was
+        :type image: PIL.Image.Image
+        :rtype: visual.ImageStim
+        """
+        if image is None:
+            image = decode(path)
+        image = resample(image, self.pixels)
+        nbytes = estimate_size(image)
+        image_stim = visual.ImageStim(self.window, image=image, size=self.size)
+        self.entries[path] = (image_stim, nbytes)
+        self.used += nbytes
+        self.evict()
+        return image_stim
+
+    def preload(self, stimuli, decoded=None):
+        """Decodes the images of every stimulus given, so that the first time
+        each stimulus is shown does not cost a decode.
+        :param stimuli: the stimuli as given by Stimuli.get_stimuli()
+        :type stimuli: NovelObject list list
+        :param decoded: images already decoded (see decode_all), keyed by path;
+        None if none are
+        :type decoded: dict
+        """
+        if decoded is None:
+            decoded = {}
+        for stims in stimuli:
+            for stim in stims:
+                path = stim.get_stimuli()
+                if path not in self.entries:
+                    self.load(path, decoded.get(path))
+
+    def evict(self):
+        """Removes the least recently used images until the cache fits its
+        capacity. The most recently added image is always kept."""
+        while self.used > self.capacity and len(self.entries) > 1:
+            (path, (image_stim, nbytes)) = self.entries.popitem(last=False)
+            self.used -= nbytes
+
+    def clear(self):
+        """Removes every image from the cache"""
+        self.entries.clear()
+        self.used = 0
+
+    def stats(self):
+        """Returns the hit and miss counters of the cache.
+        :rtype: dict
+        """
+        return {"hits": self.hits, "misses": self.misses,
+                "entries": len(self.entries), "bytes": self.used}
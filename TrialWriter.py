@@ -0,0 +1,289 @@
+"""
+TrialWriter.py is a module used to write the rows of data collected during the
+experiment without making the experiment wait on the disk.
+
+Each row is handed to a background thread, which appends it to a journal (a
+CSV file, line buffered, with its header as the first line). The journal is
+synced to the disk in batches. When the experiment is done, the journal becomes
+the output CSV file, each of its rows optionally expanded into several (e.g.
+one per scorer); if the experiment is aborted, it is deleted. If the program
+crashes, the journal holds every row written up to that point, and a writer
+can be reopened on it to go on with the session (see recover); the journal of
+a resumed session is kept if it is aborted, so that it can be resumed again.
+The writer never overwrites a journal or a CSV file that is already there (see
+free_filepath).
+
+A checkpoint (a small JSON file describing where the session is) can be handed
+to the background thread along with the rows; it is serialized and written,
+atomically, once the rows handed before it are in the journal, so it is never
+ahead of the journal. A checkpoint that cannot be written is reported, and the
+rows keep being written.
+"""
+import csv
+import json
+import os
+import queue
+import threading
+import time
+
+# CONSTANTS
+JOURNAL_EXTENSION = ".journal"
+CSV_EXTENSION = ".csv"
+PARTIAL_EXTENSION = ".partial"
+# The journal is synced to the disk after this many rows, or once it has not
+# been synced for this many seconds
+SYNC_ROWS = 32
+SYNC_SECONDS = 1.0
+# Markers handed to the background thread instead of a row
+STOP = object()
+IDLE = object()
+
+# FUNCTIONS
+def free_filepath(filepath, extensions=(CSV_EXTENSION, JOURNAL_EXTENSION)):
+    """Returns a path for an output file that is not taken yet: the path given,
+    or, if a file with one of the extensions is already there, the path with
+    _1, _2... added.
+    :param filepath: path of the output file (without extension)
+    :type filepath: string
+    :param extensions: the extensions of the files that must not exist
+    :type extensions: string tuple
+    :rtype: string
+    """
+    candidate = filepath
+    copy = 0
+    while any(os.path.exists(candidate + extension) for extension in extensions):
+        copy += 1
+        candidate = "{}_{}".format(filepath, copy)
+    return candidate
+
+def recover(journal_path, columns):
+    """Gets a journal left by a crash ready to be written to again, dropping a
+    last row that was only partly written.
+    :param journal_path: the path of the journal
+    :type journal_path: string
+    :param columns: the header the journal must have
+    :type columns: string list
+    :rtype: int
+    :return: the number of rows in the journal
+    :raises ValueError: if the journal has another header
+    """
+    with open(journal_path, "rb+") as journal:
+        data = journal.read()
+        journal.truncate(data.rfind(b"\n") + 1)
+    with open(journal_path, newline="") as journal:
+        reader = csv.reader(journal)
+        if next(reader, None) != list(columns):
+            raise ValueError("{} does not have the columns of the experiment".format(journal_path))
+        return sum(1 for row in reader)
+
+# CLASSES
+class Checkpoint:
+    """A checkpoint handed to the background thread"""
+    def __init__(self, path, data):
+        self.path = path
+        self.data = data
+
+    def write(self):
+        partial_path = self.path + PARTIAL_EXTENSION
+        with open(partial_path, "w") as checkpoint:
+            json.dump(self.data, checkpoint)
+        os.replace(partial_path, self.path)
+
+class TrialWriter:
+    """
+    The TrialWriter class writes rows to a journal in a background thread, and
+    turns the journal into a CSV file when closed.
+    """
+    def __init__(self, filepath, columns, sync_rows=SYNC_ROWS, sync_seconds=SYNC_SECONDS, resume=False):
+        """Constructs a TrialWriter, creating the journal.
+        :param filepath: path of the output file (without extension), which
+        must not be taken by another session's journal (see free_filepath)
+        :type filepath: string
+        :param columns: the header of the file
+        :type columns: string list
+        :param sync_rows: number of rows written between syncs
+        :type sync_rows: int
+        :param sync_seconds: maximum number of seconds between syncs
+        :type sync_seconds: float
+        :param resume: whether to append to the journal left by a session that
+        crashed rather than to create it (see recover), and keep it if the
+        session is aborted
+        :type resume: bool
+        :raises FileExistsError: if a new journal would overwrite another one
+        """
+        self.filepath = filepath
+        self.journal_path = filepath + JOURNAL_EXTENSION
+        self.csv_path = filepath + CSV_EXTENSION
+        self.columns = columns
+        self.sync_rows = sync_rows
+        self.sync_seconds = sync_seconds
+        self.rows = queue.SimpleQueue()
+        self.error = None
+        self.nrows = 0
+        self.attached = []
+        self.checkpoints = set()
+        self.resume = resume
+        if resume:
+            self.nrows = recover(self.journal_path, columns)
+            self.journal = open(self.journal_path, "a", newline="", buffering=1)
+            self.csv_writer = csv.writer(self.journal)
+        else:
+            self.journal = open(self.journal_path, "x", newline="", buffering=1)
+            self.csv_writer = csv.writer(self.journal)
+            self.csv_writer.writerow(columns)
+        self.thread = threading.Thread(target=self.run, name="TrialWriter", daemon=True)
+        self.thread.start()
+
+    def write(self, row):
+        """Hands a row to the background thread; this never waits on the disk.
+        :param row: the values of the row, in the order of the columns
+        :type row: any iterable
+        """
+        self.rows.put(row)
+
+    def run(self):
+        """Appends the rows to the journal until the writer is closed (runs in
+        the background thread)."""
+        unsynced = 0
+        last_sync = time.monotonic()
+        while True:
+            try:
+                row = self.rows.get(timeout=self.sync_seconds)
+            except queue.Empty:
+                row = IDLE
+            if row is STOP:
+                break
+            if isinstance(row, Checkpoint):
+                if self.error is None:
+                    try:
+                        row.write()
+                    except OSError as err:
+                        print("The checkpoint could not be written:", err)
+                continue
+            if row is not IDLE and self.error is None:
+                try:
+                    self.csv_writer.writerow(row)
+                    self.nrows += 1
+                    unsynced += 1
+                except OSError as err:
+                    self.error = err
+            now = time.monotonic()
+            if unsynced and (unsynced >= self.sync_rows or now - last_sync >= self.sync_seconds):
+                self.sync()
+                unsynced = 0
+                last_sync = now
+        self.sync()
+
+    def sync(self):
+        """Forces the journal to the disk"""
+        try:
+            self.journal.flush()
+            os.fsync(self.journal.fileno())
+        except OSError as err:
+            self.error = err
+
+    def stop(self):
+        """Waits for the rows still queued to be written, then closes the
+        journal."""
+        self.rows.put(STOP)
+        self.thread.join()
+        self.journal.close()
+
+    def close(self, header=None, expand=None):
+        """Turns the journal into the output CSV file.
+        :param header: the header of the CSV file; None to keep the journal's
+        :type header: string list
+        :param expand: function expanding a row of the journal into a list of
+        rows of the CSV file; None to keep the rows as they are
+        :type expand: function
+        :rtype: string
+        :return: the path of the CSV file, another than planned if a file was
+        written there in the meantime
+        """
+        self.stop()
+        if self.error is not None:
+            raise self.error
+        if os.path.exists(self.csv_path):
+            self.csv_path = free_filepath(self.filepath, (CSV_EXTENSION,)) + CSV_EXTENSION
+            print("{} is already there, the data is written to {}".format(self.filepath + CSV_EXTENSION, self.csv_path))
+        if header is None and expand is None:
+            os.replace(self.journal_path, self.csv_path)
+        else:
+            self.export(header, expand)
+            os.remove(self.journal_path)
+        self.remove_checkpoints()
+        return self.csv_path
+
+    def export(self, header, expand):
+        """Streams the journal into the CSV file, one row at a time"""
+        partial_path = self.csv_path + PARTIAL_EXTENSION
+        with open(self.journal_path, newline="") as journal, \
+            open(partial_path, "w", newline="") as output:
+            reader = csv.reader(journal)
+            writer = csv.writer(output)
+            journal_header = next(reader)
+            writer.writerow(header if header is not None else journal_header)
+            for row in reader:
+                if expand is None:
+                    writer.writerow(row)
+                else:
+                    writer.writerows(expand(row))
+            output.flush()
+            os.fsync(output.fileno())
+        os.replace(partial_path, self.csv_path)
+
+    def attach(self, suffix, text):
+        """Writes a file next to the output file, atomically.
+        :param suffix: added to the path of the output file
+        :type suffix: string
+        :param text: the content of the file
+        :type text: string
+        :rtype: string
+        :return: the path of the file
+        """
+        path = self.filepath + suffix
+        partial_path = path + PARTIAL_EXTENSION
+        with open(partial_path, "w") as attached:
+            attached.write(text)
+        os.replace(partial_path, path)
+        if path not in self.attached:
+            self.attached.append(path)
+        return path
+
+    def checkpoint(self, suffix, data):
+        """Writes a JSON file next to the output file (in the background
+        thread, atomically) once the rows written so far are in the journal.
+        The file is removed when the writer is closed or aborted.
+        :param suffix: added to the path of the output file
+        :type suffix: string
+        :param data: the content of the file (not to be changed afterwards)
+        :type data: JSON-serializable data
+        """
+        path = self.filepath + suffix
+        self.checkpoints.add(path)
+        self.rows.put(Checkpoint(path, data))
+
+    def track_checkpoint(self, suffix):
+        """Makes the writer remove a checkpoint it did not write (that of the
+        session it resumes) when it is closed, like its own.
+        :param suffix: added to the path of the output file
+        :type suffix: string
+        """
+        self.checkpoints.add(self.filepath + suffix)
+
+    def remove_checkpoints(self):
+        for path in self.checkpoints:
+            if os.path.exists(path):
+                os.remove(path)
+
+    def abort(self):
+        """Discards the journal and the files attached to it, unless the session
+        was resumed: then they are kept (with the checkpoint) so that it can be
+        resumed again."""
+        self.stop()
+        if self.resume:
+            return
+        self.remove_checkpoints()
+        for path in [self.journal_path] + self.attached:
+            if os.path.exists(path):
+                os.remove(path)
@@ -0,0 +1,150 @@
+"""
+benchmark.py runs simulated sessions of the experiment on the headless backend
+(see Backend.py), so that performance regressions in the experimental control
+can be caught without a person at a monitor.
+
+Each session goes through the Stimuli setup, every round (next_round) and
+every trial (next_stimulus, which records the trial through update_info), then
+ends the experiment. The report gives the throughput, the latency of each step,
+and the memory allocated per session.
+
+Usage: python benchmark.py [--sessions N] [--rounds R] [--stimuli FILE] [--json PATH]
+"""
+import argparse
+import contextlib
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+os.environ["RANDOMIZER_BACKEND"] = "headless" # before anything imports Backend
+import Headless
+import Experiment as ex
+
+# CONSTANTS
+STIMULI_FILE = "behavioral_stimuli.csv"
+NAME = "Perceptual Balance Task"
+STEPS = ["setup", "next_round", "next_stimulus", "update_info", "end_experiment"]
+# Simulated number of seconds a participant spends on each object
+TRIAL_LENGTH = 5
+
+# FUNCTIONS
+def summarize(samples):
+    """Summarizes the latencies of a step (in microseconds).
+    :param samples: the latencies in seconds
+    :type samples: float list
+    :rtype: dict
+    """
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+    last = len(ordered) - 1
+    return {"count": len(ordered),
+            "mean": sum(ordered) / len(ordered) * 1e6,
+            "p50": ordered[last // 2] * 1e6,
+            "p99": ordered[int(last * 0.99)] * 1e6,
+            "max": ordered[last] * 1e6}
+
+def timed(function, samples):
+    """Wraps a function so that its latency is added to samples"""
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        result = function(*args, **kwargs)
+        samples.append(time.perf_counter() - start)
+        return result
+    return wrapper
+
+def run_session(stimuli_file, nrounds, latencies, on_end=None):
+    """Runs one simulated session.
+    :param stimuli_file: path to the CSV file listing the stimuli
+    :type stimuli_file: string
+    :param nrounds: number of rounds of the session
+    :type nrounds: int
+    :param latencies: the latencies of every step, keyed by step name
+    :type latencies: dict
+    :param on_end: called once every trial is run, before the session ends
+    :type on_end: function
+    :rtype: int
+    :return: the number of trials run
+    """
+    Headless.script_participant()
+    start = time.perf_counter()
+    exp = ex.Experiment(NAME, stimuli_file, nrounds=nrounds, DEBUG=True, constraints=ex.ROUND_CONSTRAINTS)
+    latencies["setup"].append(time.perf_counter() - start)
+    exp.update_info = timed(exp.update_info, latencies["update_info"])
+    next_round = timed(exp.next_round, latencies["next_round"])
+    next_stimulus = timed(exp.next_stimulus, latencies["next_stimulus"])
+    trials = 0
+    while not exp.experiment_complete():
+        next_round()
+        next_stimulus()
+        while not exp.round_complete():
+            Headless.advance(TRIAL_LENGTH)
+            next_stimulus()
+            trials += 1
+    if on_end:
+        on_end()
+    timed(exp.end_experiment, latencies["end_experiment"])()
+    return trials
+
+def run(sessions, nrounds, stimuli_file=STIMULI_FILE):
+    """Runs the benchmark.
+    :param sessions: number of simulated sessions
+    :type sessions: int
+    :param nrounds: number of rounds per session
+    :type nrounds: int
+    :rtype: dict
+    :return: the report of the benchmark
+    """
+    latencies = {step: [] for step in STEPS}
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        # Memory used by one session, measured apart from the timed runs
+        Headless.reset()
+        gc.collect()
+        blocks = [sys.getallocatedblocks()]
+        tracemalloc.start()
+        run_session(stimuli_file, nrounds, {step: [] for step in STEPS},
+                    on_end=lambda: blocks.append(sys.getallocatedblocks()))
+        (current, peak) = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        trials = 0
+        start = time.perf_counter()
+        for session in range(sessions):
+            Headless.reset()
+            trials += run_session(stimuli_file, nrounds, latencies)
+        elapsed = time.perf_counter() - start
+    return {
+        "sessions": sessions,
+        "trials": trials,
+        "seconds": elapsed,
+        "sessions_per_sec": sessions / elapsed,
+        "trials_per_sec": trials / elapsed,
+        "peak_bytes_per_session": peak,
+        "blocks_per_session": blocks[1] - blocks[0],
+        "latency_us": {step: summarize(latencies[step]) for step in STEPS},
+    }
+
+def print_report(report):
+    """Prints the report of the benchmark"""
+    print("{sessions} sessions, {trials} trials in {seconds:.2f}s".format(**report))
+    print("{sessions_per_sec:.1f} sessions/sec, {trials_per_sec:.1f} trials/sec".format(**report))
+    print("per session: {peak_bytes_per_session} bytes at peak, "
+          "{blocks_per_session} allocated blocks held by the end".format(**report))
+    print("{:<16}{:>10}{:>12}{:>12}{:>12}{:>12}".format("step (us)", "count", "mean", "p50", "p99", "max"))
+    for (step, stats) in report["latency_us"].items():
+        if stats["count"]:
+            print("{:<16}{count:>10}{mean:>12.1f}{p50:>12.1f}{p99:>12.1f}{max:>12.1f}".format(step, **stats))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the experiment on the headless backend")
+    parser.add_argument("--sessions", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=6)
+    parser.add_argument("--stimuli", default=STIMULI_FILE)
+    parser.add_argument("--json", help="also write the report to this path")
+    args = parser.parse_args()
+    report = run(args.sessions, args.rounds, args.stimuli)
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as output:
+            json.dump(report, output, indent=1)
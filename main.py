@@ -1,16 +1,72 @@
+import Startup
+startup = Startup.Startup()
+import argparse
+import Backend
 import Experiment as ex
+import ExperimentData as datafile
 import Randomizer as r
-from psychopy import core
+import Stimuli as stim
+import NovelObject as nObj
+import Preflight
+import StimulusPack
+import Hooks
+from Backend import core
 
 # EXPERIMENT INFO: constants, etc.
 NAME = "Perceptual Balance Task"
 STIMULI_FILE = "behavioral_stimuli.csv"
+PROCEED_KEYS = ["right", "1", "2", "3"]
+# Images compiled by StimulusPack.py; without it, the images are decoded
+PACK_FILE = "stimuli.pack"
 
 ## CHANGE THIS VALUE ###################################################
 DEBUG = False
 # debug should be False when you are actually running the experiment
 ########################################################################
 
+# Set to True to write a summary of the frame timings and of the redrawing next
+# to the data file (and print the texture cache stats)
+FRAME_REPORT = False
+# "long" writes one row per scorer per trial, "wide" one row per trial with
+# a copy of the scoring columns for each scorer
+OUTPUT_LAYOUT = "long"
+
+def prepare_stimuli(stimuli_file):
+    """Creates the objects of every stimulus listed, and maps their images
+    from the stimulus pack, decoding and checking those that are not in it
+    (run in the background during the participant dialog).
+    :rtype: (dict, dict, (int, int))
+    :return: the decoded images and those of the pack, keyed by path, and the
+    size in pixels of the images of the pack (None without a pack)
+    """
+    paths = stim.get_stimulus_from_file(stimuli_file)
+    for path in paths:
+        nObj.NovelObject(path)
+    pack = StimulusPack.open_pack(PACK_FILE)
+    if pack is None:
+        return (Preflight.check(paths), {}, None)
+    missing = pack.missing(paths)
+    if missing:
+        print("{} images are not in {} (or changed since it was built); rebuild it with StimulusPack.py".format(len(missing), PACK_FILE))
+    packed = pack.images([path for path in paths if path not in missing])
+    return (Preflight.check(missing), packed, pack.size)
+
+def resample_stimuli(decoded, packed, pack_size, pixels):
+    """Resizes the images to the number of pixels they take up on the window.
+    The images of the pack already are, unless it was built for another size.
+    :rtype: dict
+    :return: every image, keyed by path
+    """
+    if packed and pack_size != pixels:
+        print("{} was built for {}x{} pixels but the window needs {}x{}; rebuild it with StimulusPack.py --size {} {}"
+              .format(PACK_FILE, *pack_size, *pixels, *pixels))
+        decoded = dict(decoded)
+        decoded.update(packed)
+        packed = {}
+    images = Preflight.resample_all(decoded, pixels)
+    images.update(packed)
+    return images
+
 def terminate(abrupt=False):
     """General quitting procedure"""
     exp.end_experiment(abrupt=abrupt)
@@ -18,38 +74,98 @@ def terminate(abrupt=False):
     
 def check_for_quit():
     """Quitting during the experiment"""
+    randizer.input.poll()
     if randizer.check_quit():
         terminate(abrupt=True)
+
+def on_quit(key):
+    """Handler of the quit key during a trial"""
+    randizer.quit()
+    terminate(abrupt=True)
+
+def on_proceed(key):
+    """Handler of the keys ending a trial ('right', or '1'/'2'/'3' for a grasp
+    violation); the time the key was pressed is recorded with the trial"""
+    exp.stamp_response(key.tDown)
+    return key.name
         
 def check_proceed():
-    button = None
-    if randizer.check_keyboard("right"):
-        button = "right"
-    elif randizer.check_keyboard("1"):
-        button = "1"
-    elif randizer.check_keyboard("2"):
-        button = "2"
-    elif randizer.check_keyboard("3"):
-        button = "3"
+    """Reads the keyboard once for the frame, routing the keys to their handlers"""
+    button = randizer.input.dispatch()
     if not button:
         return (False, button)
     return (True, button)
     
+def load_resume(path):
+    """Reads the checkpoint of the session to resume (the latest of the data
+    folder if no path is given)"""
+    path = path or datafile.latestCheckpoint(DEBUG)
+    if path is None:
+        print("There is no session to resume")
+        core.quit()
+    try:
+        checkpoint = datafile.loadCheckpoint(path)
+    except (OSError, ValueError) as err:
+        print("The session cannot be resumed:", err)
+        core.quit()
+    print("Resuming {} after trial {}".format(checkpoint["filename"], checkpoint["rows"]))
+    return checkpoint
+
 # PROGRAM BEGINS HERE
-exp = ex.Experiment(NAME, STIMULI_FILE, nrounds=1 if DEBUG else 6, DEBUG=DEBUG) 
-randizer = r.Randomizer(NAME, exp, DEBUG=DEBUG)
+parser = argparse.ArgumentParser(description=NAME)
+parser.add_argument("--resume", nargs="?", const="", metavar="CHECKPOINT",
+                    help="go on with a session that crashed, from its checkpoint (by default the latest one)")
+args = parser.parse_args()
+resume = load_resume(args.resume) if args.resume is not None else None
+# plugins listed in the RANDOMIZER_PLUGINS environment variable (see Hooks.py)
+try:
+    Hooks.load_plugins()
+except ValueError as err:
+    print("No plugins loaded:", err)
+# the images are decoded in the background while psychopy is imported (on the
+# main thread) and the dialog is filled in
+startup.run("stimuli", prepare_stimuli, STIMULI_FILE)
+with startup.phase("imports"):
+    Backend.preload()
+with startup.phase("dialog"):
+    try:
+        exp = ex.Experiment(NAME, STIMULI_FILE, nrounds=1 if DEBUG else 6, DEBUG=DEBUG, layout=OUTPUT_LAYOUT,
+                            constraints=ex.ROUND_CONSTRAINTS, resume=resume)
+    except ValueError as err:
+        print(err)
+        core.quit()
+try:
+    (decoded, packed, pack_size) = startup.result("stimuli")
+except ValueError as err:
+    # nothing has been shown yet: report every bad image and stop
+    print(err)
+    terminate(abrupt=True)
+with startup.phase("window"):
+    randizer = r.Randomizer(NAME, DEBUG=DEBUG, frame_report=FRAME_REPORT)
+with startup.phase("textures"):
+    decoded = resample_stimuli(decoded, packed, pack_size, randizer.textures.pixels)
+    randizer.preload_stimuli(exp.stimuli, decoded)
+randizer.input.register(r.QUIT_KEYS, on_quit)
+randizer.input.register(PROCEED_KEYS, on_proceed)
+startup.finish()
+print(startup.report())
+exp.output.attach(Startup.REPORT_SUFFIX, startup.dumps())
 if randizer.start_up() != None:
     terminate(abrupt=True)
-while not exp.experiment_complete():
+# a resumed session may start within a round
+while not exp.experiment_complete() or exp.in_round():
     check_for_quit()
-    exp.next_round()
+    resumed = exp.in_round()
+    if not resumed:
+        exp.next_round()
     if randizer.announce_nxt_round(exp.current_round()) == -1:
         terminate(abrupt=True)
-    currStim = exp.next_stimulus() # -1st to 0th (1st stimuli)
+    if not resumed:
+        currStim = exp.next_stimulus() # -1st to 0th (1st stimuli)
     while not exp.round_complete():
-        check_for_quit()
         currStim = exp.current_stimulus()
-        randizer.draw_round(exp.current_trial_info(), currStim)
+        randizer.draw_round(exp.current_trial_info(), currStim, trial=exp.trial_number())
+        exp.stamp_onset(randizer.onset)
         (should_proceed, button) = check_proceed()
         if should_proceed:
             confirm = randizer.next_confirm(warning=button)
@@ -57,5 +173,8 @@ while not exp.experiment_complete():
                 terminate(abrupt=True)
             elif confirm == True:
                 currentStim = exp.next_stimulus(button)
+if FRAME_REPORT:
+    print("Texture cache:", randizer.textures.stats())
 randizer.end()
+randizer.write_frame_report(exp.output.filepath)
 terminate()
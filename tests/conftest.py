@@ -0,0 +1,33 @@
+"""
+conftest.py sets up the tests: they run the program on the headless backend
+(see Backend.py), from the root of the repository.
+"""
+import os
+import sys
+import pytest
+
+os.environ["RANDOMIZER_BACKEND"] = "headless"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import Headless
+import RandomStreams as rand
+import Stimuli as stim
+
+STIMULI_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "behavioral_stimuli.csv")
+
+@pytest.fixture(autouse=True)
+def headless():
+    """Puts the headless backend back in its initial state around each test"""
+    Headless.reset()
+    yield Headless
+    Headless.reset()
+
+@pytest.fixture
+def streams():
+    """The random streams of a session with a fixed seed"""
+    return rand.RandomStreams("P1", "S1", seed=1234)
+
+@pytest.fixture
+def stimuli(streams):
+    """The flipped and unflipped lists of the stimuli of the repository"""
+    return stim.Stimuli(STIMULI_FILE, streams.pairs()).get_stimuli()
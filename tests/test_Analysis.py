@@ -0,0 +1,72 @@
+import csv
+import os
+import pytest
+import Analysis
+
+HEADER = ["Scorer Name", "Trial#", "Round#", "ObjectName", "ObjectOrientation", "Duration", "PrecisionGraspViolation"]
+RIGHT = "img/RedGrey_12in_1.2_right.JPG"
+UNIFORM = "img/UniformRed_12in.JPG"
+
+def write(path, trials, scorers=("A", "B")):
+    """Writes a data file in the long layout, each trial once per scorer"""
+    with open(path, "w", newline="") as data:
+        writer = csv.writer(data)
+        writer.writerow(HEADER)
+        for (trial, (round_num, name, orientation, duration, violation)) in enumerate(trials, 1):
+            for scorer in scorers:
+                writer.writerow([scorer, trial, round_num, name, orientation, duration, violation])
+
+@pytest.fixture
+def folder(tmp_path):
+    write(str(tmp_path / "first.csv"), [(1, RIGHT, "right", 1.0, "NONE"), (1, UNIFORM, "", 2.0, "Grasp #1"),
+                                        (2, RIGHT, "right", 3.0, "NONE")])
+    write(str(tmp_path / "second.csv"), [(1, RIGHT, "right", 5.0, "Both Grasps"), (2, UNIFORM, "", 4.0, "none")])
+    return tmp_path
+
+def test_statistics(folder):
+    report = Analysis.analyze(str(folder), jobs=1, use_cache=False)
+    assert (report["files"], report["trials"], report["problems"]) == (2, 5, [])
+    right = report["object"][RIGHT]
+    assert right["trials"] == 3
+    assert right["mean_duration"] == pytest.approx(3.0)
+    assert right["sd_duration"] == pytest.approx((8 / 3) ** 0.5)
+    assert right["violation_rate"] == pytest.approx(1 / 3)
+    assert report["orientation"][Analysis.NO_ORIENTATION]["mean_duration"] == pytest.approx(3.0)
+    assert report["ratio"]["uniform"]["trials"] == 2
+    assert list(report["round"]) == ["1", "2"]
+    assert report["round"]["2"]["violation_rate"] == 0.0
+    assert report["violations"] == {"NONE": 3, "GRASP #1": 1, "BOTH GRASPS": 1}
+
+def test_blank_durations_are_left_out(tmp_path):
+    write(str(tmp_path / "blank.csv"), [(1, RIGHT, "right", 2.0, "NONE"), (1, RIGHT, "right", "", "NONE"),
+                                        (1, UNIFORM, "", "", "NONE")])
+    report = Analysis.analyze(str(tmp_path), jobs=1, use_cache=False)
+    right = report["object"][RIGHT]
+    assert (right["trials"], right["timed"]) == (2, 1)
+    assert (right["mean_duration"], right["sd_duration"]) == (2.0, 0.0)
+    assert report["object"][UNIFORM]["mean_duration"] is None
+    Analysis.print_report(report)
+
+def test_chunks_give_the_same_report(folder):
+    partial = Analysis.new_partial()
+    for rows in Analysis.read_chunks(str(folder / "first.csv"), size=1):
+        Analysis.add_chunk(partial, rows)
+    partial["files"] = 1
+    (whole, problem) = Analysis.summarize_file(str(folder / "first.csv"))
+    assert Analysis.finalize(partial) == Analysis.finalize(whole)
+
+def test_cache(folder):
+    assert Analysis.analyze(str(folder), jobs=1)["read"] == 2
+    report = Analysis.analyze(str(folder), jobs=1)
+    assert (report["read"], report["cached"], report["trials"]) == (0, 2, 5)
+    write(str(folder / "second.csv"), [(1, RIGHT, "right", 5.0, "NONE")])
+    os.utime(str(folder / "second.csv"), (0, 0))
+    report = Analysis.analyze(str(folder), jobs=1)
+    assert (report["read"], report["cached"], report["trials"]) == (1, 1, 4)
+
+def test_missing_columns(folder):
+    with open(str(folder / "broken.csv"), "w") as data:
+        data.write("Trial#,Duration\n1,2.0\n")
+    report = Analysis.analyze(str(folder), jobs=1, use_cache=False)
+    assert report["files"] == 2
+    assert len(report["problems"]) == 1 and "broken.csv" in report["problems"][0]
@@ -0,0 +1,100 @@
+import asyncio
+import os
+import pytest
+import AsyncSession as a
+import Experiment as ex
+
+STIMULI_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "behavioral_stimuli.csv")
+GRASP = 1 + ex.COL_INDEX["PrecisionGraspViolation"]
+ONSET = 1 + ex.COL_INDEX["OnsetTime"]
+
+class TimedFrontend(a.RecordingFrontend):
+    """Takes a second to show each screen, and records when it was shown"""
+    def __init__(self, headless):
+        a.RecordingFrontend.__init__(self)
+        self.headless = headless
+        self.times = []
+
+    def show(self, state, text=""):
+        self.times.append(self.headless.advance(1))
+        a.RecordingFrontend.show(self, state, text)
+
+def run(keys, nrounds=1, frontend=None):
+    """Runs a session on a script of keys (see ScriptedInput)"""
+    exp = ex.Experiment("Test", STIMULI_FILE, nrounds=nrounds, DEBUG=True)
+    session = a.AsyncSession(exp, a.ScriptedInput(keys), frontend or a.RecordingFrontend(), 0, 0)
+    state = asyncio.run(session.run())
+    return (state, session, exp.output.d)
+
+def screens(session):
+    return [state for (state, text) in session.frontend.screens]
+
+def rest(trials):
+    """The keys of trials going straight through"""
+    return ["right", None] * trials
+
+@pytest.fixture(autouse=True)
+def participant(headless):
+    headless.script_participant(scorers=1)
+
+def test_straight_through(headless):
+    (state, session, output) = run(a.session_keys(2, 9), nrounds=2)
+    assert state == a.DONE
+    assert output.status == "closed"
+    assert len(output.rows) == 18
+    assert screens(session).count(a.ANNOUNCE) == 2
+
+def test_revert_shows_the_trial_again(headless):
+    (state, session, output) = run(["right", None, "right", "return"] + rest(9))
+    assert state == a.DONE
+    assert len(output.rows) == 9
+    assert screens(session)[2:6] == [a.TRIAL, a.CONFIRM, a.TRIAL, a.CONFIRM]
+    assert session.machine.summary()[a.TRIAL]["entries"] == 10
+
+def test_revert_keeps_the_first_onset(headless):
+    frontend = TimedFrontend(headless)
+    (state, session, output) = run(["right", None, "right", "return", "1", "return"] + rest(9), frontend=frontend)
+    assert state == a.DONE
+    assert screens(session)[2:8] == [a.TRIAL, a.CONFIRM, a.TRIAL, a.WARNING, a.TRIAL, a.CONFIRM]
+    assert output.rows[0][ONSET] == pytest.approx(frontend.times[2])
+    assert output.rows[1][ONSET] == pytest.approx(frontend.times[8])
+
+def test_countdown_revert_goes_back_to_the_announcement(headless):
+    (state, session, output) = run(["right", "return", "i", "space", "right", None] + rest(9))
+    assert state == a.DONE
+    assert screens(session)[:6] == [a.ANNOUNCE, a.COUNTDOWN, a.ANNOUNCE, a.INSTRUCTIONS, a.ANNOUNCE, a.COUNTDOWN]
+
+def test_warning_is_recorded(headless):
+    (state, session, output) = run(["right", None, "2", "right", None] + rest(8))
+    assert state == a.DONE
+    assert screens(session)[2:5] == [a.TRIAL, a.WARNING, a.WARNED]
+    assert [row[GRASP] for row in output.rows] == ["Grasp #2"] + ["NONE"] * 8
+
+def test_warning_revert_shows_the_trial_again(headless):
+    (state, session, output) = run(["right", None, "3", "return"] + rest(9))
+    assert state == a.DONE
+    assert screens(session)[2:5] == [a.TRIAL, a.WARNING, a.TRIAL]
+    assert [row[GRASP] for row in output.rows] == ["NONE"] * 9
+
+@pytest.mark.parametrize("keys", [["escape"], ["right", "escape"], ["right", None, "escape"],
+                                  ["right", None, "right", "escape"], ["right", None, "1", "escape"],
+                                  ["right", None, "1", "right", "escape"]])
+def test_quit(headless, keys):
+    (state, session, output) = run(keys)
+    assert state == a.ABORTED
+    assert output.status == "aborted"
+    assert session.machine.state == a.ABORTED
+
+def test_queue_input_quits_a_waiting_session(headless):
+    exp = ex.Experiment("Test", STIMULI_FILE, nrounds=1, DEBUG=True)
+    input = a.QueueInput()
+    session = a.AsyncSession(exp, input, a.RecordingFrontend(), 0, 0)
+    async def main():
+        task = asyncio.ensure_future(session.run())
+        input.press("right")
+        await asyncio.sleep(0.01)
+        input.press("x")
+        input.press("escape")
+        return await task
+    assert asyncio.run(main()) == a.ABORTED
+    assert screens(session)[:3] == [a.ANNOUNCE, a.COUNTDOWN, a.TRIAL]
@@ -0,0 +1,43 @@
+import random
+import pytest
+import ConstrainedShuffle as shuf
+import Schedule as sched
+
+def runs(values):
+    longest = run = 1
+    for (previous, value) in zip(values, values[1:]):
+        run = run + 1 if value == previous else 1
+        longest = max(longest, run)
+    return longest
+
+def test_constrained_shuffle_follows_the_constraints(stimuli):
+    constraints = shuf.Constraints(max_run={"colors": 1, "orientation": 2}, min_distance=2)
+    shuffler = shuf.ConstrainedShuffle(constraints, random.Random(3))
+    sequence = []
+    for round_num in range(1, 7):
+        sequence.extend(shuffler.order(stimuli[sched.round_list(round_num)], sequence))
+    assert all(report.violations == 0 for report in shuffler.reports)
+    assert runs([obj.get_colors() for obj in sequence]) == 1
+    assert runs([obj.get_orientation() for obj in sequence]) <= 2
+    assert all(previous.key() != obj.key() for (previous, obj) in zip(sequence, sequence[1:]))
+
+def test_min_distance_longer_than_the_history(stimuli):
+    constraints = shuf.Constraints(min_distance=5, no_boundary_repeat=False)
+    shuffler = shuf.ConstrainedShuffle(constraints, random.Random(5))
+    distinct = list({obj.key(): obj for obj in stimuli[0]}.values())[:4]
+    (first, others, last) = (shuffler.features(distinct[0]), [shuffler.features(obj) for obj in distinct[1:3]],
+                             shuffler.features(distinct[3]))
+    # three trials ago is too close, however short the sequence is
+    assert not shuffler.fits(first, [first] + others, 0)
+    assert shuffler.fits(last, [first] + others, 0)
+
+def test_impossible_constraints_are_reported(stimuli):
+    constraints = shuf.Constraints(max_run={"ratio": 1}, min_distance=len(stimuli[0]) + 1)
+    shuffler = shuf.ConstrainedShuffle(constraints, random.Random(1), max_attempts=2, steps=50)
+    order = shuffler.order(stimuli[0], stimuli[1])
+    assert sorted(map(repr, order)) == sorted(map(repr, stimuli[0]))
+    assert shuffler.reports[-1].violations > 0
+
+def test_unknown_attribute():
+    with pytest.raises(ValueError):
+        shuf.Constraints(max_run={"size": 1})
@@ -0,0 +1,97 @@
+import csv
+import os
+import pytest
+import Experiment as ex
+import ExperimentData
+import TrialWriter
+
+STIMULI_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "behavioral_stimuli.csv")
+NROUNDS = 2
+
+@pytest.fixture
+def folder(tmp_path, monkeypatch):
+    """Runs the sessions in a temporary folder, with their files on the disk"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(ExperimentData, "Writer", TrialWriter.TrialWriter)
+    (tmp_path / "tests").mkdir()
+    return tmp_path / "tests"
+
+def start(headless, resume=None):
+    if resume is None:
+        headless.script_participant(scorers=1)
+    return ex.Experiment("Test", STIMULI_FILE, nrounds=NROUNDS, DEBUG=True, resume=resume)
+
+def record(headless, exp, ntrials):
+    """Records trials the way main.py goes through the session"""
+    for n in range(ntrials):
+        if not exp.in_round():
+            exp.next_round()
+            exp.next_stimulus()
+        headless.core.wait(2.5)
+        exp.next_stimulus()
+
+def crash(headless, exp, ntrials):
+    """Records trials, then stops as a crash would; returns the checkpoint"""
+    record(headless, exp, ntrials)
+    exp.output.d.stop()
+    return ExperimentData.loadCheckpoint(exp.output.filepath + ExperimentData.CHECKPOINT_SUFFIX)
+
+def test_restore_goes_on_from_the_last_trial(headless, folder):
+    exp = start(headless)
+    ntrials = exp.nstims + 3
+    checkpoint = crash(headless, exp, ntrials)
+    (next_stimulus, clock) = (exp.current_stimulus(), exp.univ_clock.getTime())
+    assert checkpoint["rows"] == ntrials
+    headless.core.wait(60)
+    resumed = start(headless, resume=checkpoint)
+    assert (resumed.current_round(), resumed.trial_number()) == (2, ntrials + 1)
+    assert resumed.current_stimulus().get_stimuli() == next_stimulus.get_stimuli()
+    # the clock goes on from the checkpoint, not from the time of the crash
+    assert resumed.univ_clock.getTime() == pytest.approx(clock)
+    assert headless.core.getTime() - resumed.timeOrigin == pytest.approx(clock)
+
+def test_resumed_session_is_written_to_the_same_file(headless, folder):
+    exp = start(headless)
+    checkpoint = crash(headless, exp, 4)
+    resumed = start(headless, resume=checkpoint)
+    record(headless, resumed, NROUNDS * resumed.nstims - 4)
+    resumed.end_experiment()
+    with open(exp.output.filepath + TrialWriter.CSV_EXTENSION, newline="") as data_file:
+        rows = list(csv.DictReader(data_file))
+    assert [int(row["Trial#"]) for row in rows] == list(range(1, NROUNDS * exp.nstims + 1))
+    assert not os.path.exists(exp.output.filepath + ExperimentData.CHECKPOINT_SUFFIX)
+
+def test_restore_checks_the_order(headless, folder):
+    exp = start(headless)
+    checkpoint = crash(headless, exp, 3)
+    checkpoint["order"] = checkpoint["order"][::-1]
+    with pytest.raises(ValueError, match="ordered differently"):
+        start(headless, resume=checkpoint)
+
+def test_new_session_does_not_replace_a_crashed_one(headless, folder):
+    exp = start(headless)
+    crash(headless, exp, 3)
+    with open(exp.output.filepath + TrialWriter.JOURNAL_EXTENSION) as journal:
+        before = journal.read()
+    with pytest.raises(ValueError, match="--resume"):
+        start(headless)
+    with open(exp.output.filepath + TrialWriter.JOURNAL_EXTENSION) as journal:
+        assert journal.read() == before
+
+def test_onset_and_response_are_recorded(headless):
+    exp = start(headless)
+    headless.advance(10)
+    exp.next_round()
+    exp.next_stimulus()
+    headless.advance(0.5)
+    exp.stamp_onset(headless.core.getTime())
+    headless.advance(2)
+    exp.stamp_response(headless.core.getTime())
+    headless.advance(0.25)
+    exp.next_stimulus("right")
+    record = exp.output.d.rows[0]
+    assert record["OnsetTime"] == pytest.approx(10.5)
+    assert record["KeyDownTime"] == pytest.approx(12.5)
+    assert record["ResponseDuration"] == pytest.approx(2)
+    assert record["RecordLatency"] == pytest.approx(0.25)
+    assert (exp.onsetTime, exp.keyDownTime) == (None, None)
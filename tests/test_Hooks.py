@@ -0,0 +1,30 @@
+import pytest
+import Hooks
+
+@pytest.fixture(autouse=True)
+def no_hooks():
+    yield
+    for hooks in Hooks.HOOKS.values():
+        hooks.clear()
+    Hooks.ACTIVE = False
+
+def test_unknown_plugin_installs_none():
+    with pytest.raises(ValueError) as err:
+        Hooks.load_plugins("gc,bogus,Plugins:Nothing")
+    assert "bogus" in str(err.value) and "Nothing" in str(err.value)
+    assert not Hooks.ACTIVE
+    assert not any(Hooks.HOOKS.values())
+
+def test_load_and_uninstall_plugins():
+    (profiler,) = Hooks.load_plugins(" profile ")
+    assert Hooks.ACTIVE
+    assert profiler.on_trial_start in Hooks.HOOKS[Hooks.ON_TRIAL_START]
+    Hooks.uninstall(profiler)
+    assert not Hooks.ACTIVE
+
+def test_failing_hook_is_removed():
+    def hook(*args):
+        raise RuntimeError("broken")
+    Hooks.register(Hooks.ON_FLIP, hook)
+    Hooks.fire(Hooks.ON_FLIP, None, "trial")
+    assert not Hooks.ACTIVE
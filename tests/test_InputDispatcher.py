@@ -0,0 +1,64 @@
+import Headless
+import InputDispatcher
+import FrameScheduler
+
+def dispatcher(**kwargs):
+    return InputDispatcher.InputDispatcher(Headless.Keyboard(), **kwargs)
+
+def test_take_leaves_other_keys_queued(headless):
+    headless.script_keys((0, "space"), (0, "right"))
+    input = dispatcher()
+    assert input.poll() == 2
+    assert input.take("right").name == "right"
+    assert input.peek("space")
+    assert input.take("right") is None
+
+def test_dispatch_stops_at_handler_result(headless):
+    headless.script_keys((0, "1"), (0.1, "right"), (0.2, "2"))
+    headless.advance(1)
+    input = dispatcher()
+    handled = []
+    input.register(["1", "2"], lambda key: handled.append(key.name))
+    input.register("right", lambda key: "done")
+    assert input.dispatch() == "done"
+    assert handled == ["1"]
+    assert input.dispatch() is None
+    assert handled == ["1", "2"]
+
+def test_unhandled_keys_do_not_block_the_quit_key(headless):
+    headless.script_keys(*[(0, "space")] * 70 + [(0, "escape")])
+    input = dispatcher(protected=["escape"])
+    input.register("right", lambda key: None)
+    assert input.poll() == 71
+    assert len(input.queue) == InputDispatcher.MAX_QUEUED
+    assert input.take("escape").name == "escape"
+
+def test_keyboard_is_read_once_the_queue_is_full(headless):
+    input = dispatcher(protected=["escape"])
+    handled = []
+    input.register("escape", lambda key: handled.append(key.name) or "quit")
+    for idx in range(70):
+        headless.script_keys((headless.TIME.now, "space"))
+        assert input.poll() == 1
+    headless.script_keys((headless.TIME.now, "escape"))
+    assert input.dispatch() == "quit"
+    assert handled == ["escape"]
+
+def test_handled_keys_are_dropped_after_unhandled_ones(headless):
+    headless.script_keys((0, "right"), *[(0, "space")] * 4)
+    input = dispatcher(maxlen=3)
+    input.register("right", lambda key: None)
+    input.poll()
+    assert [event.name for event in input.queue] == ["right", "space", "space"]
+
+def test_idle_returns_when_keys_pile_up(headless):
+    input = dispatcher(protected=["escape"])
+    window = Headless.Window()
+    scheduler = FrameScheduler.FrameScheduler(lambda screen: window.flip(), input, window.monitorFramePeriod)
+    scheduler.present(lambda: None, "trial")
+    for idx in range(70):
+        headless.script_keys((headless.TIME.now, "space"))
+        scheduler.present(lambda: None, "trial")
+    headless.script_keys((headless.TIME.now, "escape"))
+    scheduler.present(lambda: None, "trial")
+    assert input.take("escape") is not None
@@ -0,0 +1,30 @@
+import Experiment as ex
+import RandomStreams as rand
+import Schedule as sched
+
+def test_same_seed_same_schedule(stimuli):
+    first = sched.generate(stimuli, 6, streams=rand.RandomStreams("P1", "S1", seed=7))
+    second = sched.generate(stimuli, 6, streams=rand.RandomStreams("P1", "S1", seed=7))
+    other = sched.generate(stimuli, 6, streams=rand.RandomStreams("P1", "S1", seed=8))
+    assert first.order == second.order
+    assert first.order != other.order
+
+def test_regenerate_matches_the_schedule(stimuli, streams):
+    schedule = sched.generate(stimuli, 6, constraints=ex.ROUND_CONSTRAINTS, streams=streams)
+    for round_num in (1, 4, 6):
+        assert schedule.regenerate(round_num, streams, ex.ROUND_CONSTRAINTS) == schedule.round(round_num)
+
+def test_streams_are_independent(streams):
+    assert streams.round(5).random() == rand.RandomStreams("P1", "S1", seed=1234).round(5).random()
+    assert streams.round(5).random() != streams.round(4).random()
+    assert streams.round(5).random() != rand.RandomStreams("P2", "S1", seed=1234).round(5).random()
+
+def test_saved_schedule_reproduces_its_rounds(stimuli, streams, tmp_path):
+    schedule = sched.generate(stimuli, 6, constraints=ex.ROUND_CONSTRAINTS, streams=streams)
+    path = schedule.save(str(tmp_path / "session"))
+    saved = sched.load(path)
+    assert saved.seed == {"participant": "P1", "session": "S1", "seed": 1234}
+    assert saved.constraints.to_dict() == ex.ROUND_CONSTRAINTS.to_dict()
+    for round_num in range(1, 7):
+        assert [stim.get_stimuli() for stim in saved.reproduce(round_num)] == \
+            [stim.get_stimuli() for stim in schedule.round(round_num)]
@@ -0,0 +1,35 @@
+import pytest
+import Headless
+import Randomizer as r
+
+def test_keyboard_stamps_on_its_own_clock(headless):
+    headless.advance(5)
+    kb = Headless.Keyboard()
+    headless.script_keys((5.5, "right"))
+    headless.advance(1)
+    assert kb.getKeys()[0].tDown == pytest.approx(0.5)
+
+def test_keys_are_stamped_on_the_timebase_of_the_flips(headless):
+    # the keyboard is created well after core.getTime() started counting
+    headless.advance(5)
+    randizer = r.Randomizer("Test", DEBUG=True)
+    headless.script_keys((5.5, "right"))
+    headless.advance(1)
+    randizer.input.poll()
+    assert randizer.input.take("right").tDown == pytest.approx(5.5)
+
+def test_input_latency_is_positive_and_small(headless):
+    headless.advance(5)
+    randizer = r.Randomizer("Test", DEBUG=True)
+    scheduler = randizer.scheduler
+    frame_period = randizer.experimenter_window.monitorFramePeriod
+    scheduler.present(lambda: None, "trial")
+    for press in (7.25, 9.5):
+        headless.script_keys((press, "right"))
+        # sleeps until the key is pressed
+        assert scheduler.present(lambda: None, "trial") is None
+        assert randizer.input.take("right") is not None
+        scheduler.invalidate()
+        scheduler.present(lambda: None, "trial")
+    assert len(scheduler.latencies) == 2
+    assert all(0 <= latency < 2 * frame_period for latency in scheduler.latencies)
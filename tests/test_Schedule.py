@@ -0,0 +1,19 @@
+import Schedule as sched
+
+def test_round_list():
+    # odd rounds use the flipped list (0), even rounds the unflipped one (1)
+    assert [sched.round_list(round_num) for round_num in range(1, 5)] == [0, 1, 0, 1]
+
+def test_rounds_use_their_list(stimuli, streams):
+    schedule = sched.generate(stimuli, 4, streams=streams)
+    assert len(schedule) == 4 * len(stimuli[0])
+    for round_num in range(1, 5):
+        expected = stimuli[sched.round_list(round_num)]
+        assert sorted(map(repr, schedule.round(round_num))) == sorted(map(repr, expected))
+    assert schedule.trial(len(stimuli[0]) + 1) is schedule.stimulus(2, 1)
+
+def test_save_and_load(stimuli, streams, tmp_path):
+    schedule = sched.generate(stimuli, 2, streams=streams)
+    loaded = sched.load(schedule.save(str(tmp_path / "session")))
+    assert loaded.order == schedule.order
+    assert loaded.round(2) == schedule.round(2)
@@ -0,0 +1,103 @@
+import csv
+import math
+import numpy as np
+import pytest
+import ScorerAgreement as sa
+from Experiment import SCORING
+
+def flatten(table):
+    """Turns a table of scores (one row per trial, None for a blank) into the
+    trial of each score and the scores"""
+    units = []
+    values = []
+    for (unit, row) in enumerate(table):
+        for value in row:
+            if value is not None:
+                units.append(unit)
+                values.append(value)
+    return (np.array(units), values)
+
+def test_icc_of_shrout_and_fleiss():
+    # Shrout & Fleiss (1979), 6 targets rated by 4 judges: ICC(1,1) = 0.17
+    table = [[9, 2, 5, 8], [6, 1, 3, 2], [8, 4, 6, 8], [7, 1, 2, 6], [10, 5, 6, 9], [6, 2, 4, 7]]
+    (units, values) = flatten(table)
+    stats = sa.interval_agreement(units, np.array(values, dtype=float))
+    assert (stats["trials"], stats["scores"]) == (6, 24)
+    assert stats["icc"] == pytest.approx(0.1657, abs=1e-4)
+
+def test_alpha_of_krippendorff():
+    # Krippendorff (2011), 4 coders and 12 units with blanks: interval alpha = 0.849
+    N = None
+    coders = [[1, 2, 3, 3, 2, 1, 4, 1, 2, N, N, N], [1, 2, 3, 3, 2, 2, 4, 1, 2, 5, N, 3],
+              [N, 3, 3, 3, 2, 3, 4, 2, 2, 5, 1, N], [1, 2, 3, 3, 2, 4, 4, 1, 2, 5, 1, N]]
+    (units, values) = flatten(zip(*coders))
+    stats = sa.interval_agreement(units, np.array(values, dtype=float))
+    # the last unit has a single score and is left out
+    assert (stats["trials"], stats["scores"]) == (11, 40)
+    assert stats["alpha"] == pytest.approx(0.849, abs=1e-3)
+
+def test_kappa_of_fleiss():
+    # Fleiss (1971) as worked out on Wikipedia, 10 subjects, 14 raters: kappa = 0.210
+    counts = [[0, 0, 0, 0, 14], [0, 2, 6, 4, 2], [0, 0, 3, 5, 6], [0, 3, 9, 2, 0], [2, 2, 8, 1, 1],
+              [7, 7, 0, 0, 0], [3, 2, 6, 3, 0], [2, 5, 3, 2, 2], [6, 5, 2, 1, 0], [0, 2, 2, 3, 7]]
+    table = [[label for (label, count) in zip(" abcde", [0] + row) for idx in range(count)] for row in counts]
+    stats = sa.nominal_agreement(*flatten(table))
+    assert stats["categories"] == ["A", "B", "C", "D", "E"]
+    assert stats["agreement"] == pytest.approx(0.378, abs=1e-3)
+    assert stats["kappa"] == pytest.approx(0.210, abs=1e-3)
+
+def test_undefined_agreement():
+    stats = sa.interval_agreement(np.array([0, 1]), np.array([1.0, 2.0]))
+    assert (stats["trials"], stats["icc"], stats["alpha"]) == (0, None, None)
+    assert sa.nominal_agreement(np.array([0, 0]), ["left", " LEFT"])["kappa"] is None
+
+def test_session_key():
+    assert sa.session_key("data/Randomizer-PID1-2_2022JAN2 Marty.csv") == "Randomizer-PID1-2_2022JAN2"
+    assert sa.session_key("data/Randomizer-PID1-2_2022JAN2_1 Marty.csv") == "Randomizer-PID1-2_2022JAN2_1"
+
+def test_parse_time():
+    assert sa.parse_time("1:02.5") == 62.5
+    assert sa.parse_time("3.25") == 3.25
+    assert math.isnan(sa.parse_time("n/a"))
+
+def write(path, header, rows):
+    with open(path, "w", newline="") as data:
+        writer = csv.writer(data)
+        writer.writerow(header)
+        writer.writerows(rows)
+
+def test_gather_merges_the_copies(tmp_path):
+    session = "Task-PID1-Training_2022JAN2"
+    # long layout, in two copies with different other columns
+    write(str(tmp_path / (session + " A.csv")), ["Trial#", "ObjectName", sa.SCORER_COLUMN] + SCORING,
+          [["1", "obj", "A"] + ["1"] * 12, ["1", "obj", "B"] + [""] * 12])
+    write(str(tmp_path / (session + " B.csv")), ["Trial#", sa.SCORER_COLUMN, "Extra"] + SCORING,
+          [["1", "A", "x"] + ["1"] * 12, ["1", "B", "y"] + ["1:00"] * 12])
+    # wide layout
+    write(str(tmp_path / "Task-PID2-Training_2022JAN3.csv"),
+          ["Trial#", "ObjectName"] + ["{}{}{}".format(name, sa.WIDE_SEPARATOR, field) for name in "CD" for field in SCORING],
+          [["1", "other"] + ["2"] * 12 + ["2"] * 12])
+    merged = str(tmp_path / "merged.csv")
+    report = sa.gather([str(tmp_path)], jobs=1, merged=merged)
+    assert (report["files"], report["sessions"], report["conflicts"], report["problems"]) == (3, 2, 0, [])
+    with open(merged, newline="") as data:
+        rows = list(csv.reader(data))
+    assert rows[0] == [sa.SESSION_COLUMN, sa.SCORER_COLUMN, "Trial#", "ObjectName", "Extra"] + SCORING
+    assert rows[1:] == [[session, "A", "1", "obj", "x"] + ["1"] * 12,
+                        [session, "B", "1", "obj", "x"] + ["1:00"] * 12,
+                        ["Task-PID2-Training_2022JAN3", "C", "1", "other", ""] + ["2"] * 12,
+                        ["Task-PID2-Training_2022JAN3", "D", "1", "other", ""] + ["2"] * 12]
+    assert report["agreement"][SCORING[0]]["scores"] == 4
+
+def test_conflicts_keep_the_first_copy():
+    sessions = {}
+    assert sa.merge_scores(sessions, "s", {"1": ({}, {"A": ["1", ""]})}) == 0
+    assert sa.merge_scores(sessions, "s", {"1": ({}, {"A": ["2", "3"]})}) == 1
+    assert sessions["s"]["1"][1]["A"] == ["1", "3"]
+
+def test_unreadable_files_are_reported(tmp_path):
+    write(str(tmp_path / "broken.csv"), ["Name"], [["x"]])
+    write(str(tmp_path / "partial.csv"), ["Trial#", "C: " + SCORING[0]], [["1", "2"]])
+    report = sa.gather([str(tmp_path)], jobs=1, merged=None)
+    assert report["files"] == 0
+    assert len(report["problems"]) == 2
@@ -0,0 +1,51 @@
+import os
+import ExperimentData
+import SessionIndex
+
+NAME = "Randomizer-PID7-BehavioralTraining_2022JAN3"
+
+def write(folder, name, rows=2):
+    path = os.path.join(str(folder), name + SessionIndex.CSV_EXTENSION)
+    with open(path, "w") as data_file:
+        data_file.write("Trial#\n" + "".join("{}\n".format(idx + 1) for idx in range(rows)))
+    return path
+
+def test_parse_filename():
+    info = SessionIndex.parse_filename("data/" + NAME + ".csv")
+    assert info == {"experiment": "Randomizer", "participant": "7", "session": "BehavioralTraining",
+                    "date": "2022-01-03"}
+    assert SessionIndex.parse_filename(NAME + "_1.csv") == info
+    assert SessionIndex.parse_filename("sessions.csv") is None
+    assert SessionIndex.parse_filename("Randomizer-PID7-S_2022FOO3.csv") is None
+
+def test_update_reads_only_what_changed(tmp_path):
+    index = SessionIndex.SessionIndex(str(tmp_path))
+    write(tmp_path, NAME)
+    removed = write(tmp_path, NAME + "_1")
+    assert index.update() == (2, 0)
+    assert index.update() == (0, 0)
+    write(tmp_path, NAME, rows=5)
+    os.remove(removed)
+    assert index.update() == (1, 1)
+    assert [entry["rows"] for entry in index.find(participant="7")] == [5]
+    index.close()
+
+def test_open_index_does_not_read_the_folder(tmp_path):
+    SessionIndex.SessionIndex(str(tmp_path)).close()
+    write(tmp_path, NAME)
+    index = ExperimentData.openIndex(str(tmp_path))
+    assert index.collisions("7", "BehavioralTraining") == []
+    index.update()
+    assert [entry["path"] for entry in index.collisions("7", "BehavioralTraining")] == [NAME + ".csv"]
+    index.close()
+
+def test_collision_offers_a_file_of_its_own(tmp_path, headless):
+    index = SessionIndex.SessionIndex(str(tmp_path))
+    index.add(write(tmp_path, NAME))
+    assert ExperimentData.confirmNewSession(index, "8", "BehavioralTraining", NAME)
+    assert headless.SHOWN == []
+    headless.script_responses(None)
+    assert not ExperimentData.confirmNewSession(index, "7", "BehavioralTraining", NAME)
+    assert ExperimentData.confirmNewSession(index, "7", "BehavioralTraining", NAME)
+    assert any(NAME + "_1.csv" in text for text in headless.SHOWN[-1].texts)
+    index.close()
@@ -0,0 +1,25 @@
+import asyncio
+import pytest
+import StateMachine
+
+def test_run_counts_the_entries():
+    visits = iter(["b", "a", "b", "end"])
+    machine = StateMachine.StateMachine("test", {"a": (lambda: next(visits), ["b"]),
+                                                 "b": (lambda: next(visits), ["a", "end"])})
+    assert machine.run("a", ["end"]) == "end"
+    assert machine.summary()["b"]["entries"] == 2
+    assert [(state, target) for (state, target, seconds) in machine.trace] == \
+        [("a", "b"), ("b", "a"), ("a", "b"), ("b", "end")]
+
+def test_disallowed_transition():
+    machine = StateMachine.StateMachine("test", {"a": (lambda: "end", ["b"])})
+    with pytest.raises(ValueError):
+        machine.run("a", ["end"])
+
+def test_run_async_awaits_the_handlers():
+    async def a():
+        await asyncio.sleep(0)
+        return "end"
+    machine = StateMachine.StateMachine("test", {"a": (a, ["end"])})
+    assert asyncio.run(machine.run_async("a", ["end"])) == "end"
+    assert machine.summary()["a"]["entries"] == 1
@@ -0,0 +1,34 @@
+import json
+import pytest
+import StimulusPack
+
+def write_pack(path, entries, magic=StimulusPack.MAGIC, size=(2, 1), truncate=None):
+    """Writes a pack of blank images by hand (build needs the images decoded)"""
+    index = json.dumps(entries).encode()
+    start = StimulusPack.align(StimulusPack.HEADER.size + len(index))
+    end = max([entry["offset"] + entry["width"] * entry["height"] * StimulusPack.BYTES_PER_PIXEL for entry in entries], default=0)
+    data = StimulusPack.HEADER.pack(magic, len(index), *size) + index
+    data += bytes(start + end - len(data))
+    with open(path, "wb") as pack:
+        pack.write(data[:truncate])
+    return str(path)
+
+ENTRIES = [{"path": "a.png", "width": 2, "height": 1, "mtime": None, "offset": 0},
+           {"path": "b.png", "width": 2, "height": 1, "mtime": None, "offset": StimulusPack.ALIGNMENT}]
+
+def test_open_pack(tmp_path):
+    pack = StimulusPack.open_pack(write_pack(tmp_path / "stimuli.pack", ENTRIES))
+    assert (len(pack), pack.size) == (2, (2, 1))
+    assert "b.png" in pack
+    assert pack.missing(["a.png", "c.png"]) == ["c.png"]
+    assert StimulusPack.open_pack(str(tmp_path / "none.pack")) is None
+
+@pytest.mark.parametrize("kwargs", [{"magic": b"RNDPACK1"}, {"magic": b"NOTAPACK"}, {"truncate": 12},
+                                    {"truncate": StimulusPack.HEADER.size + 10}, {"truncate": -1}])
+def test_unusable_pack_is_reported(tmp_path, capsys, kwargs):
+    path = write_pack(tmp_path / "stimuli.pack", ENTRIES, **kwargs)
+    with pytest.raises(ValueError):
+        StimulusPack.StimulusPack(path)
+    # the session goes on without it
+    assert StimulusPack.open_pack(path) is None
+    assert "cannot be used" in capsys.readouterr().out
@@ -0,0 +1,55 @@
+import Headless
+import TextureCache
+
+class FakeImage:
+    """A decoded image of a given size"""
+    def __init__(self, size):
+        self.size = size
+        self.resized = False
+
+    def resize(self, size, resample=None):
+        image = FakeImage(size)
+        image.resized = True
+        return image
+
+def cache_of(nimages):
+    """A cache of the default window holding nimages images at most"""
+    window = Headless.Window()
+    (width, height) = TextureCache.pixel_size(window, [1, 1])
+    return TextureCache.TextureCache(window, capacity=nimages * width * height * TextureCache.BYTES_PER_PIXEL)
+
+def test_pixel_size():
+    assert TextureCache.pixel_size(Headless.Window(size=(800, 600)), [1, 1]) == (400, 300)
+    assert TextureCache.pixel_size(Headless.Window(size=(800, 600)), [0, 0.5]) == (1, 150)
+
+def test_images_are_resized_once():
+    image = FakeImage((400, 300))
+    assert TextureCache.resample(image, (400, 300)) is image
+    assert TextureCache.resample(FakeImage((1000, 750)), (400, 300)).size == (400, 300)
+    cache = cache_of(2)
+    stim = cache.load("a.png", FakeImage((1000, 750)))
+    assert stim.image.size == cache.pixels and stim.image.resized
+
+def test_hits_and_misses():
+    cache = cache_of(2)
+    cache.load("a.png", FakeImage(cache.pixels))
+    assert cache.get("a.png") is cache.get("a.png")
+    # decoded from the file on a miss
+    cache.get("b.png")
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (2, 1, 2)
+
+def test_least_recently_used_is_evicted():
+    cache = cache_of(2)
+    for path in ("a.png", "b.png"):
+        cache.load(path, FakeImage(cache.pixels))
+    cache.get("a.png")
+    cache.load("c.png", FakeImage(cache.pixels))
+    assert ("a.png" in cache, "b.png" in cache, "c.png" in cache) == (True, False, True)
+    assert cache.used == cache.capacity
+
+def test_last_image_is_kept_over_capacity():
+    cache = cache_of(0)
+    cache.load("a.png", FakeImage(cache.pixels))
+    cache.load("b.png", FakeImage(cache.pixels))
+    assert len(cache) == 1 and "b.png" in cache
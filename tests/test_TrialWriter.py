@@ -0,0 +1,110 @@
+import csv
+import os
+import pytest
+import TrialWriter
+
+COLUMNS = ["Trial#", "Object"]
+
+def read(path):
+    with open(path, newline="") as data:
+        return list(csv.reader(data))
+
+def test_abort_keeps_a_resumed_session(tmp_path):
+    filepath = str(tmp_path / "session")
+    writer = TrialWriter.TrialWriter(filepath, COLUMNS)
+    writer.write([1, "a"])
+    writer.checkpoint("_checkpoint.json", {"rows": 1})
+    writer.stop()
+    writer = TrialWriter.TrialWriter(filepath, COLUMNS, resume=True)
+    writer.write([2, "b"])
+    writer.checkpoint("_checkpoint.json", {"rows": 2})
+    writer.abort()
+    assert read(filepath + TrialWriter.JOURNAL_EXTENSION) == [COLUMNS, ["1", "a"], ["2", "b"]]
+    assert os.path.exists(filepath + "_checkpoint.json")
+
+def test_abort_discards_a_new_session(tmp_path):
+    filepath = str(tmp_path / "session")
+    writer = TrialWriter.TrialWriter(filepath, COLUMNS)
+    writer.write([1, "a"])
+    writer.checkpoint("_checkpoint.json", {"rows": 1})
+    writer.abort()
+    assert os.listdir(tmp_path) == []
+
+def test_failed_checkpoint_does_not_stop_the_rows(tmp_path, capsys):
+    filepath = str(tmp_path / "session")
+    writer = TrialWriter.TrialWriter(filepath, COLUMNS)
+    writer.write([1, "a"])
+    writer.checkpoint("_missing/checkpoint.json", {"rows": 1})
+    writer.write([2, "b"])
+    assert writer.close() == filepath + TrialWriter.CSV_EXTENSION
+    assert read(filepath + TrialWriter.CSV_EXTENSION) == [COLUMNS, ["1", "a"], ["2", "b"]]
+    assert "checkpoint could not be written" in capsys.readouterr().out
+
+def test_close_expands_the_rows(tmp_path):
+    filepath = str(tmp_path / "session")
+    writer = TrialWriter.TrialWriter(filepath, COLUMNS)
+    writer.write([1, "a"])
+    writer.write([2, "b"])
+    writer.close(header=["Scorer"] + COLUMNS, expand=lambda row: [[name] + row for name in ("x", "y")])
+    assert read(filepath + TrialWriter.CSV_EXTENSION) == [["Scorer"] + COLUMNS, ["x", "1", "a"], ["y", "1", "a"],
+                                                          ["x", "2", "b"], ["y", "2", "b"]]
+    assert not os.path.exists(filepath + TrialWriter.JOURNAL_EXTENSION)
+
+def test_free_filepath_skips_taken_names(tmp_path):
+    filepath = str(tmp_path / "session")
+    assert TrialWriter.free_filepath(filepath) == filepath
+    open(filepath + TrialWriter.CSV_EXTENSION, "w").close()
+    open(filepath + "_1" + TrialWriter.JOURNAL_EXTENSION, "w").close()
+    assert TrialWriter.free_filepath(filepath) == filepath + "_2"
+
+def test_close_does_not_overwrite_a_data_file(tmp_path, capsys):
+    filepath = str(tmp_path / "session")
+    writer = TrialWriter.TrialWriter(filepath, COLUMNS)
+    writer.write([1, "a"])
+    # another session finishes with the same name in the meantime
+    with open(filepath + TrialWriter.CSV_EXTENSION, "w") as other:
+        other.write("earlier")
+    assert writer.close() == filepath + "_1" + TrialWriter.CSV_EXTENSION
+    assert read(filepath + "_1" + TrialWriter.CSV_EXTENSION) == [COLUMNS, ["1", "a"]]
+    with open(filepath + TrialWriter.CSV_EXTENSION) as other:
+        assert other.read() == "earlier"
+    assert "already there" in capsys.readouterr().out
+
+def test_new_journal_does_not_overwrite_another(tmp_path):
+    filepath = str(tmp_path / "session")
+    TrialWriter.TrialWriter(filepath, COLUMNS).stop()
+    with pytest.raises(FileExistsError):
+        TrialWriter.TrialWriter(filepath, COLUMNS)
+
+def test_recover_drops_a_partly_written_row(tmp_path):
+    journal_path = str(tmp_path / "session") + TrialWriter.JOURNAL_EXTENSION
+    with open(journal_path, "w", newline="") as journal:
+        journal.write("Trial#,Object\r\n1,a\r\n2,b\r\n3,")
+    assert TrialWriter.recover(journal_path, COLUMNS) == 2
+    assert read(journal_path) == [COLUMNS, ["1", "a"], ["2", "b"]]
+
+def test_recover_checks_the_header(tmp_path):
+    journal_path = str(tmp_path / "session") + TrialWriter.JOURNAL_EXTENSION
+    with open(journal_path, "w", newline="") as journal:
+        journal.write("Trial#,Name\r\n1,a\r\n")
+    with pytest.raises(ValueError):
+        TrialWriter.recover(journal_path, COLUMNS)
+
+def test_resume_appends_after_a_crash(tmp_path):
+    filepath = str(tmp_path / "session")
+    journal_path = filepath + TrialWriter.JOURNAL_EXTENSION
+    writer = TrialWriter.TrialWriter(filepath, COLUMNS)
+    writer.write([1, "a"])
+    writer.write([2, "b"])
+    writer.checkpoint("_checkpoint.json", {"rows": 2})
+    writer.stop()
+    # a crash in the middle of the third row
+    with open(journal_path, "a", newline="") as journal:
+        journal.write("3,c")
+    writer = TrialWriter.TrialWriter(filepath, COLUMNS, resume=True)
+    writer.track_checkpoint("_checkpoint.json")
+    assert writer.nrows == 2
+    writer.write([3, "c"])
+    writer.close()
+    assert read(filepath + TrialWriter.CSV_EXTENSION) == [COLUMNS, ["1", "a"], ["2", "b"], ["3", "c"]]
+    assert not os.path.exists(filepath + "_checkpoint.json")